@@ -1,8 +1,11 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Union
+from typing import List, Optional, Union
 import asyncio
+import os
 
+import aiosqlite
 import sys
 from pathlib import Path
 
@@ -11,40 +14,126 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 # Import custom database class
 from utils.db_utils import DatabaseHandler  # Assuming this handles DB connections, etc.
+from utils.connection_pool import ConnectionPool  # Long-lived aiosqlite connections
 from utils.random_number import RandomNumberGenerator  # Unified random number generator
 from utils.response_utils import construct_response  # For consistent responses
+from utils.stream_utils import StreamStats, stream_numbers  # NDJSON streaming
+from utils.metrics import REGISTRY, MetricsMiddleware  # Prometheus-style /metrics
 
 # Define the SQLite database file
 DB_FILE = "random_numbers.db"
+
+# Number backend: "db" generates and checks each number against DB_FILE;
+# "permutation" derives numbers from a keyed permutation of a persisted counter
+# (unique by construction, no per-number storage). Does not consult DB history.
+NUMBER_BACKEND = os.environ.get("NUMBER_BACKEND", "db")
+PERMUTATION_STATE_FILE = "permutation_state.json"
+# Instances with distinct NODE_IDs (0 .. PARTITION_COUNT - 1) draw from disjoint
+# slices of the number space, so they never collide even with separate DB files.
+NODE_ID = int(os.environ.get("NODE_ID", "0"))
+PARTITION_COUNT = int(os.environ.get("PARTITION_COUNT", "1"))
 MAX_ATTEMPTS = 100  # Maximum retry attempts for generating a unique number
+DB_POOL_SIZE = 4  # Number of long-lived connections kept open to DB_FILE
+MAX_COUNT = 1000  # Server-side cap on /random?count=N
+STREAM_BATCH_SIZE = 100   # Numbers reserved per DB round trip by /random/stream
+STREAM_MAX_RATE = 10000   # Server-side cap, in numbers per second, for each stream
+
+# Group commit: concurrent inserts are queued to one writer task and committed together
+GROUP_COMMIT_ENABLED = True
+GROUP_COMMIT_MAX_BATCH_SIZE = 256  # Commit as soon as this many inserts are queued...
+GROUP_COMMIT_MAX_LATENCY = 0.005   # ...or this many seconds after the first one arrived
+METRICS_ENABLED = True  # Count and time requests for /metrics
 
 # Create a FastAPI app instance
 app = FastAPI()
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Instantiate the connection pool, database handler and random number generator
+db_pool = ConnectionPool(DB_FILE, size=DB_POOL_SIZE)
+db_handler = DatabaseHandler(DB_FILE, pool=db_pool)
+if NUMBER_BACKEND == "permutation":
+    rng = RandomNumberGenerator(mode="permutation", state_file=PERMUTATION_STATE_FILE,
+                                node_id=NODE_ID, partition_count=PARTITION_COUNT)
+else:
+    rng = RandomNumberGenerator(node_id=NODE_ID, partition_count=PARTITION_COUNT)
 
-# Instantiate database handler and random number generator
-db_handler = DatabaseHandler(DB_FILE)
-rng = RandomNumberGenerator()
+stream_stats = StreamStats()  # Sent / released / burned totals for /random/stream
+stream_numbers_metric = REGISTRY.counter("stream_numbers_total", "Numbers reserved by /random/stream.", ("outcome",))
 
 # Define the response model for the /random endpoint
 class RandomNumberResponse(BaseModel):
     number: Union[int, float]
 
+# Response model for /random?count=N
+class RandomNumbersResponse(BaseModel):
+    numbers: List[Union[int, float]]
+
 # This function runs once at app startup to initialize the database
 @app.on_event("startup")
 async def startup_event():
     # Create the table if it doesn't exist
     await db_handler.init_db()
+    # Open the pooled connections once; requests borrow them from here on
+    await db_pool.open()
+    if GROUP_COMMIT_ENABLED:
+        db_handler.start_group_commit(
+            max_batch_size=GROUP_COMMIT_MAX_BATCH_SIZE,
+            max_latency=GROUP_COMMIT_MAX_LATENCY,
+        )
+
+# Flush pending inserts and close the pooled connections when the app stops
+@app.on_event("shutdown")
+async def shutdown_event():
+    await db_handler.stop_group_commit()
+    await db_pool.close()
+
+# Reserves `count` unique numbers with one bulk INSERT transaction per round
+async def reserve_numbers(count: int, is_float: bool) -> list:
+    if rng.mode == "permutation":
+        return [rng.generate_random_number(is_float=is_float) for _ in range(count)]
+
+    reserved = []
+    for _ in range(MAX_ATTEMPTS):
+        candidates = [rng.generate_random_number(is_float=is_float) for _ in range(count - len(reserved))]
+        inserted = await db_handler.insert_batch(candidates)
+        reserved.extend(number for number, ok in zip(candidates, inserted) if ok)
+        if len(reserved) == count:
+            return reserved
+    # Numbers already inserted stay reserved; they are simply never served
+    raise HTTPException(
+        status_code=503,
+        detail="Could not generate unique random numbers after retries."
+    )
 
 # This is the API endpoint to get a unique random number
-@app.get("/random", response_model=RandomNumberResponse)
-async def get_random_number(type: str = "int"):
+@app.get("/random", response_model=Union[RandomNumberResponse, RandomNumbersResponse])
+async def get_random_number(type: str = "int", count: Optional[int] = Query(None, ge=1, le=MAX_COUNT)):
     """
     Returns a unique random number (int or float).
     Tries up to MAX_ATTEMPTS times to insert a newly generated number into the DB.
     If all fail (i.e., duplicate entries), it returns a 503 error.
+    With `count`, returns {"numbers": [...]} holding `count` unique numbers
+    reserved in bulk (at most MAX_COUNT per request).
     """
     is_float = type.lower() == "float"
 
+    if count is not None:
+        try:
+            return {"numbers": await reserve_numbers(count, is_float)}
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except aiosqlite.Error as e:
+            # Still locked after insert_batch's retries, or failing: report it as unavailable
+            raise HTTPException(status_code=503, detail=f"Database unavailable: {e}")
+
+    if rng.mode == "permutation":
+        # Unique by construction: no DB round trip needed
+        try:
+            return {"number": rng.generate_random_number(is_float=is_float)}
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
     for _ in range(MAX_ATTEMPTS):
         number = rng.generate_random_number(is_float=is_float)  # generate new number
         if await db_handler.insert_number(number):  # try inserting to DB
@@ -57,6 +146,37 @@ async def get_random_number(type: str = "int"):
         detail="Could not generate unique random number after retries."
     )
 
+# Streams unique numbers as newline-delimited JSON until `limit` or disconnect
+@app.get("/random/stream")
+async def stream_random_numbers(
+    type: str = "int",
+    limit: Optional[int] = Query(None, ge=1),
+    rate: Optional[float] = Query(None, gt=0),
+):
+    is_float = type.lower() == "float"
+
+    async def reserve(count):
+        try:
+            return await reserve_numbers(count, is_float)
+        except (HTTPException, RuntimeError, aiosqlite.Error):
+            return []  # Storage exhausted or unavailable: end the stream
+
+    # Unsent numbers can be deleted from the DB again; permutation indices cannot be reused
+    release = None if rng.mode == "permutation" else db_handler.delete_numbers
+    max_rate = min(rate, STREAM_MAX_RATE) if rate else STREAM_MAX_RATE
+    return StreamingResponse(
+        stream_numbers(reserve, limit=limit, batch_size=STREAM_BATCH_SIZE,
+                       max_rate=max_rate, release=release, stats=stream_stats),
+        media_type="application/x-ndjson",
+    )
+
+# Prometheus text-format metrics: request counts and latencies, collisions, busy retries
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    for outcome in ("sent", "released", "burned"):
+        stream_numbers_metric.labels(outcome).set(getattr(stream_stats, outcome))
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # This is the entry point for running the app using Uvicorn directly
 def main():
     import uvicorn
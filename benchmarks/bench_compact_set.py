@@ -0,0 +1,98 @@
+"""
+Benchmark: memory and speed of CompactNumberSet vs. a Python set for used_numbers.
+
+Memory is measured with tracemalloc while the collection is built from
+numbers that were already allocated, so only the collection is counted: for
+a set, its hash table plus the boxed int/float objects it keeps alive
+(numbers drawn one by one exist only in the set); for CompactNumberSet, its
+int64 table. Reported per million entries, along with add() and lookup
+throughput.
+
+    python benchmarks/bench_compact_set.py --sizes 1000000 5000000
+"""
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.compact_set import CompactNumberSet
+from utils.random_number import RandomNumberGenerator
+
+LOOKUPS = 200_000
+
+
+def draw(size: int, kind: str) -> list:
+    rng = RandomNumberGenerator()
+    if kind == "mixed":
+        return [rng.generate_random_number(is_float=i % 2 == 1) for i in range(size)]
+    return [rng.generate_random_number(is_float=kind == "float") for _ in range(size)]
+
+
+def allocated_bytes(build, numbers: list) -> int:
+    """Bytes still allocated by the collection build(numbers) returns."""
+    tracemalloc.start()
+    collection = build(numbers)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del collection
+    return allocated
+
+
+def add_time(build, numbers: list):
+    """(collection, seconds per add), measured without tracemalloc's overhead."""
+    start = time.perf_counter()
+    collection = build(numbers)
+    return collection, (time.perf_counter() - start) / len(numbers)
+
+
+def build_set(numbers):
+    # Copies of the numbers, as a server's set holds numbers nothing else references
+    used = set()
+    for number in numbers:
+        used.add(number + 0)
+    return used
+
+
+def build_compact(numbers):
+    used = CompactNumberSet()
+    for number in numbers:
+        used.add(number)
+    return used
+
+
+def lookup_time(collection, numbers: list) -> float:
+    probes = random.sample(numbers, min(LOOKUPS, len(numbers)))
+    start = time.perf_counter()
+    for number in probes:
+        number in collection
+    return (time.perf_counter() - start) / len(probes)
+
+
+def main(sizes, kinds):
+    print(f"{'entries':>10} {'kind':>6} {'structure':>18} {'MiB/million':>12} {'bytes/entry':>12} "
+          f"{'add':>9} {'lookup':>9}")
+    for size in sizes:
+        for kind in kinds:
+            numbers = draw(size, kind)
+            for name, build in (("set", build_set), ("CompactNumberSet", build_compact)):
+                per_entry = allocated_bytes(build, numbers) / size
+                collection, per_add = add_time(build, numbers)
+                print(f"{size:>10} {kind:>6} {name:>18} {per_entry * 1e6 / 2**20:>12.1f} {per_entry:>12.1f} "
+                      f"{per_add * 1e9:>7.0f}ns {lookup_time(collection, numbers) * 1e9:>7.0f}ns")
+                del collection
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare CompactNumberSet with a Python set.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000],
+                        help="Entries to insert (default: 1000000)")
+    parser.add_argument("--kinds", nargs="+", choices=("int", "float", "mixed"), default=["int", "float"],
+                        help="Number types to insert (default: int float)")
+    args = parser.parse_args()
+
+    main(args.sizes, args.kinds)
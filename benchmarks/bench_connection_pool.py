@@ -0,0 +1,97 @@
+"""
+Benchmark: connect-per-call vs. pooled connections.
+
+Each /random request on the async SQLite server costs one
+DatabaseHandler.insert_number() call, and each request on the sharded server
+costs one DatabaseUtils.pop_random_number() call, so calls/sec here is an
+upper bound for requests/sec of the respective server.
+
+    python benchmarks/bench_connection_pool.py --calls 2000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.connection_pool import ConnectionPool
+from utils.db_utils import DatabaseHandler
+from utils.pooled_db_utils import DatabaseUtils
+
+
+async def run_concurrently(func, calls: int, concurrency: int) -> float:
+    """Runs `func` `calls` times with at most `concurrency` in flight; returns calls/sec."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await func()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return calls / (time.perf_counter() - start)
+
+
+async def bench_insert_number(tmp_dir: str, calls: int, concurrency: int, pool_size: int):
+    results = {}
+    for label in ("connect-per-call", "pooled"):
+        db_file = os.path.join(tmp_dir, f"insert_{label}.db")
+        pool = ConnectionPool(db_file, size=pool_size) if label == "pooled" else None
+        handler = DatabaseHandler(db_file, pool=pool)
+        await handler.init_db()
+        if pool:
+            await pool.open()
+
+        async def insert():
+            await handler.insert_number(random.getrandbits(32))
+
+        results[label] = await run_concurrently(insert, calls, concurrency)
+        if pool:
+            await pool.close()
+    return results
+
+
+async def bench_pop_random_number(tmp_dir: str, calls: int, concurrency: int, pool_size: int):
+    results = {}
+    for label in ("connect-per-call", "pooled"):
+        db_file = os.path.join(tmp_dir, f"pop_{label}.db")
+        pool = ConnectionPool(db_file, size=pool_size) if label == "pooled" else None
+        shard = DatabaseUtils(db_file, pool=pool)
+        await shard.create_table()
+        await shard.insert_values(random.sample(range(10 ** 9), calls))
+        if pool:
+            await pool.open()
+        results[label] = await run_concurrently(shard.pop_random_number, calls, concurrency)
+        if pool:
+            await pool.close()
+    return results
+
+
+async def main(calls: int, concurrency: int, pool_size: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        benchmarks = {
+            "DatabaseHandler.insert_number": await bench_insert_number(tmp_dir, calls, concurrency, pool_size),
+            "DatabaseUtils.pop_random_number": await bench_pop_random_number(tmp_dir, calls, concurrency, pool_size),
+        }
+
+    for name, results in benchmarks.items():
+        before, after = results["connect-per-call"], results["pooled"]
+        print(f"{name}")
+        print(f"    connect-per-call: {before:10.1f} calls/sec")
+        print(f"    pooled:           {after:10.1f} calls/sec  ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare connect-per-call and pooled SQLite access.")
+    parser.add_argument("--calls", type=int, default=2000, help="Calls per scenario (default: 2000)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent callers (default: 32)")
+    parser.add_argument("--pool-size", type=int, default=4, help="Pooled connections (default: 4)")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.calls, args.concurrency, args.pool_size))
@@ -0,0 +1,120 @@
+"""
+Benchmark: GET /random through the FastAPI route vs. the raw ASGI fast path.
+
+Both apps are driven in-process with synthetic ASGI messages (no sockets,
+no HTTP parsing), so the difference is the per-request framework work:
+routing past the other routes, query validation, response_model validation,
+jsonable_encoder and JSONResponse for FastAPI, against a dict lookup, a pop
+of a pre-built body and two `send` calls for FastRandomApp. Numbers come
+from an in-memory deque in both cases, as from a prefetch buffer.
+
+    python benchmarks/bench_fast_path.py --requests 100000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Optional, Union
+
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.fast_asgi import FastRandomApp, json_body
+from utils.metrics import MetricsMiddleware, MetricsRegistry
+
+
+class RandomNumberResponse(BaseModel):
+    number: Union[int, float]
+
+
+def make_fastapi_app(numbers: deque, metrics: bool) -> FastAPI:
+    """The servers' /random route shape: query parameters, response_model and a catch-all route."""
+    app = FastAPI()
+    if metrics:
+        app.add_middleware(MetricsMiddleware, registry=MetricsRegistry())
+
+    @app.get("/random", response_model=RandomNumberResponse)
+    async def get_random(type: str = "int", count: Optional[int] = Query(None, ge=1, le=1000)):
+        return {"number": numbers.popleft()}
+
+    @app.get("/random/stream")
+    async def stream_random(limit: Optional[int] = Query(None, ge=1)):
+        return {}
+
+    @app.get("/{path:path}")
+    async def not_found(path: str):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    return app
+
+
+def make_fast_app(bodies: deque, metrics: bool) -> FastRandomApp:
+    async def pop_body():
+        return bodies.popleft()
+    return FastRandomApp({b"": pop_body}, registry=MetricsRegistry() if metrics else None)
+
+
+def request_scope() -> dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/random", "raw_path": b"/random", "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+    }
+
+
+async def call(app, sent: list):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(request_scope(), receive, send)
+
+
+async def run(app, requests: int) -> float:
+    """Seconds per request."""
+    sent = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, sent)
+        sent.clear()
+    return (time.perf_counter() - start) / requests
+
+
+async def check_same_response(metrics: bool):
+    """Both apps must send the same status, content type and body."""
+    responses = []
+    for app in (make_fastapi_app(deque([12345]), metrics), make_fast_app(deque([json_body({"number": 12345})]), metrics)):
+        sent = []
+        await call(app, sent)
+        headers = dict(sent[0]["headers"])
+        responses.append((sent[0]["status"], headers[b"content-type"], sent[1]["body"]))
+    assert responses[0] == responses[1], responses
+
+
+async def main(requests: int, metrics: bool):
+    await check_same_response(metrics)
+    numbers = range(requests * 2)
+    fastapi_time = await run(make_fastapi_app(deque(numbers), metrics), requests)
+    fast_time = await run(make_fast_app(deque(json_body({"number": n}) for n in numbers), metrics), requests)
+    print(f"{'app':>14} {'per request':>12} {'requests/s':>11}")
+    for name, seconds in (("FastAPI route", fastapi_time), ("FastRandomApp", fast_time)):
+        print(f"{name:>14} {seconds * 1e6:>10.1f}us {1 / seconds:>11.0f}")
+    print(f"Fast path is {fastapi_time / fast_time:.1f}x faster per request.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the FastAPI /random route with the ASGI fast path.")
+    parser.add_argument("--requests", type=int, default=100_000, help="Requests per app (default: 100000)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Count requests, as the servers do with METRICS_ENABLED")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.requests, args.metrics))
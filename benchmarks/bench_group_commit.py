@@ -0,0 +1,65 @@
+"""
+Benchmark: one transaction per insert vs. group commit.
+
+Runs concurrent DatabaseHandler.insert_number() calls (one per /random request
+on the async SQLite server) against a pooled temp database, first with a
+COMMIT per insert and then through the GroupCommitWriter.
+
+    python benchmarks/bench_group_commit.py --calls 5000 --concurrency 128
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_connection_pool import run_concurrently
+from utils.connection_pool import ConnectionPool
+from utils.db_utils import DatabaseHandler
+
+
+async def bench(db_file: str, calls: int, concurrency: int, group_commit: bool,
+                max_batch_size: int, max_latency: float) -> float:
+    pool = ConnectionPool(db_file, size=4)
+    handler = DatabaseHandler(db_file, pool=pool)
+    await handler.init_db()
+    await pool.open()
+    if group_commit:
+        handler.start_group_commit(max_batch_size=max_batch_size, max_latency=max_latency)
+
+    async def insert():
+        await handler.insert_number(random.getrandbits(32))
+
+    rate = await run_concurrently(insert, calls, concurrency)
+    await handler.stop_group_commit()
+    await pool.close()
+    return rate
+
+
+async def main(calls: int, concurrency: int, max_batch_size: int, max_latency: float):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        single = await bench(os.path.join(tmp_dir, "single.db"), calls, concurrency, False,
+                             max_batch_size, max_latency)
+        grouped = await bench(os.path.join(tmp_dir, "grouped.db"), calls, concurrency, True,
+                              max_batch_size, max_latency)
+
+    print("DatabaseHandler.insert_number")
+    print(f"    commit per insert: {single:10.1f} calls/sec")
+    print(f"    group commit:      {grouped:10.1f} calls/sec  ({grouped / single:.1f}x)"
+          f"  [batch<={max_batch_size}, latency<={max_latency * 1000:.1f} ms]")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-insert commits with group commit.")
+    parser.add_argument("--calls", type=int, default=5000, help="Inserts per scenario (default: 5000)")
+    parser.add_argument("--concurrency", type=int, default=128, help="Concurrent callers (default: 128)")
+    parser.add_argument("--max-batch-size", type=int, default=256, help="Group commit batch cap (default: 256)")
+    parser.add_argument("--max-latency", type=float, default=0.005, help="Group commit latency budget in seconds (default: 0.005)")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.calls, args.concurrency, args.max_batch_size, args.max_latency))
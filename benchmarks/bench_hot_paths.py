@@ -0,0 +1,259 @@
+"""
+Micro-benchmarks for the storage and generation hot paths, with a saved baseline.
+
+Each case runs in isolation against temp files, at every history size in
+--sizes (rows already in the table / numbers already used), and reports the
+median time per operation over --repeat runs.
+
+    python benchmarks/bench_hot_paths.py --save benchmarks/results/baseline.json
+    ... change something ...
+    python benchmarks/bench_hot_paths.py --baseline benchmarks/results/baseline.json
+
+With --baseline, every case is compared with the saved run; the script exits
+with status 1 if any case got slower by more than --tolerance (default 25%).
+Baselines are machine-specific: compare runs from the same machine only.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scalable_unique_random_http_server_fastapi_sharded"))
+
+import initialize_shards
+from shard_manager import ShardManager
+from utils.bitmap_store import UsedNumbersBitmap
+from utils.db_utils import DatabaseHandler
+from utils.persistence_json_utils import load_used_numbers, save_used_numbers
+from utils.pooled_db_utils import DatabaseUtils
+from utils.random_number import RandomNumberGenerator
+
+
+def history(size: int) -> list:
+    return random.sample(range(1 << RandomNumberGenerator.INT_BITS), size)
+
+
+def bulk_load(db_file: str, sql: str, rows):
+    with sqlite3.connect(db_file) as conn:
+        conn.executemany(sql, rows)
+        conn.commit()
+
+
+async def median_time(run, ops: int, repeat: int, setup=None) -> float:
+    """Median seconds per operation; run(ops) is sync or async, setup() runs before each repeat."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            await setup()
+        start = time.perf_counter()
+        result = run(ops)
+        if asyncio.iscoroutine(result):
+            await result
+        samples.append((time.perf_counter() - start) / ops)
+    return statistics.median(samples)
+
+
+# Each case: async (tmp_dir, size, repeat) -> seconds per operation
+
+async def case_generate_int(tmp_dir, size, repeat):
+    rng = RandomNumberGenerator()
+    return await median_time(lambda n: [rng.generate_random_number(False) for _ in range(n)], 100_000, repeat)
+
+
+async def case_generate_float(tmp_dir, size, repeat):
+    rng = RandomNumberGenerator()
+    return await median_time(lambda n: [rng.generate_random_number(True) for _ in range(n)], 100_000, repeat)
+
+
+async def case_insert_number(tmp_dir, size, repeat):
+    db_file = os.path.join(tmp_dir, f"insert_number_{size}.db")
+    handler = DatabaseHandler(db_file)
+    await handler.init_db()
+    bulk_load(db_file, "INSERT INTO random_numbers (number) VALUES (?)", ((v,) for v in history(size)))
+    rng = RandomNumberGenerator()
+
+    async def run(n):
+        for _ in range(n):
+            await handler.insert_number(rng.generate_random_number())
+    return await median_time(run, 200, repeat)
+
+
+async def make_shard(tmp_dir, name, size) -> DatabaseUtils:
+    db = DatabaseUtils(os.path.join(tmp_dir, f"{name}_{size}.db"))
+    await db.create_table()
+    bulk_load(db.db_file, "INSERT INTO number_pool (value) VALUES (?)", ((v,) for v in history(size)))
+    return db
+
+
+async def case_insert_values(tmp_dir, size, repeat):
+    db = await make_shard(tmp_dir, "insert_values", size)
+    rng = RandomNumberGenerator()
+    # One call inserts a 1,000-value batch; reported per value.
+    batches = [[rng.generate_random_number() for _ in range(1000)] for _ in range(repeat)]
+    return await median_time(lambda n: db.insert_values(batches.pop()), 1, repeat) / 1000
+
+
+async def case_pop_random_number(tmp_dir, size, repeat):
+    db = await make_shard(tmp_dir, "pop", max(size, 1000 * repeat))
+
+    async def run(n):
+        for _ in range(n):
+            await db.pop_random_number()
+    return await median_time(run, 500, repeat)
+
+
+async def case_fetch_all_values(tmp_dir, size, repeat):
+    db = await make_shard(tmp_dir, "fetch", size)
+    return await median_time(lambda n: db.fetch_all_values(), 1, repeat)
+
+
+async def make_meta(tmp_dir, name, size) -> str:
+    meta_file = os.path.join(tmp_dir, f"{name}_meta_{size}.db")
+    await DatabaseUtils(meta_file, "used_numbers").create_table(is_metadata=True)
+    bulk_load(meta_file, "INSERT INTO used_numbers (value) VALUES (?)", ((v,) for v in sorted(history(size))))
+    return meta_file
+
+
+async def case_populate_shard(tmp_dir, size, repeat):
+    initialize_shards.SHARD_DIR = tmp_dir
+    meta_file = await make_meta(tmp_dir, "populate", size)
+    rng = RandomNumberGenerator()
+    # One call fills 10,000 numbers; reported per call.
+    return await median_time(lambda n: initialize_shards.populate_shard(0, 10_000, meta_file, rng), 1, repeat)
+
+
+async def case_refill_shard(tmp_dir, size, repeat):
+    meta_file = await make_meta(tmp_dir, "refill", size)
+    manager = ShardManager([0], meta_file, tmp_dir)
+    await DatabaseUtils(os.path.join(tmp_dir, "shard_0.db")).create_table()
+    # One call refills 200 numbers; reported per call.
+    return await median_time(lambda n: manager.refill_shard(0, 200), 1, repeat)
+
+
+async def case_load_used_numbers(tmp_dir, size, repeat):
+    path = Path(tmp_dir) / f"load_{size}.json"
+    save_used_numbers(path, set(history(size)))
+    return await median_time(lambda n: load_used_numbers(path), 1, repeat)
+
+
+async def case_save_used_numbers(tmp_dir, size, repeat):
+    path = Path(tmp_dir) / f"save_{size}.json"
+    numbers = set(history(size))
+    return await median_time(lambda n: save_used_numbers(path, numbers), 1, repeat)
+
+
+async def case_bitmap_add(tmp_dir, size, repeat):
+    used = UsedNumbersBitmap(Path(tmp_dir) / "bitmap").load()
+    rng = RandomNumberGenerator()
+    try:
+        return await median_time(lambda n: [used.add(rng.generate_random_number()) for _ in range(n)],
+                                 100_000, repeat)
+    finally:
+        used.close()
+
+
+# Cases whose cost does not depend on history size run once, at size 0.
+CASES = {
+    "generate_random_number[int]": (case_generate_int, False),
+    "generate_random_number[float]": (case_generate_float, False),
+    "DatabaseHandler.insert_number": (case_insert_number, True),
+    "DatabaseUtils.insert_values (per value)": (case_insert_values, True),
+    "DatabaseUtils.pop_random_number": (case_pop_random_number, True),
+    "DatabaseUtils.fetch_all_values": (case_fetch_all_values, True),
+    "populate_shard (10,000 numbers)": (case_populate_shard, True),
+    "ShardManager.refill_shard (200 numbers)": (case_refill_shard, True),
+    "load_used_numbers": (case_load_used_numbers, True),
+    "save_used_numbers": (case_save_used_numbers, True),
+    "UsedNumbersBitmap.add (incl. generation)": (case_bitmap_add, False),
+}
+
+
+async def run_all(sizes, repeat: int, selected) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, (case, sized) in CASES.items():
+            if selected and not any(s.lower() in name.lower() for s in selected):
+                continue
+            for size in (sizes if sized else [0]):
+                key = f"{name} @ {size}" if sized else name
+                results[key] = await case(tmp_dir, size, repeat)
+                print(f"    {key:<55} {format_seconds(results[key]):>12}")
+    return results
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Prints current vs. baseline per case and returns the cases that regressed."""
+    regressions = []
+    print(f"\n    {'case':<55} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key, current in results.items():
+        before = baseline.get(key)
+        if before is None:
+            print(f"    {key:<55} {'-':>12} {format_seconds(current):>12}      new")
+            continue
+        change = current / before - 1
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"    {key:<55} {format_seconds(before):>12} {format_seconds(current):>12} {change:+8.1%}{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main(args) -> int:
+    print(f"Hot-path micro-benchmarks, sizes {args.sizes}, median of {args.repeat}:")
+    results = asyncio.run(run_all(args.sizes, args.repeat, args.only))
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        run = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.node(),
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.save, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"Saved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}.")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the storage and generation hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000],
+                        help="History sizes to run each case at (default: 1000 100000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case; the median is kept (default: 5)")
+    parser.add_argument("--only", nargs="+", help="Only run cases whose name contains one of these strings")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with the results saved in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown before a case counts as a regression (default: 0.25)")
+    args = parser.parse_args()
+
+    sys.exit(main(args))
@@ -0,0 +1,90 @@
+"""
+Benchmark: cost of the /metrics instrumentation.
+
+Drives the async SQLite server (version 3) in-process through httpx's ASGI
+transport, against a temp DB, with MetricsMiddleware installed and removed,
+alternating rounds to spread out noise. Also reports the raw cost of one
+counter increment and one histogram observation.
+
+    python benchmarks/bench_metrics.py --requests 5000 --concurrency 50 --rounds 3
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "async_unique_random_http_server_fastapi_sqlite"))
+
+from utils.metrics import MetricsMiddleware, MetricsRegistry
+
+
+def set_metrics(app, enabled: bool, middleware):
+    """Rebuild the app's middleware stack with or without MetricsMiddleware."""
+    app.user_middleware = [m for m in app.user_middleware if m.cls is not MetricsMiddleware]
+    if enabled:
+        app.user_middleware.insert(0, middleware)
+    app.middleware_stack = app.build_middleware_stack()
+
+
+async def run(app, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        remaining = iter(range(requests))
+
+        async def worker():
+            for i in remaining:
+                response = await client.get("/random", params={"type": "float" if i % 2 else "int"})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int, rounds: int):
+    import main_http_server as server  # Uses random_numbers.db in the current (temp) directory
+
+    middleware = next(m for m in server.app.user_middleware if m.cls is MetricsMiddleware)
+    await server.startup_event()
+    try:
+        await run(server.app, 500, concurrency)  # Warm-up
+        results = {False: [], True: []}
+        for _ in range(rounds):
+            for enabled in (False, True):
+                set_metrics(server.app, enabled, middleware)
+                results[enabled].append(await run(server.app, requests, concurrency))
+    finally:
+        await server.shutdown_event()
+
+    off, on = max(results[False]), max(results[True])
+    print(f"/random, {requests} requests x {rounds} rounds, concurrency {concurrency} (best round):")
+    print(f"    metrics off: {off:9.0f} req/s")
+    print(f"    metrics on:  {on:9.0f} req/s   ({(off - on) / off * 100:+.1f}% overhead)")
+
+    registry = MetricsRegistry()
+    counter = registry.counter("c", "", ("path", "status")).labels("/random", "200")
+    histogram = registry.histogram("h", "", ("path",)).labels("/random")
+    n = 1_000_000
+    print(f"    counter inc:       {timeit.timeit(counter.inc, number=n) / n * 1e9:6.0f} ns")
+    print(f"    histogram observe: {timeit.timeit(lambda: histogram.observe(0.003), number=n) / n * 1e9:6.0f} ns")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the throughput cost of the metrics middleware.")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per round (default: 5000)")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients (default: 50)")
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds per setting (default: 3)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        asyncio.run(main(args.requests, args.concurrency, args.rounds))
@@ -0,0 +1,66 @@
+"""
+Benchmark: permutation backend vs. the DB-backed generate-then-insert path.
+
+The DB-backed path is what /random does on the async SQLite server
+(generate a candidate, DatabaseHandler.insert_number, retry on duplicate);
+the permutation path is RandomNumberGenerator(mode="permutation").
+
+    python benchmarks/bench_permutation.py --calls 5000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.connection_pool import ConnectionPool
+from utils.db_utils import DatabaseHandler
+from utils.random_number import RandomNumberGenerator
+
+
+async def bench_db_backed(db_file: str, calls: int, is_float: bool) -> float:
+    pool = ConnectionPool(db_file, size=1)
+    handler = DatabaseHandler(db_file, pool=pool)
+    await handler.init_db()
+    await pool.open()
+    rng = RandomNumberGenerator()
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        while not await handler.insert_number(rng.generate_random_number(is_float=is_float)):
+            pass
+    rate = calls / (time.perf_counter() - start)
+    await pool.close()
+    return rate
+
+
+def bench_permutation(state_file: str, calls: int, is_float: bool) -> float:
+    rng = RandomNumberGenerator(mode="permutation", state_file=state_file)
+    start = time.perf_counter()
+    for _ in range(calls):
+        rng.generate_random_number(is_float=is_float)
+    return calls / (time.perf_counter() - start)
+
+
+async def main(calls: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for is_float in (False, True):
+            kind = "float" if is_float else "int"
+            db_rate = await bench_db_backed(os.path.join(tmp_dir, f"{kind}.db"), calls, is_float)
+            perm_rate = bench_permutation(os.path.join(tmp_dir, f"{kind}_state.json"), calls, is_float)
+            print(f"{kind} numbers")
+            print(f"    DB-backed (insert_number): {db_rate:12.1f} numbers/sec")
+            print(f"    permutation:               {perm_rate:12.1f} numbers/sec  ({perm_rate / db_rate:.0f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the permutation backend with the DB-backed path.")
+    parser.add_argument("--calls", type=int, default=5000, help="Numbers per scenario (default: 5000)")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.calls))
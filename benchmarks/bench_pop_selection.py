@@ -0,0 +1,74 @@
+"""
+Benchmark: DatabaseUtils.pop_random_number cost per selection strategy and shard size.
+
+Each shard is built with sqlite3 directly (fast bulk load), with half of its
+rows already marked used so that served history is part of the picture.
+The legacy "random" strategy scans and sorts the whole shard per call, so it
+is only timed for a handful of pops.
+
+    python benchmarks/bench_pop_selection.py --sizes 10000 1000000 10000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.connection_pool import ConnectionPool
+from utils.pooled_db_utils import DatabaseUtils
+
+
+async def build_shard(db_file: str, rows: int):
+    await DatabaseUtils(db_file).create_table()  # Schema and (used, id) index
+    values = random.sample(range(rows * 10), rows)
+    with sqlite3.connect(db_file) as conn:
+        conn.executemany(
+            "INSERT INTO number_pool (value, used) VALUES (?, ?)",
+            ((v, i % 2) for i, v in enumerate(values))
+        )
+        conn.commit()
+
+
+async def time_pops(db_file: str, selection: str, pops: int) -> float:
+    """Returns the mean pop latency in microseconds."""
+    pool = ConnectionPool(db_file, size=1)
+    await pool.open()
+    shard = DatabaseUtils(db_file, pool=pool, selection=selection)
+    start = time.perf_counter()
+    for _ in range(pops):
+        await shard.pop_random_number()
+    elapsed = time.perf_counter() - start
+    await pool.close()
+    return elapsed / pops * 1e6
+
+
+async def main(sizes, pops: int, legacy_pops: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'rows':>10}  " + "  ".join(f"{s:>14}" for s in DatabaseUtils.SELECTION_STRATEGIES))
+        for rows in sizes:
+            db_file = os.path.join(tmp_dir, f"shard_{rows}.db")
+            await build_shard(db_file, rows)
+            latencies = []
+            for selection in DatabaseUtils.SELECTION_STRATEGIES:
+                n = legacy_pops if selection == "random" else pops
+                latencies.append(await time_pops(db_file, selection, n))
+            print(f"{rows:>10}  " + "  ".join(f"{us:>11.1f} us" for us in latencies))
+            os.remove(db_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare pop_random_number selection strategies.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000],
+                        help="Rows per shard (default: 10000 1000000; add 10000000 for the large case)")
+    parser.add_argument("--pops", type=int, default=2000, help="Pops timed per indexed strategy (default: 2000)")
+    parser.add_argument("--legacy-pops", type=int, default=20, help="Pops timed for ORDER BY RANDOM() (default: 20)")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.sizes, args.pops, args.legacy_pops))
@@ -0,0 +1,89 @@
+"""
+Benchmark: populate_shard with the per-number loop vs. the NumPy path.
+
+Each run fills one int shard and one float shard in a temp directory, against
+a metadata DB that already holds `--existing` used values per type, and
+reports generation+dedupe time separately from the total (which also
+includes the shard and metadata inserts).
+
+    python benchmarks/bench_populate_shard.py --sizes 100000 1000000 --existing 100000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scalable_unique_random_http_server_fastapi_sharded"))
+
+import initialize_shards
+from utils.pooled_db_utils import DatabaseUtils
+from utils.random_number import RandomNumberGenerator
+from utils.vectorized_numbers import unique_candidates
+
+
+async def seed_meta(meta_db_path: str, count: int, is_float: bool):
+    meta_db = DatabaseUtils(meta_db_path, "used_numbers")
+    await meta_db.create_table(is_metadata=True)
+    await meta_db.insert_values(unique_candidates(count, is_float, []).tolist())
+
+
+async def bench(tmp_dir: str, size: int, existing: int, vectorized: bool) -> dict:
+    label = "vectorized" if vectorized else "loop"
+    run_dir = os.path.join(tmp_dir, f"{label}_{size}")
+    os.makedirs(run_dir)
+    initialize_shards.SHARD_DIR = run_dir
+    timings = {}
+    for shard_idx, is_float in ((0, False), (2, True)):
+        kind = "float" if is_float else "int"
+        meta_path = os.path.join(run_dir, f"meta_{kind}.db")
+        await seed_meta(meta_path, existing, is_float)
+
+        start = time.perf_counter()
+        await initialize_shards.populate_shard(shard_idx, size, meta_path, RandomNumberGenerator(),
+                                               vectorized=vectorized)
+        timings[kind] = time.perf_counter() - start
+    return timings
+
+
+def bench_generation(size: int, existing: int, vectorized: bool) -> float:
+    """Generation + dedupe only, for int candidates, without any DB work."""
+    used = unique_candidates(existing, False, [])
+    start = time.perf_counter()
+    if vectorized:
+        unique_candidates(size, False, used)
+    else:
+        rng, used_set, fresh = RandomNumberGenerator(), set(used.tolist()), set()
+        while len(fresh) < size:
+            num = rng.generate_random_number(is_float=False)
+            if num not in used_set and num not in fresh:
+                fresh.add(num)
+    return time.perf_counter() - start
+
+
+async def main(sizes, existing: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            print(f"{size} numbers per shard, {existing} already used:")
+            for vectorized in (False, True):
+                label = "vectorized" if vectorized else "loop"
+                generation = bench_generation(size, existing, vectorized)
+                totals = await bench(tmp_dir, size, existing, vectorized)
+                print(f"    {label:>10}: generate+dedupe {generation:7.2f}s | populate_shard "
+                      f"int {totals['int']:7.2f}s, float {totals['float']:7.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare populate_shard implementations.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000],
+                        help="Numbers per shard (default: 100000 1000000)")
+    parser.add_argument("--existing", type=int, default=100_000,
+                        help="Values already in the metadata DB per type (default: 100000)")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.sizes, args.existing))
@@ -0,0 +1,88 @@
+"""
+Benchmark: concurrent claims on one shard, through a connection pool vs. a ShardActor.
+
+--concurrency tasks each claim --claim-size numbers at a time until
+--claims claims were made, against a temp shard of --rows rows:
+
+  pool    DatabaseUtils on a ConnectionPool (the server's old layout): every
+          claim is its own BEGIN IMMEDIATE transaction, and the pooled
+          connections wait on each other for the write lock
+  actor   ShardActor: one connection, queued claims run several per transaction
+
+Reports claims per second, transactions committed and duplicate numbers.
+
+    python benchmarks/bench_shard_actor.py --concurrency 1 16 64
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scalable_unique_random_http_server_fastapi_sharded"))
+
+from shard_actor import ShardActor
+from utils.connection_pool import ConnectionPool
+from utils.pooled_db_utils import DatabaseUtils
+
+
+async def run_claims(db, concurrency: int, claims: int, claim_size: int) -> list:
+    remaining = claims
+    claimed = []
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            claimed.extend(await db.claim_batch(claim_size))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return claimed
+
+
+async def bench(layout: str, path: str, args, concurrency: int):
+    if layout == "pool":
+        await DatabaseUtils(path).create_table()  # Switch to WAL before the pooled connections open
+        pool = ConnectionPool(path, size=args.pool_size)
+        await pool.open()
+        db = DatabaseUtils(path, pool=pool)
+    else:
+        db = ShardActor(0, path)
+        await db.start()
+    await db.insert_values([float(v) for v in range(args.rows)])
+
+    start = time.perf_counter()
+    claimed = await run_claims(db, concurrency, args.claims, args.claim_size)
+    seconds = time.perf_counter() - start
+
+    transactions = args.claims if layout == "pool" else db.transactions - 1  # Minus the insert
+    await (pool.close() if layout == "pool" else db.stop())
+    return args.claims / seconds, transactions, len(claimed) - len(set(claimed))
+
+
+async def main(args):
+    print(f"{'layout':>6} {'concurrency':>12} {'claims/s':>10} {'transactions':>13} {'duplicates':>11}")
+    for concurrency in args.concurrency:
+        for layout in ("pool", "actor"):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                rate, transactions, duplicates = await bench(layout, os.path.join(tmp_dir, "shard.db"),
+                                                             args, concurrency)
+            print(f"{layout:>6} {concurrency:>12} {rate:>10.0f} {transactions:>13} {duplicates:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare pooled and actor-owned shard access.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64],
+                        help="Concurrent claimers (default: 1 16 64)")
+    parser.add_argument("--claims", type=int, default=2000, help="Claims per run (default: 2000)")
+    parser.add_argument("--claim-size", type=int, default=1, help="Numbers per claim (default: 1)")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows in the shard (default: 100000)")
+    parser.add_argument("--pool-size", type=int, default=2, help="Connections in the pool layout (default: 2)")
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
@@ -0,0 +1,172 @@
+"""
+Benchmark: throughput of the simple server's HTTP engines under many concurrent clients.
+
+Each engine serves /random from a subprocess, with the simple server's
+request logic (RandomNumberGenerator, UsedNumbersJournal in a temp
+directory):
+
+  stdlib    http.server.HTTPServer, one HTTP/1.0 connection per request
+  asyncio   utils/async_http.py, HTTP/1.1 keep-alive, optionally pipelined
+
+--clients connections send requests back to back for --duration seconds,
+reconnecting whenever the server closes the connection. With --pipeline K,
+each keep-alive connection sends K requests before reading the K responses.
+Every number received is checked against all the others.
+
+    python benchmarks/bench_simple_engines.py --clients 1 16 64 --duration 5
+    python benchmarks/bench_simple_engines.py --clients 64 --pipeline 8
+"""
+
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.async_http import serve
+from utils.persistence_json_utils import UsedNumbersJournal
+from utils.random_number import RandomNumberGenerator
+from utils.response_utils import construct_response
+
+ENGINES = ("stdlib", "asyncio")
+
+
+def serve_engine(engine: str, port: int, state_dir: str):
+    """Run one engine in this process (the --serve mode)."""
+    journal = UsedNumbersJournal(Path(state_dir) / "used_numbers", compact=True)
+    used_numbers = journal.load()
+    generator = RandomNumberGenerator()
+
+    def random_number_response(is_float: bool) -> tuple:
+        for _ in range(100):
+            number = generator.generate_random_number(is_float=is_float)
+            if journal.add_if_absent(number):
+                return 200, construct_response(data=number)
+        return 503, construct_response(error="Could not generate a unique number after multiple attempts.")
+
+    def handle_target(target: bytes) -> tuple:
+        is_float = target.endswith(b"type=float")
+        status, response = random_number_response(is_float)
+        return status, response.encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, response = random_number_response(self.path.endswith("type=float"))
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(response.encode())
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        if engine == "asyncio":
+            asyncio.run(serve(handle_target, host="127.0.0.1", port=port))
+        else:
+            HTTPServer(("127.0.0.1", port), Handler).serve_forever()
+    finally:
+        journal.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def read_response(reader) -> bytes:
+    """Body of one response; reads to EOF when there is no Content-Length."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = None
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    return await (reader.readexactly(length) if length is not None else reader.read())
+
+
+async def client(port: int, deadline: float, pipeline: int, bodies: list, errors: list):
+    request = b"GET /random HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n" * pipeline
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request)
+            for _ in range(pipeline):
+                bodies.append(await read_response(reader))
+            if reader.at_eof():
+                raise ConnectionResetError("closed by server")
+        except (OSError, asyncio.IncompleteReadError) as e:
+            if not isinstance(e, ConnectionResetError):
+                errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load(port: int, clients: int, duration: float, pipeline: int):
+    bodies, errors = [], []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, deadline, pipeline, bodies, errors) for _ in range(clients)))
+    return bodies, errors, time.perf_counter() - start
+
+
+def wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def main(args):
+    print(f"{'engine':>8} {'clients':>8} {'pipeline':>9} {'requests/s':>11} {'errors':>7} {'duplicates':>11}")
+    for engine in args.engines:
+        for clients in args.clients:
+            port = free_port()
+            with tempfile.TemporaryDirectory() as state_dir:
+                server = subprocess.Popen([sys.executable, __file__, "--serve", engine,
+                                           "--port", str(port), "--state-dir", state_dir])
+                try:
+                    wait_for_port(port)
+                    pipeline = args.pipeline if engine == "asyncio" else 1  # HTTP/1.0 closes after one
+                    bodies, errors, seconds = asyncio.run(load(port, clients, args.duration, pipeline))
+                finally:
+                    server.terminate()
+                    server.wait()
+            duplicates = len(bodies) - len(set(bodies))
+            print(f"{engine:>8} {clients:>8} {pipeline:>9} {len(bodies) / seconds:>11.0f} "
+                  f"{len(errors):>7} {duplicates:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the simple server's HTTP engines.")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64],
+                        help="Concurrent connections (default: 1 16 64)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run (default: 5)")
+    parser.add_argument("--pipeline", type=int, default=1,
+                        help="Requests sent per round trip on keep-alive connections (default: 1)")
+    parser.add_argument("--serve", choices=ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--state-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_engine(args.serve, args.port, args.state_dir)
+    else:
+        main(args)
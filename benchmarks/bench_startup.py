@@ -0,0 +1,109 @@
+"""
+Benchmark: startup cost of loading used_numbers from each persistence format.
+
+For each size, the same numbers (half floats, up to the size of the float
+domain, the rest ints) are written as the legacy JSON file, a journal record
+snapshot (.snap) and a binary snapshot (.bsnap), then loaded with the files
+in the page cache:
+
+  json (set) / json (compact)   load_used_numbers, the original format
+  records (.snap)               UsedNumbersJournal.load(), per-record decode
+  binary read_snapshot          np.fromfile of the whole key array
+  binary mmap + verify          SnapshotIndex, checksum pass over the file
+  binary mmap                   SnapshotIndex(verify=False), header only
+
+"first lookup" is the latency of the first `in` after loading, which for the
+mmap variants includes faulting in the pages the binary search touches.
+
+    python benchmarks/bench_startup.py --sizes 1000000 10000000
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from utils.binary_snapshot import SnapshotIndex, read_snapshot, write_snapshot
+from utils.compact_set import FLOAT_TAG, decode
+from utils.persistence_json_utils import UsedNumbersJournal, load_used_numbers
+from utils.random_number import RandomNumberGenerator
+
+
+def make_keys(size: int) -> np.ndarray:
+    """`size` distinct sorted keys: ints, plus as many 6-decimal floats as fit the float domain."""
+    rng = np.random.default_rng(0)
+    float_count = min(size // 2, RandomNumberGenerator.domain_size(True) // 2)
+    floats = rng.choice(RandomNumberGenerator.domain_size(True), float_count, replace=False)
+    ints = np.empty(0, dtype=np.int64)
+    while len(ints) < size - float_count:
+        drawn = rng.integers(0, RandomNumberGenerator.domain_size(False), size - float_count - len(ints))
+        ints = np.union1d(ints, drawn)
+    return np.union1d(ints, floats + FLOAT_TAG).astype(np.int64)
+
+
+def write_files(directory: Path, keys: np.ndarray) -> Path:
+    base = directory / "used_numbers"
+    numbers = [decode(key) for key in keys.tolist()]
+    with open(directory / "used_numbers.json", "w") as f:
+        json.dump(numbers, f)
+    journal = UsedNumbersJournal(base)
+    journal._write_records(Path(f"{base}.snap"), numbers)
+    write_snapshot(directory / "binary.bsnap", keys)
+    return base
+
+
+def timed(load):
+    start = time.perf_counter()
+    result = load()
+    return result, time.perf_counter() - start
+
+
+def load_records(base: Path):
+    journal = UsedNumbersJournal(base)
+    numbers = journal.load()
+    journal.close()
+    return numbers
+
+
+def main(sizes):
+    print(f"{'entries':>10} {'format':>24} {'load':>10} {'first lookup':>13}")
+    for size in sizes:
+        keys = make_keys(size)
+        probe = decode(int(keys[len(keys) // 3]))
+        directory = Path(tempfile.mkdtemp(prefix="bench_startup_"))
+        try:
+            base = write_files(directory, keys)
+            cases = (
+                ("json (set)", lambda: load_used_numbers(directory / "used_numbers.json")),
+                ("json (compact)", lambda: load_used_numbers(directory / "used_numbers.json", compact=True)),
+                ("records (.snap)", lambda: load_records(base)),
+                ("binary read_snapshot", lambda: read_snapshot(directory / "binary.bsnap")),
+                ("binary mmap + verify", lambda: SnapshotIndex(directory / "binary.bsnap")),
+                ("binary mmap", lambda: SnapshotIndex(directory / "binary.bsnap", verify=False)),
+            )
+            for name, load in cases:
+                numbers, seconds = timed(load)
+                if isinstance(numbers, np.ndarray):
+                    _, lookup = timed(lambda: np.searchsorted(numbers, keys[len(keys) // 3]))
+                else:
+                    _, lookup = timed(lambda: probe in numbers)
+                print(f"{size:>10} {name:>24} {seconds * 1e3:>8.1f}ms {lookup * 1e6:>11.1f}us")
+                del numbers
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare startup time of the used-number formats.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000],
+                        help="Used numbers to load (default: 1000000 10000000)")
+    args = parser.parse_args()
+
+    main(args.sizes)
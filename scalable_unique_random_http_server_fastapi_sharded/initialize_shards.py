@@ -7,50 +7,115 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(PROJECT_ROOT))
 
+from utils.metrics import NUMBER_COLLISIONS
 from utils.pooled_db_utils import DatabaseUtils
 from utils.random_number import RandomNumberGenerator
+from utils.vectorized_numbers import unique_candidates
+from shard_topology import ShardTopology
 
-NUM_SHARDS = 4
+# Shards in the initial layout, used until the topology file exists; after
+# that, the file is the source of truth. Size each type for its own demand:
+# NUM_INT_SHARDS int shards (default: half) and the rest float.
+NUM_SHARDS = int(os.environ.get("NUM_SHARDS", "4"))
+NUM_INT_SHARDS = int(os.environ.get("NUM_INT_SHARDS", str(NUM_SHARDS // 2)))
 SHARD_DIR = str(PROJECT_ROOT / "shards")
+TOPOLOGY_FILE = "topology.json"  # In SHARD_DIR
 META_DIR = str(PROJECT_ROOT / "meta")
 INT_META_DB = os.path.join(META_DIR, "used_numbers_int.db")
 FLOAT_META_DB = os.path.join(META_DIR, "used_numbers_float.db")
 INITIAL_FILL_SIZE = 5000
+VECTORIZED_FILL = True  # Generate and dedupe candidates with NumPy instead of one at a time
+REFILL_ROUNDS = 20  # Rounds of drawing again the numbers that collided with used ones
+# Number-space partition of this deployment; must match the server's settings.
+NODE_ID = int(os.environ.get("NODE_ID", "0"))
+PARTITION_COUNT = int(os.environ.get("PARTITION_COUNT", "1"))
+
+def load_topology() -> ShardTopology:
+    return ShardTopology(os.path.join(SHARD_DIR, TOPOLOGY_FILE), default_shards=NUM_SHARDS,
+                         default_int_shards=NUM_INT_SHARDS)
 
 def ensure_directories():
     os.makedirs(SHARD_DIR, exist_ok=True)
     os.makedirs(META_DIR, exist_ok=True)
 
-async def populate_shard(shard_idx: int, count: int, meta_db_path: str, rng: RandomNumberGenerator):
-    is_integer = shard_idx < 2
-    shard_path = os.path.join(SHARD_DIR, f"shard_{shard_idx}.db")
+async def populate_shard(shard_idx: int, count: int, meta_db_path: str, rng: RandomNumberGenerator,
+                         vectorized: bool = None, is_float: bool = None, shard_path: str = None,
+                         shard_db=None):
+    """
+    Fill a shard with `count` numbers that are not yet in the metadata DB.
+    With `vectorized` (default: VECTORIZED_FILL), candidates are generated and
+    deduplicated in bulk with NumPy (only `rng`'s partition is used); otherwise
+    one at a time with `rng`. Candidates are drawn in a worker thread, outside
+    any transaction, then recorded with insert_new_values: one short write
+    transaction per round that only touches the batch, however long the
+    history. Concurrent refills (other shards, other processes) never record
+    the same number; the ones that collide are drawn again, for up to
+    REFILL_ROUNDS rounds.
+    The shard's type and file default to its entry in the topology.
+    `shard_db`: what the numbers are inserted through (e.g. the shard's
+    ShardActor); by default a DatabaseUtils on the shard file.
+    Returns the number of values added.
+    """
+    if is_float is None or shard_path is None:
+        topology = load_topology()
+        is_float = topology.is_float(shard_idx) if is_float is None else is_float
+        shard_path = topology.shard_path(shard_idx) if shard_path is None else shard_path
+    is_integer = not is_float
+    vectorized = VECTORIZED_FILL if vectorized is None else vectorized
 
-    shard_db = DatabaseUtils(shard_path)
+    if shard_db is None:
+        shard_db = DatabaseUtils(shard_path)
+        await shard_db.create_table()
     meta_db = DatabaseUtils(meta_db_path, "used_numbers")
-    await shard_db.create_table()
     await meta_db.create_table(is_metadata=True)
 
-    fresh_numbers = set()
-    existing = set(await meta_db.fetch_all_values())
-
-    while len(fresh_numbers) < count:
-        num = rng.generate_random_number(is_float=not is_integer)
-        if num not in existing and num not in fresh_numbers:
-            fresh_numbers.add(num)
+    def draw(shortfall: int) -> list:
+        """`shortfall` distinct candidates; the metadata DB filters out the used ones."""
+        if vectorized:
+            return unique_candidates(shortfall, not is_integer, (),
+                                     node_id=rng.node_id, partition_count=rng.partition_count).tolist()
+        candidates = set()
+        while len(candidates) < shortfall:
+            candidates.add(rng.generate_random_number(is_float=not is_integer))
+        return list(candidates)
 
-    await shard_db.insert_values(list(fresh_numbers))
-    await meta_db.insert_values(list(fresh_numbers))
+    # Record the numbers as used before they reach the shard: a crash in between
+    # burns them instead of letting them be generated again.
+    fresh_numbers = []
+    for _ in range(REFILL_ROUNDS):
+        shortfall = count - len(fresh_numbers)
+        if shortfall <= 0:
+            break
+        candidates = await asyncio.to_thread(draw, shortfall)
+        new_numbers = await meta_db.insert_new_values(candidates)
+        if len(new_numbers) < len(candidates):
+            NUMBER_COLLISIONS.labels("populate_shard").inc(len(candidates) - len(new_numbers))
+        fresh_numbers += new_numbers
+    else:
+        if len(fresh_numbers) < count:
+            print(f"Shard {shard_idx}: only {len(fresh_numbers)} of {count} new numbers found; the domain is nearly full.")
+    await shard_db.insert_values(fresh_numbers)
     print(f"Shard {shard_idx} populated with {len(fresh_numbers)} values.")
+    return len(fresh_numbers)
 
 async def main():
     ensure_directories()
-    rng = RandomNumberGenerator()
+    rng = RandomNumberGenerator(node_id=NODE_ID, partition_count=PARTITION_COUNT)
+    topology = load_topology()
+
+    filled = topology.ids(states=ShardTopology.REFILLED_STATES)
+    for shard_idx in filled:
+        is_float = topology.is_float(shard_idx)
+        await populate_shard(shard_idx, INITIAL_FILL_SIZE, FLOAT_META_DB if is_float else INT_META_DB, rng,
+                             is_float=is_float, shard_path=topology.shard_path(shard_idx))
 
-    for shard_idx in range(NUM_SHARDS):
-        if shard_idx < 2:
-            await populate_shard(shard_idx, INITIAL_FILL_SIZE, INT_META_DB, rng)
-        else:
-            await populate_shard(shard_idx, INITIAL_FILL_SIZE, FLOAT_META_DB, rng)
+    def activate(topology):
+        # Re-read under the lock: a running server may have changed the layout meanwhile
+        for shard_idx in filled:
+            if shard_idx in topology.shards:
+                topology.set_state(shard_idx, "active")
+    topology.update(activate)
+    print(f"Shard topology saved to {topology.path}.")
 
 if __name__ == "__main__":
     asyncio.run(main())
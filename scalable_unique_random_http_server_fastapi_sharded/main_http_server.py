@@ -1,88 +1,493 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import Literal, Optional
 import asyncio
 import os
 import random
+import socket
 import sys
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(PROJECT_ROOT))
 
-from utils.pooled_db_utils import DatabaseUtils
+from utils.metrics import REGISTRY, MetricsMiddleware
+from utils.fast_asgi import FastRandomApp, json_body
+from utils.stream_utils import StreamStats, stream_numbers
 from utils.random_number import RandomNumberGenerator
-from initialize_shards import populate_shard
+from utils.pooled_db_utils import DatabaseUtils
+from initialize_shards import load_topology, populate_shard
+from prefetch_buffer import ShardPrefetchBuffer
+from refill_scheduler import RefillScheduler
+from shard_actor import ShardActor
+from shard_leases import ShardLeaseManager
+from shard_topology import ShardTopology
 
 app = FastAPI()
 
-NUM_SHARDS = 4
-REFILL_THRESHOLD = 100
-REFILL_BATCH_SIZE = 100
+METRICS_ENABLED = True  # Count and time requests for /metrics
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Int and float shards are separate pools: requests are routed by ?type=, and
+# the settings keyed by type below let each pool be sized for its own demand.
+NUMBER_TYPES = ShardTopology.TYPES
+
+# Background shard refills, one scheduler per type (see refill_scheduler.py)
+REFILL_LOW_WATERMARK = {"int": 1000, "float": 1000}   # Refill a shard once fewer unused numbers than this remain
+REFILL_HIGH_WATERMARK = {"int": 5000, "float": 5000}  # ...back up to this many
+REFILL_CHECK_INTERVAL = 1.0   # Seconds between depth checks
+MAX_COUNT = 1000  # Server-side cap on /random?count=N
+STREAM_BATCH_SIZE = 100   # Numbers popped per shard visit by /random/stream
+STREAM_MAX_RATE = 10000   # Server-side cap, in numbers per second, for each stream
+# Each leased shard's database is used by one task with one connection (see shard_actor.py)
+SHARD_QUEUE_SIZE = 1024  # Operations that can wait for a shard's task before submitters block
+SHARD_MAX_BATCH = 64     # Queued operations run in one transaction
+SHARD_SELECTION = "probe"  # How unused rows are picked; see DatabaseUtils.SELECTION_STRATEGIES
+
+# In-memory prefetch buffers in front of each shard, per type (see prefetch_buffer.py)
+PREFETCH_BUFFER_SIZE = {"int": 1000, "float": 1000}   # Numbers kept claimed in memory per shard
+PREFETCH_LOW_WATERMARK = {"int": 200, "float": 200}   # Refill the buffer in the background below this level
+# What to do with numbers claimed but not served when the process died:
+# "burn" never serves them (safe), "release" returns them to the shard at startup.
+CLAIMED_ON_STARTUP = "burn"
+# Serve plain GET /random from pre-built response bodies through `fast_app`
+# (see utils/fast_asgi.py); run `uvicorn main_http_server:fast_app` to use it.
+PREBUILT_BODIES = True
 
 SHARD_DIR = str(PROJECT_ROOT / "shards")
 META_DIR = str(PROJECT_ROOT / "meta")
 INT_META_DB = os.path.join(META_DIR, "used_numbers_int.db")
 FLOAT_META_DB = os.path.join(META_DIR, "used_numbers_float.db")
 
-ACTIVE_INT_SHARDS = [0, 1]
-ACTIVE_FLOAT_SHARDS = [2, 3]
-REQUEST_COUNTER = 0
-REFILL_LOCK = asyncio.Lock()
-REFILL_INDEX = 0
+# Shard leases between worker processes (see shard_leases.py)
+COORDINATION_DB = os.path.join(META_DIR, "shard_leases.db")
+LEASE_TTL = 10.0               # Seconds a lease lasts without renewal
+LEASE_HEARTBEAT_INTERVAL = 3.0
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+# Instances with distinct NODE_IDs (0 .. PARTITION_COUNT - 1) fill their shards
+# from disjoint slices of the number space, so separate deployments (separate
+# metadata DBs) never collide. Workers of one deployment share a NODE_ID.
+NODE_ID = int(os.environ.get("NODE_ID", "0"))
+PARTITION_COUNT = int(os.environ.get("PARTITION_COUNT", "1"))
+
+# Shard layout (ids, types, paths, weights, states); see shard_topology.py.
+# Without shards/topology.json, the same default layout as initialize_shards.py:
+# NUM_SHARDS shards, the first NUM_INT_SHARDS int and the rest float.
+TOPOLOGY = load_topology()
+TOPOLOGY_SYNC_INTERVAL = 2.0  # Seconds between checks for topology changes made by other workers
+
+# Shards this worker holds a lease on and routes requests to
+ACTIVE_INT_SHARDS = []
+ACTIVE_FLOAT_SHARDS = []
+ACTIVE_SHARDS = {"int": ACTIVE_INT_SHARDS, "float": ACTIVE_FLOAT_SHARDS}
+# Created when a shard is first leased
+SHARD_ACTORS = {}
+SHARD_BUFFERS = {}
+# Leases only decide which worker buffers and refills a shard. A worker with no
+# stocked leased shard of a type (e.g. more workers than shards of that type)
+# claims straight from the other workers' shards through these actors, so it
+# never turns requests away while any shard of the type has numbers left.
+DIRECT_ACTORS = {}
+DIRECT_START_LOCK = asyncio.Lock()
+
+def shard_type(shard_idx: int) -> str:
+    return "float" if TOPOLOGY.is_float(shard_idx) else "int"
+
+def shard_buffer(shard_idx: int) -> ShardPrefetchBuffer:
+    if shard_idx not in SHARD_BUFFERS:
+        number_type = shard_type(shard_idx)
+        SHARD_ACTORS[shard_idx] = ShardActor(shard_idx, TOPOLOGY.shard_path(shard_idx), selection=SHARD_SELECTION,
+                                             queue_size=SHARD_QUEUE_SIZE, max_batch=SHARD_MAX_BATCH)
+        SHARD_BUFFERS[shard_idx] = ShardPrefetchBuffer(
+            shard_idx,
+            SHARD_ACTORS[shard_idx],
+            buffer_size=PREFETCH_BUFFER_SIZE[number_type],
+            low_watermark=PREFETCH_LOW_WATERMARK[number_type],
+            claimed_on_startup=CLAIMED_ON_STARTUP,
+            serialize=(lambda number: json_body({"shard": shard_idx, "number": number})) if PREBUILT_BODIES else None,
+        )
+    return SHARD_BUFFERS[shard_idx]
+
+def refresh_routes():
+    """Route to the leased shards that are active or draining; filling shards are not served yet."""
+    for number_type, active in ACTIVE_SHARDS.items():
+        active[:] = [idx for idx in TOPOLOGY.ids(number_type, ShardTopology.ROUTED_STATES)
+                     if idx in SHARD_BUFFERS and SHARD_BUFFERS[idx].running]
+
+def pick_shard(shards: list):
+    """
+    One of `shards` that has stock, with probability proportional to its
+    weight times its remaining stock; None when none of them has any left.
+    """
+    stocked = [idx for idx in shards if SHARD_BUFFERS[idx].stock > 0]
+    if not stocked:
+        return None
+    return random.choices(stocked, weights=[TOPOLOGY.weight(idx) * SHARD_BUFFERS[idx].stock for idx in stocked])[0]
+
+def update_topology(change):
+    """Apply change(TOPOLOGY) to the latest saved topology and save it, locked against other workers."""
+    result = TOPOLOGY.update(change)
+    SHARD_LEASES.set_groups(TOPOLOGY.groups())
+    refresh_routes()
+    return result
+
+def refilled_shards(number_type: str) -> list:
+    """Leased shards of a type that its refill scheduler keeps stocked: filling and active, not draining."""
+    return [idx for idx in TOPOLOGY.ids(number_type, ShardTopology.REFILLED_STATES) if idx in SHARD_LEASES.owned]
+
+def notify_refill(shards: list):
+    """Wake the refill schedulers of the types of `shards` for an immediate check."""
+    for number_type in {shard_type(idx) for idx in shards if idx in TOPOLOGY.shards}:
+        REFILL_SCHEDULERS[number_type].notify()
+
+def type_stock(number_type: str) -> int:
+    """Numbers this worker can still serve of a type, from its routed shards' stock counts."""
+    return sum(SHARD_BUFFERS[idx].stock for idx in ACTIVE_SHARDS[number_type])
+
+STREAM_STATS = StreamStats()
+
+# Gauges refreshed when /metrics is scraped
+SHARD_DEPTH = REGISTRY.gauge("shard_depth", "Numbers a leased shard can still serve.", ("shard",))
+SHARD_BUFFER_DEPTH = REGISTRY.gauge("shard_buffer_depth", "Numbers in a leased shard's prefetch buffer.", ("shard",))
+TYPE_STOCK = REGISTRY.gauge("type_stock", "Numbers this worker's routed shards can still serve, per type.", ("type",))
+STREAM_NUMBERS = REGISTRY.counter("stream_numbers_total", "Numbers reserved by /random/stream.", ("outcome",))
+
+async def shard_depth(shard_idx: int) -> int:
+    """Numbers the shard can still serve: unused rows plus its prefetch buffer. Also resyncs its stock."""
+    return await SHARD_BUFFERS[shard_idx].sync_stock()
+
+async def pop_numbers(shards: list, count: int = None):
+    """
+    (shard, numbers) from a shard chosen by pick_shard, failing over to the
+    next shard with stock when one turns out to be empty; (None, []) only when
+    every shard in `shards` is empty. With `count`, up to `count` numbers
+    claimed from one shard in bulk (fewer only if that shard runs low).
+    """
+    candidates = list(shards)
+    while True:
+        shard_idx = pick_shard(candidates)
+        if shard_idx is None:
+            notify_refill(shards)
+            return None, []
+        buffer = SHARD_BUFFERS[shard_idx]
+        if count is not None:
+            numbers = await buffer.pop_many(count)
+        else:
+            number = await buffer.pop()
+            numbers = [] if number is None else [number]
+        if numbers:
+            return shard_idx, numbers
+        notify_refill([shard_idx])
+        candidates.remove(shard_idx)
+
+async def pop_count(shards: list, count: int):
+    """
+    (first shard, numbers): `count` numbers from pop_numbers, topping up a
+    shard's shortfall from the other shards with stock. Fewer than `count`
+    only when every shard in `shards` is empty; (None, []) when none has any.
+    """
+    shard_idx, numbers = await pop_numbers(shards, count)
+    while numbers and len(numbers) < count:
+        # The short shard's stock is now 0, so pick_shard moves on to another one
+        _, more = await pop_numbers(shards, count - len(numbers))
+        if not more:
+            break
+        numbers += more
+    return shard_idx, numbers
+
+async def direct_actor(shard_idx: int) -> ShardActor:
+    actor = DIRECT_ACTORS.get(shard_idx)
+    if actor is None:
+        actor = DIRECT_ACTORS[shard_idx] = ShardActor(
+            shard_idx, TOPOLOGY.shard_path(shard_idx), selection=SHARD_SELECTION,
+            queue_size=SHARD_QUEUE_SIZE, max_batch=SHARD_MAX_BATCH)
+    if not actor.is_running:
+        async with DIRECT_START_LOCK:
+            if not actor.is_running:
+                await actor.start()
+    return actor
+
+async def stop_direct_actor(shard_idx: int):
+    actor = DIRECT_ACTORS.pop(shard_idx, None)
+    if actor is not None:
+        await actor.stop()
+
+async def claim_direct(number_type: str, count: int, one_shard: bool = False):
+    """
+    (first shard, numbers): up to `count` numbers claimed straight from routed
+    shards of the type that this worker holds no lease on, in random order
+    (with `one_shard`, all from the first one that has any).
+    Each claim is one BEGIN IMMEDIATE transaction that marks the rows used,
+    so it never overlaps with the lease owner's buffer or other workers.
+    """
+    shards = [idx for idx in TOPOLOGY.ids(number_type, ShardTopology.ROUTED_STATES)
+              if idx not in SHARD_LEASES.owned]
+    for shard_idx in [idx for idx in DIRECT_ACTORS if idx not in shards and shard_type(idx) == number_type]:
+        await stop_direct_actor(shard_idx)  # Removed from the topology, or leased here since
+    random.shuffle(shards)
+    first, numbers = None, []
+    for shard_idx in shards:
+        actor = await direct_actor(shard_idx)
+        claimed = await actor.claim_batch(count - len(numbers), mark=DatabaseUtils.USED)
+        if claimed:
+            first = shard_idx if first is None else first
+            numbers += claimed
+        if len(numbers) == count or (one_shard and numbers):
+            break
+    return first, numbers
+
+async def refill_shard(shard_idx: int, count: int):
+    is_float = TOPOLOGY.is_float(shard_idx)
+    rng = RandomNumberGenerator(node_id=NODE_ID, partition_count=PARTITION_COUNT)
+    added = await populate_shard(shard_idx, count, FLOAT_META_DB if is_float else INT_META_DB, rng,
+                                 is_float=is_float, shard_path=TOPOLOGY.shard_path(shard_idx),
+                                 shard_db=SHARD_ACTORS[shard_idx])
+    SHARD_BUFFERS[shard_idx].add_stock(added)
+    # Let a buffer that ran dry pick up the new rows right away
+    SHARD_BUFFERS[shard_idx].schedule_fill()
+    if TOPOLOGY.state(shard_idx) == "filling":
+        update_topology(lambda topology: topology.set_state(shard_idx, "active"))
+        print(f"Shard {shard_idx} is filled and now routed to.")
+
+async def acquire_shard(shard_idx: int):
+    await stop_direct_actor(shard_idx)  # Served from the buffer from now on
+    buffer = shard_buffer(shard_idx)
+    await SHARD_ACTORS[shard_idx].start()  # Creates new shards; adds the (used, id) index to older shard files
+    await buffer.start()
+    refresh_routes()
+
+async def release_shard(shard_idx: int):
+    for active in (ACTIVE_INT_SHARDS, ACTIVE_FLOAT_SHARDS):
+        if shard_idx in active:
+            active.remove(shard_idx)
+    await SHARD_BUFFERS[shard_idx].stop()
+    await SHARD_ACTORS[shard_idx].stop()
+
+async def sync_topology():
+    """
+    Pick up shards added or drained by other workers, route the filling
+    shards this worker owns once they are stocked, and remove the draining
+    ones once they are empty.
+    """
+    while True:
+        try:
+            if TOPOLOGY.reload_if_changed():
+                SHARD_LEASES.set_groups(TOPOLOGY.groups())
+                refresh_routes()
+            for shard_idx in TOPOLOGY.ids(states=("filling",)):
+                # E.g. a shard file that was filled before it was added
+                if (shard_idx in SHARD_LEASES.owned
+                        and await shard_depth(shard_idx) >= REFILL_LOW_WATERMARK[shard_type(shard_idx)]):
+                    update_topology(lambda topology: topology.set_state(shard_idx, "active"))
+                    print(f"Shard {shard_idx} is filled and now routed to.")
+            for shard_idx in TOPOLOGY.ids(states=("draining",)):
+                if shard_idx in SHARD_LEASES.owned and await shard_depth(shard_idx) == 0:
+                    update_topology(lambda topology: topology.remove_shard(shard_idx))
+                    print(f"Shard {shard_idx} is drained and was removed.")
+        except Exception as e:
+            print(f"Topology sync failed: {e}")
+        await asyncio.sleep(TOPOLOGY_SYNC_INTERVAL)
+
+SHARD_LEASES = ShardLeaseManager(
+    COORDINATION_DB,
+    WORKER_ID,
+    TOPOLOGY.groups(),
+    acquire_shard,
+    release_shard,
+    lease_ttl=LEASE_TTL,
+    heartbeat_interval=LEASE_HEARTBEAT_INTERVAL,
+)
+
+REFILL_SCHEDULERS = {
+    number_type: RefillScheduler(
+        lambda number_type=number_type: refilled_shards(number_type),  # Only the lease owner refills a shard
+        shard_depth,
+        refill_shard,
+        low_watermark=REFILL_LOW_WATERMARK[number_type],
+        high_watermark=REFILL_HIGH_WATERMARK[number_type],
+        interval=REFILL_CHECK_INTERVAL,
+    )
+    for number_type in NUMBER_TYPES
+}
+
+TOPOLOGY_SYNC_TASK = None
 
 @app.on_event("startup")
 async def on_startup():
-    for shard_idx in range(NUM_SHARDS):
-        shard_path = os.path.join(SHARD_DIR, f"shard_{shard_idx}.db")
+    global TOPOLOGY_SYNC_TASK
+    for shard_idx in TOPOLOGY.ids(states=("active",)):
+        shard_path = TOPOLOGY.shard_path(shard_idx)
         if not os.path.exists(shard_path):
             raise RuntimeError(f"Missing shard: {shard_path}")
+    if not TOPOLOGY.path.exists():
+        # Persist the default layout so shards can be added and drained (unless another worker just did)
+        TOPOLOGY.update(lambda topology: None)
+    await SHARD_LEASES.start()
+    for scheduler in REFILL_SCHEDULERS.values():
+        scheduler.start()
+    TOPOLOGY_SYNC_TASK = asyncio.create_task(sync_topology())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if TOPOLOGY_SYNC_TASK is not None:
+        TOPOLOGY_SYNC_TASK.cancel()
+    for scheduler in REFILL_SCHEDULERS.values():
+        await scheduler.stop()
+    await SHARD_LEASES.stop()  # Stops the buffers and pools of every leased shard
+    for shard_idx in list(DIRECT_ACTORS):
+        await stop_direct_actor(shard_idx)
+
+def request_type(type: str) -> str:
+    """The shard pool for a ?type= value: "float" for floats in any case, "int" for anything else, as in the other servers."""
+    return "float" if type.lower() == "float" else "int"
 
 @app.get("/random")
-async def get_random():
-    global REQUEST_COUNTER, REFILL_INDEX
-    active_shards = ACTIVE_INT_SHARDS + ACTIVE_FLOAT_SHARDS
-    if not active_shards:
-        raise HTTPException(status_code=503, detail="All shards are being refilled")
-
-    shard_idx = random.choice(active_shards)
-    shard_path = os.path.join(SHARD_DIR, f"shard_{shard_idx}.db")
-    db = DatabaseUtils(shard_path)
-    number = await db.pop_random_number()
-    
-    if number is None:
-        raise HTTPException(status_code=503, detail=f"Shard {shard_idx} is empty.")
-
-    REQUEST_COUNTER += 1
-
-    # Trigger refill logic
-    if REQUEST_COUNTER >= REFILL_THRESHOLD:
-        async with REFILL_LOCK:
-            if REQUEST_COUNTER >= REFILL_THRESHOLD:  # Double-check inside lock
-                await refill_one_shard()
-                REQUEST_COUNTER = 0
-
-    return {"shard": shard_idx, "number": number}
-
-async def refill_one_shard():
-    global REFILL_INDEX
-    shard_idx = REFILL_INDEX % NUM_SHARDS
-    REFILL_INDEX += 1
-
-    print(f"Refilling shard {shard_idx}...")
-
-    if shard_idx < 2:
-        ACTIVE_INT_SHARDS.remove(shard_idx)
-        meta = INT_META_DB
+async def get_random(type: str = "int", count: Optional[int] = Query(None, ge=1, le=MAX_COUNT)):
+    """
+    Serve one number of the requested type, or with `count` up to `count`
+    numbers claimed in bulk, from one shard or topped up from others (fewer
+    only if every shard of the type runs low; "shard" is the first one).
+    Empty shards are skipped, and what this worker's leased shards cannot
+    supply is claimed from the others (claim_direct); 503 only when every
+    routed shard of the type is empty.
+    """
+    number_type = request_type(type)
+    active_shards = ACTIVE_SHARDS[number_type]
+    wanted = 1 if count is None else count
+    if count is not None:
+        shard_idx, numbers = await pop_count(active_shards, count)
     else:
-        ACTIVE_FLOAT_SHARDS.remove(shard_idx)
-        meta = FLOAT_META_DB
+        shard_idx, numbers = await pop_numbers(active_shards)
+    if len(numbers) < wanted:
+        direct_idx, more = await claim_direct(number_type, wanted - len(numbers))
+        shard_idx = direct_idx if shard_idx is None else shard_idx
+        numbers += more
+    if not numbers:
+        raise HTTPException(status_code=503, detail=f"Every {number_type} shard is empty.")
 
-    rng = RandomNumberGenerator()
-    await populate_shard(shard_idx, REFILL_BATCH_SIZE, meta, rng)
+    if count is not None:
+        return {"shard": shard_idx, "numbers": numbers}
+    return {"shard": shard_idx, "number": numbers[0]}
 
-    # Reactivate shard
-    if shard_idx < 2:
-        ACTIVE_INT_SHARDS.append(shard_idx)
-    else:
-        ACTIVE_FLOAT_SHARDS.append(shard_idx)
+# Fast path for /random, /random?type=int and /random?type=float: a pre-built
+# body from a leased shard of the type. None passes the request on to get_random
+# (direct claims from other workers' shards, errors).
+def fast_random(number_type: str):
+    async def handler():
+        shard_idx = pick_shard(ACTIVE_SHARDS[number_type])
+        if shard_idx is None:
+            return None
+        return await SHARD_BUFFERS[shard_idx].pop_body()
+    return handler
+
+@app.get("/random/stream")
+async def stream_random(
+    type: str = "int",
+    limit: Optional[int] = Query(None, ge=1),
+    rate: Optional[float] = Query(None, gt=0),
+):
+    """
+    Stream unique numbers of the requested type as newline-delimited JSON,
+    popping them from a random active shard in batches, until `limit`, shard
+    exhaustion or disconnect.
+    """
+    number_type = request_type(type)
+    active_shards = ACTIVE_SHARDS[number_type]
+    last_source = None  # Buffer, or actor for a direct claim, of the most recent batch
+
+    async def reserve(count):
+        nonlocal last_source
+        shard_idx, numbers = await pop_numbers(active_shards, count)
+        if shard_idx is not None:
+            last_source = SHARD_BUFFERS[shard_idx]
+            return numbers
+        shard_idx, numbers = await claim_direct(number_type, count, one_shard=True)
+        if shard_idx is not None:
+            last_source = DIRECT_ACTORS.get(shard_idx)
+        return numbers
+
+    async def release(numbers):
+        # Unsent numbers always come from the most recently reserved batch
+        if isinstance(last_source, ShardPrefetchBuffer):
+            last_source.release(numbers)
+        elif last_source is not None and last_source.is_running:
+            await last_source.set_used_flag(numbers, DatabaseUtils.UNUSED)
+
+    max_rate = min(rate, STREAM_MAX_RATE) if rate else STREAM_MAX_RATE
+    return StreamingResponse(
+        stream_numbers(reserve, limit=limit, batch_size=STREAM_BATCH_SIZE,
+                       max_rate=max_rate, release=release, stats=STREAM_STATS),
+        media_type="application/x-ndjson",
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text-format metrics for this worker process."""
+    SHARD_DEPTH.clear()
+    SHARD_BUFFER_DEPTH.clear()
+    for shard_idx in sorted(SHARD_LEASES.owned):
+        SHARD_DEPTH.labels(str(shard_idx)).set(await shard_depth(shard_idx))
+        SHARD_BUFFER_DEPTH.labels(str(shard_idx)).set(len(SHARD_BUFFERS[shard_idx].buffer))
+    for number_type in NUMBER_TYPES:
+        TYPE_STOCK.labels(number_type).set(type_stock(number_type))
+    for outcome in ("sent", "released", "burned"):
+        STREAM_NUMBERS.labels(outcome).set(getattr(STREAM_STATS, outcome))
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+class NewShard(BaseModel):
+    type: Literal["int", "float"]
+    weight: float = 1.0
+
+@app.get("/admin/shards")
+async def list_shards():
+    """The shard topology, the shards this worker serves and their stock per type."""
+    TOPOLOGY.reload_if_changed()
+    return {
+        "shards": [TOPOLOGY.shards[idx] for idx in TOPOLOGY.ids()],
+        "worker": WORKER_ID,
+        "leased": sorted(SHARD_LEASES.owned),
+        "routed": ACTIVE_SHARDS,
+        "stock": {number_type: type_stock(number_type) for number_type in NUMBER_TYPES},
+    }
+
+@app.post("/admin/shards", status_code=201)
+async def add_shard(shard: NewShard):
+    """
+    Add an empty shard. It is leased and pre-filled in the background, and
+    routed to once its first refill completes.
+    """
+    if shard.weight <= 0:
+        raise HTTPException(status_code=422, detail="Shard weight must be positive.")
+    entry = update_topology(lambda topology: topology.add_shard(shard.type, shard.weight))
+    REFILL_SCHEDULERS[shard.type].notify()
+    return entry
+
+@app.post("/admin/shards/{shard_idx}/drain")
+async def drain_shard(shard_idx: int):
+    """Stop refilling a shard; it is served until empty, then removed."""
+    def drain(topology):
+        if shard_idx not in topology.shards:
+            raise HTTPException(status_code=404, detail=f"Shard {shard_idx} does not exist.")
+        topology.set_state(shard_idx, "draining")
+        return topology.shards[shard_idx]
+    return update_topology(drain)
+
+@app.delete("/admin/shards/{shard_idx}")
+async def remove_shard(shard_idx: int):
+    """
+    Remove a shard right away. Its unserved numbers are never served (they
+    stay recorded as used); drain the shard first to serve them.
+    """
+    def remove(topology):
+        if shard_idx not in topology.shards:
+            raise HTTPException(status_code=404, detail=f"Shard {shard_idx} does not exist.")
+        return topology.remove_shard(shard_idx)
+    return update_topology(remove)
 
-    print(f"Shard {shard_idx} refilled and reactivated.")
+# Serves GET /random (plain, type=int, type=float) itself and passes everything else to `app`
+FAST_HANDLERS = {b"": fast_random("int"), b"type=int": fast_random("int"), b"type=float": fast_random("float")}
+fast_app = FastRandomApp(FAST_HANDLERS if PREBUILT_BODIES else {}, fallback=app,
+                         registry=REGISTRY if METRICS_ENABLED else None)
@@ -0,0 +1,196 @@
+import asyncio
+from collections import deque
+from pathlib import Path
+import sys
+
+# Adjust path to import utils modules
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from utils.pooled_db_utils import DatabaseUtils
+
+
+class ShardPrefetchBuffer:
+    """
+    In-memory queue of numbers claimed from one shard database.
+
+    `db` is the shard's DatabaseUtils, or its ShardActor (see shard_actor.py),
+    which has the same claim/confirm/release methods.
+
+    Numbers are claimed from the shard in batches (one transaction each) and
+    kept in a deque, so serving a request is a deque pop. When the buffer drops
+    below `low_watermark` a background task tops it back up to `buffer_size`.
+
+    Crash semantics (`claimed_on_startup`):
+    - "burn": rows are marked used when they are claimed. Numbers that were
+      buffered but not served when the process died are never handed out
+      again (counted as burned). Uniqueness is never at risk.
+    - "release": rows are marked claimed, and served numbers are confirmed as
+      used on every refill and at shutdown. Rows still marked claimed at
+      startup are released back to the pool. Nothing is wasted, but numbers
+      served after the last confirmation before a crash can be served again.
+    On a clean shutdown, buffered numbers that were never served are released
+    back to the shard in both modes.
+
+    With `serialize` (number -> bytes), each number's response body is built
+    when it is buffered, off the request path, and pop_body() returns it.
+
+    `stock` is the in-memory count of numbers the shard can still serve
+    (unused rows plus the buffer), for routing without a database query. It
+    is counted at start(), kept up to date by pops, releases and add_stock()
+    (refills), set to 0 when the shard comes back empty, and can be
+    corrected from the database with sync_stock().
+    """
+
+    def __init__(self, shard_idx: int, db, buffer_size: int = 1000,
+                 low_watermark: int = 200, claimed_on_startup: str = "burn", serialize=None):
+        if claimed_on_startup not in ("burn", "release"):
+            raise ValueError(f"Unknown claimed_on_startup policy: {claimed_on_startup}")
+        self.shard_idx = shard_idx
+        self.db = db
+        self.buffer_size = buffer_size
+        self.low_watermark = low_watermark
+        self.claimed_on_startup = claimed_on_startup
+        self.buffer = deque()
+        self.serialize = serialize
+        self.bodies = deque()  # Response bodies of the buffered numbers, in the same order (with `serialize`)
+        self.served = []  # Served since the last confirmation ("release" mode only)
+        self.running = False  # Claims new rows only between start() and stop()
+        self.stock = 0
+        self._fill_lock = asyncio.Lock()
+        self._fill_task = None
+
+    @property
+    def claim_mark(self) -> int:
+        return DatabaseUtils.USED if self.claimed_on_startup == "burn" else DatabaseUtils.CLAIMED
+
+    async def start(self):
+        """Resolve claims left over by a crash, then fill the buffer."""
+        mark = DatabaseUtils.USED if self.claimed_on_startup == "burn" else DatabaseUtils.UNUSED
+        leftover = await self.db.resolve_claimed(mark)
+        if leftover:
+            action = "Burned" if mark == DatabaseUtils.USED else "Released"
+            print(f"{action} {leftover} numbers left claimed in shard {self.shard_idx}.")
+        self.running = True
+        await self.fill()
+        await self.sync_stock()
+
+    async def sync_stock(self) -> int:
+        """Recount the stock from the database (unused rows plus the buffer) and return it."""
+        unused = await self.db.count_unused()
+        self.stock = unused + len(self.buffer)
+        return self.stock
+
+    def add_stock(self, count: int):
+        """Account for `count` numbers added to the shard (e.g. by a refill)."""
+        self.stock += count
+
+    async def stop(self):
+        """Confirm served numbers and release the unserved ones back to the shard."""
+        self.running = False
+        self.stock = 0
+        if self._fill_task is not None:
+            await self._fill_task
+        async with self._fill_lock:
+            await self._confirm_served()
+            unserved = list(self.buffer)
+            self.buffer.clear()
+            self.bodies.clear()
+            await self.db.set_used_flag(unserved, DatabaseUtils.UNUSED)
+
+    async def pop(self):
+        """
+        Return the next buffered number, or None when the shard has nothing left.
+        Only waits on the database if the buffer has run completely dry.
+        """
+        if not self.buffer:
+            await self.fill()
+        if not self.buffer:
+            self.stock = 0
+            return None
+        number = self.buffer.popleft()
+        if self.serialize is not None:
+            self.bodies.popleft()
+        self._popped(number)
+        return number
+
+    async def pop_body(self):
+        """Like pop(), but return the number's pre-built response body (needs `serialize`)."""
+        if not self.buffer:
+            await self.fill()
+        if not self.buffer:
+            self.stock = 0
+            return None
+        number = self.buffer.popleft()
+        body = self.bodies.popleft()
+        self._popped(number)
+        return body
+
+    def _popped(self, number):
+        self.stock = max(0, self.stock - 1)
+        if self.claimed_on_startup == "release":
+            self.served.append(number)
+        if len(self.buffer) < self.low_watermark:
+            self.schedule_fill()
+
+    async def pop_many(self, count: int) -> list:
+        """
+        Return up to `count` numbers: whatever the buffer holds first, then the
+        shortfall claimed straight from the shard in one transaction.
+        Returns fewer than `count` only when the shard runs out.
+        """
+        numbers = []
+        while self.buffer and len(numbers) < count:
+            numbers.append(self.buffer.popleft())
+        if self.serialize is not None:
+            for _ in numbers:
+                self.bodies.popleft()
+        if self.claimed_on_startup == "release":
+            self.served.extend(numbers)
+        if len(numbers) < count and self.running:
+            # Served immediately, so these are marked used rather than claimed.
+            numbers += await self.db.claim_batch(count - len(numbers), mark=DatabaseUtils.USED)
+        # Fewer than asked for means the shard ran out
+        self.stock = 0 if len(numbers) < count else max(0, self.stock - len(numbers))
+        if len(self.buffer) < self.low_watermark:
+            self.schedule_fill()
+        return numbers
+
+    def release(self, numbers: list):
+        """
+        Put numbers that were popped but provably never delivered back at the
+        front of the buffer, so they are served next.
+        """
+        if self.claimed_on_startup == "release":
+            returned = set(numbers)
+            self.served = [n for n in self.served if n not in returned]
+        self.buffer.extendleft(reversed(numbers))
+        self.stock += len(numbers)
+        if self.serialize is not None:
+            self.bodies.extendleft(self.serialize(n) for n in reversed(numbers))
+
+    def schedule_fill(self):
+        """Start a background fill unless one is already running."""
+        if self._fill_task is None or self._fill_task.done():
+            self._fill_task = asyncio.create_task(self.fill())
+
+    async def fill(self):
+        """Claim enough unused rows to bring the buffer up to `buffer_size`."""
+        async with self._fill_lock:
+            await self._confirm_served()
+            missing = self.buffer_size - len(self.buffer)
+            if missing <= 0 or not self.running:
+                return
+            try:
+                claimed = await self.db.claim_batch(missing, mark=self.claim_mark)
+            except Exception as e:
+                print(f"Error filling prefetch buffer for shard {self.shard_idx}: {e}")
+                return
+            self.buffer.extend(claimed)
+            if self.serialize is not None:
+                self.bodies.extend(map(self.serialize, claimed))
+
+    async def _confirm_served(self):
+        if self.served:
+            served, self.served = self.served, []
+            await self.db.set_used_flag(served, DatabaseUtils.USED)
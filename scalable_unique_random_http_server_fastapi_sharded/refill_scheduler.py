@@ -0,0 +1,103 @@
+import asyncio
+import time
+from pathlib import Path
+import sys
+
+# Adjust path to import utils modules
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from utils.metrics import REGISTRY
+
+REFILLS = REGISTRY.counter("shard_refills_total", "Completed background shard refills.", ("shard",))
+REFILL_ERRORS = REGISTRY.counter("shard_refill_errors_total", "Failed background shard refills.", ("shard",))
+REFILL_DURATION = REGISTRY.histogram(
+    "shard_refill_duration_seconds", "Duration of background shard refills.",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0),
+)
+
+
+class RefillScheduler:
+    """
+    Background task that keeps every shard stocked, off the request path.
+
+    Every `interval` seconds (or sooner, when notify() is called) it measures
+    each shard's remaining unused depth. Shards below `low_watermark` are
+    refilled up to `high_watermark`, emptiest first, one at a time.
+    `shard_ids` is a collection, or a callable returning the shards to check
+    now (e.g. when shards are added or drained at runtime).
+    """
+
+    def __init__(self, shard_ids: list, get_depth, refill, low_watermark: int = 1000,
+                 high_watermark: int = 5000, interval: float = 1.0):
+        # get_depth(shard_idx): coroutine returning the shard's unused count.
+        # refill(shard_idx, count): coroutine adding `count` fresh numbers to the shard.
+        if high_watermark <= low_watermark:
+            raise ValueError("high_watermark must be greater than low_watermark.")
+        self.shard_ids = shard_ids
+        self.get_depth = get_depth
+        self.refill = refill
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.interval = interval
+        self.depths = {}         # Last measured depth per shard
+        self.refill_count = 0    # Completed refills
+        self.refilling = None    # Shard currently being refilled, if any
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Ask for a check now, e.g. after a request found a shard empty."""
+        self._wake.set()
+
+    async def run_once(self):
+        """Measure every shard and refill the low ones, emptiest first."""
+        shard_ids = self.shard_ids() if callable(self.shard_ids) else list(self.shard_ids)
+        for shard_idx in shard_ids:
+            self.depths[shard_idx] = await self.get_depth(shard_idx)
+        low = sorted(
+            (idx for idx in shard_ids if self.depths.get(idx, 0) < self.low_watermark),
+            key=lambda idx: self.depths.get(idx, 0),
+        )
+        for shard_idx in low:
+            missing = self.high_watermark - self.depths[shard_idx]
+            self.refilling = shard_idx
+            started = time.monotonic()
+            try:
+                await self.refill(shard_idx, missing)
+                elapsed = time.monotonic() - started
+                self.refill_count += 1
+                REFILLS.labels(str(shard_idx)).inc()
+                REFILL_DURATION.observe(elapsed)
+                print(f"Refilled shard {shard_idx} with {missing} numbers in {elapsed:.2f}s.")
+            except Exception as e:
+                REFILL_ERRORS.labels(str(shard_idx)).inc()
+                print(f"Error refilling shard {shard_idx}: {e}")
+            finally:
+                self.refilling = None
+            self.depths[shard_idx] = await self.get_depth(shard_idx)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Refill scheduler check failed: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,119 @@
+import asyncio
+from pathlib import Path
+import sys
+
+# Adjust path to import utils modules
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from utils.connection_pool import ConnectionPool
+from utils.pooled_db_utils import DatabaseUtils
+
+
+class ShardActor:
+    """
+    Owns all database access to one shard: a single long-lived task with a
+    single connection.
+
+    Callers submit operations through a bounded queue and await a future
+    (claim_batch, set_used_flag, resolve_claimed, insert_values and
+    count_unused, with the same signatures as DatabaseUtils, so the actor
+    can stand in for it). The task takes everything queued, up to
+    `max_batch` operations, and runs it as one write transaction (one
+    COMMIT) with DatabaseUtils.execute_batch. Since only the task uses the
+    connection, the shard's requests never contend for SQLite's write lock
+    in this process, and every read-then-mark is inside a transaction.
+
+    A full queue makes submitters wait (backpressure). If a batch fails, its
+    operations are retried one per transaction, so only the failing
+    operation's caller gets the exception.
+    """
+
+    def __init__(self, shard_idx: int, db_file: str, selection: str = "probe",
+                 queue_size: int = 1024, max_batch: int = 64):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1.")
+        self.shard_idx = shard_idx
+        self.pool = ConnectionPool(db_file, size=1)
+        self.db = DatabaseUtils(db_file, pool=self.pool, selection=selection)
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.transactions = 0  # Committed batches, for tests and benchmarks
+        self._queue: asyncio.Queue = None
+        self._task: asyncio.Task = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Open the connection, create the table or index if missing, and start the task."""
+        if self.is_running:
+            return
+        await self.pool.open()
+        await self.db.create_table()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Run everything already submitted, then stop the task and close the connection."""
+        if self.is_running:
+            await self._queue.put(None)  # Sentinel: drain and exit
+            await self._task
+        self._task = None
+        await self.pool.close()
+
+    async def claim_batch(self, count: int, mark: int = DatabaseUtils.USED) -> list:
+        return await self._submit("claim", count, mark)
+
+    async def set_used_flag(self, values: list, mark: int):
+        if values:
+            await self._submit("set_used", values, mark)
+
+    async def resolve_claimed(self, mark: int) -> int:
+        return await self._submit("resolve_claimed", mark)
+
+    async def insert_values(self, values: list):
+        await self._submit("insert", values)
+
+    async def count_unused(self) -> int:
+        return await self._submit("count_unused")
+
+    async def _submit(self, name: str, *args):
+        if not self.is_running:
+            raise RuntimeError(f"Shard {self.shard_idx} actor is not running.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((name, args, future))
+        return await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._execute(batch)
+
+    async def _execute(self, batch: list):
+        try:
+            results = await self.db.execute_batch([(name, args) for name, args, _ in batch])
+            self.transactions += 1
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][2].done():
+                    batch[0][2].set_exception(e)
+                return
+            print(f"Shard {self.shard_idx}: batch of {len(batch)} operations failed ({e}); retrying one by one.")
+            for item in batch:
+                await self._execute([item])
+            return
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,152 @@
+import asyncio
+import math
+import time
+
+import aiosqlite
+
+
+class ShardLeaseManager:
+    """
+    Splits the shards between worker processes (e.g. `uvicorn --workers N`)
+    through leases kept in a small coordination SQLite DB.
+
+    Each worker registers itself and heartbeats every `heartbeat_interval`
+    seconds. A heartbeat renews the worker's registration and leases for
+    `lease_ttl` seconds and, in one write transaction, rebalances:
+    - live workers are the ones whose registration has not expired;
+    - within each shard group (e.g. int shards, float shards) a worker holds at
+      most ceil(len(group) / live workers) shards;
+    - shards above that share are handed back (on_release, then the lease is
+      deleted), and free or expired leases are taken up to the share
+      (lease recorded, then on_acquire).
+    A worker that dies stops heartbeating; its leases expire and are picked up
+    by the remaining workers. Only the lease owner serves and refills a shard.
+    Shards dropped from every group (see set_groups) are released at the next
+    heartbeat.
+    """
+
+    def __init__(self, coord_db: str, owner: str, shard_groups: list, on_acquire, on_release,
+                 lease_ttl: float = 10.0, heartbeat_interval: float = 3.0):
+        # on_acquire(shard_idx) / on_release(shard_idx): coroutines that start and
+        # stop serving a shard.
+        if heartbeat_interval >= lease_ttl:
+            raise ValueError("heartbeat_interval must be shorter than lease_ttl.")
+        self.coord_db = coord_db
+        self.owner = owner
+        self.shard_groups = [list(group) for group in shard_groups]
+        self.on_acquire = on_acquire
+        self.on_release = on_release
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.owned = set()
+        self._task = None
+
+    async def start(self):
+        async with aiosqlite.connect(self.coord_db) as conn:
+            await conn.execute("PRAGMA journal_mode=WAL;")
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS shard_leases (
+                    shard_idx INTEGER PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+            """)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS lease_workers (
+                    owner TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                );
+            """)
+            await conn.commit()
+        await self.heartbeat()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop heartbeating and hand every owned shard back."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for shard_idx in sorted(self.owned):
+            await self._release(shard_idx)
+        async with aiosqlite.connect(self.coord_db) as conn:
+            await conn.execute("DELETE FROM lease_workers WHERE owner = ?", (self.owner,))
+            await conn.commit()
+
+    def set_groups(self, shard_groups: list):
+        """Replace the shard groups, e.g. after shards were added to or removed from the topology."""
+        self.shard_groups = [list(group) for group in shard_groups]
+
+    async def heartbeat(self):
+        """Renew this worker's leases and rebalance them once."""
+        now = time.time()
+        expires_at = now + self.lease_ttl
+        async with aiosqlite.connect(self.coord_db) as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            await conn.execute(
+                "INSERT OR REPLACE INTO lease_workers (owner, expires_at) VALUES (?, ?)",
+                (self.owner, expires_at)
+            )
+            await conn.execute("DELETE FROM lease_workers WHERE expires_at <= ?", (now,))
+            cursor = await conn.execute("SELECT COUNT(*) FROM lease_workers")
+            live_workers = (await cursor.fetchone())[0]
+            cursor = await conn.execute("SELECT shard_idx, owner, expires_at FROM shard_leases")
+            leases = {row[0]: (row[1], row[2]) for row in await cursor.fetchall()}
+
+            lost = {idx for idx in self.owned if leases.get(idx, (None,))[0] != self.owner}
+            mine = {idx for idx, (owner, _) in leases.items() if owner == self.owner}
+            excess, acquired = [], []
+            for group in self.shard_groups:
+                share = math.ceil(len(group) / live_workers)
+                held = sorted(idx for idx in group if idx in mine)
+                excess += held[share:]
+                # Leases recorded as ours but not being served (a failed on_acquire)
+                acquired += [idx for idx in held[:share] if idx not in self.owned]
+                free = [idx for idx in group if idx not in leases
+                        or (leases[idx][0] != self.owner and leases[idx][1] <= now)]
+                acquired += free[:max(0, share - len(held))]
+            grouped = {idx for group in self.shard_groups for idx in group}
+            excess += sorted(idx for idx in mine if idx not in grouped)
+
+            await conn.execute(
+                "UPDATE shard_leases SET expires_at = ? WHERE owner = ?", (expires_at, self.owner)
+            )
+            await conn.executemany(
+                "INSERT OR REPLACE INTO shard_leases (shard_idx, owner, expires_at) VALUES (?, ?, ?)",
+                [(idx, self.owner, expires_at) for idx in acquired if idx not in mine]
+            )
+            await conn.commit()
+
+        for shard_idx in sorted(lost):
+            print(f"Lease on shard {shard_idx} was taken over; no longer serving it.")
+            self.owned.discard(shard_idx)
+            await self.on_release(shard_idx)
+        for shard_idx in excess:
+            await self._release(shard_idx)
+        for shard_idx in acquired:
+            await self.on_acquire(shard_idx)
+            self.owned.add(shard_idx)
+            print(f"Worker {self.owner} acquired shard {shard_idx}.")
+
+    async def _release(self, shard_idx: int):
+        """Stop serving a shard, then give up its lease."""
+        if shard_idx in self.owned:
+            self.owned.discard(shard_idx)
+            await self.on_release(shard_idx)
+        async with aiosqlite.connect(self.coord_db) as conn:
+            await conn.execute(
+                "DELETE FROM shard_leases WHERE shard_idx = ? AND owner = ?", (shard_idx, self.owner)
+            )
+            await conn.commit()
+        print(f"Worker {self.owner} released shard {shard_idx}.")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                print(f"Lease heartbeat failed: {e}")
@@ -9,6 +9,9 @@ sys.path.append(str(PROJECT_ROOT))
 
 from utils.random_number import RandomNumberGenerator  # Updated import
 from utils.pooled_db_utils import DatabaseUtils
+from utils.metrics import NUMBER_COLLISIONS
+from initialize_shards import NODE_ID, NUM_INT_SHARDS, NUM_SHARDS, PARTITION_COUNT, TOPOLOGY_FILE
+from shard_topology import ShardTopology
 import aiosqlite
 
 class ShardManager:
@@ -16,29 +19,43 @@ class ShardManager:
     Responsible for managing shards and ensuring global randomness.
     """
 
-    def __init__(self, shard_ids: list[int], meta_db_file: str, shard_dir: str):
+    def __init__(self, shard_ids: list[int], meta_db_file: str, shard_dir: str, topology: ShardTopology = None):
         self.shard_ids = shard_ids  # IDs of shards to manage
         self.meta_db_file = meta_db_file  # Metadata DB to ensure global uniqueness
         self.shard_dir = shard_dir # Shard directory path
+        # Shard types and paths; defaults to the topology file in shard_dir, with initialize_shards.py's default layout
+        self.topology = topology or ShardTopology(os.path.join(shard_dir, TOPOLOGY_FILE), default_shards=NUM_SHARDS,
+                                                  default_int_shards=NUM_INT_SHARDS)
 
     async def refill_shard(self, shard_idx: int, batch_size: int):
         """
         Refill a shard with unique random numbers.
+        Candidates are checked and recorded in the metadata DB a whole batch
+        per transaction; only the shortfall left by collisions is drawn again.
         """
-        shard_db_path = os.path.join(self.shard_dir, f"shard_{shard_idx}.db")
+        shard_db_path = self.topology.shard_path(shard_idx)
+        is_float = self.topology.is_float(shard_idx)
         db_handler = DatabaseUtils(shard_db_path)
-        rng = RandomNumberGenerator()
+        meta_db = DatabaseUtils(self.meta_db_file, "used_numbers")
+        # Only this deployment's slice of the number space, as in populate_shard
+        rng = RandomNumberGenerator(node_id=NODE_ID, partition_count=PARTITION_COUNT)
 
         fresh_numbers = []
         attempts = 0
         while len(fresh_numbers) < batch_size and attempts < batch_size * 10:  # Limit attempts
-            number = rng.generate_random_number(is_float=shard_idx < 2)
-            is_unique_val = await self.is_unique(number)
-            if is_unique_val:
-                fresh_numbers.append(number)
-            else:
-                print(f"Number {number} is not unique. Attempt {attempts + 1}")
-            attempts += 1
+            candidates = [rng.generate_random_number(is_float=is_float)
+                          for _ in range(batch_size - len(fresh_numbers))]
+            attempts += len(candidates)
+            try:
+                new_numbers = await meta_db.insert_new_values(candidates)
+            except Exception as e:
+                print(f"Database error recording numbers for shard {shard_idx}: {e}")
+                break
+            collisions = len(candidates) - len(new_numbers)
+            if collisions:
+                NUMBER_COLLISIONS.labels("refill_shard").inc(collisions)
+                print(f"{collisions} of {len(candidates)} numbers were not unique. Attempts so far: {attempts}")
+            fresh_numbers += new_numbers
 
         if fresh_numbers:
             try:
@@ -53,6 +70,7 @@ class ShardManager:
     async def is_unique(self, number: float) -> bool:
         """
         Verify whether a random number is globally unique using metadata.
+        One connection and commit per number; refill_shard checks whole batches.
         """
         try:
             async with aiosqlite.connect(self.meta_db_file) as conn:
@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class ShardTopology:
+    """
+    The persisted shard layout: which shards exist, the type of number each
+    one holds, where its database lives and how requests are spread over them.
+
+    Stored as JSON next to the shard files. Each shard entry has:
+    - id: never reused, even after the shard is removed;
+    - type: "int" or "float";
+    - path: shard database, relative to the topology file's directory;
+    - weight: relative share of requests routed to the shard;
+    - state: "filling"  -- created, pre-filled in the background, not routed to;
+             "active"   -- routed to and refilled;
+             "draining" -- routed to until empty, never refilled; removed once empty.
+
+    Several worker processes share the file: update() is their one way to
+    change it, a read-modify-write under the write lock of `<file>.lock`, a
+    small SQLite database (BEGIN IMMEDIATE), which works on every platform.
+    reload_if_changed() compares the file's contents, not its mtime, so a
+    save within the same timestamp is not missed.
+
+    Without a topology file, the legacy layout is used: `default_shards`
+    shards, all active, the first `default_int_shards` (default: half) int
+    and the rest float.
+    """
+    TYPES = ("int", "float")
+    STATES = ("filling", "active", "draining")
+    ROUTED_STATES = ("active", "draining")
+    REFILLED_STATES = ("filling", "active")
+    LOCK_TIMEOUT = 30.0  # Seconds to wait for another process's update()
+
+    def __init__(self, path, default_shards: int = 4, default_int_shards: int = None):
+        self.path = Path(path)
+        self.default_shards = default_shards
+        self.default_int_shards = default_shards // 2 if default_int_shards is None else default_int_shards
+        self.shards = {}  # Shard id -> entry
+        self.next_id = 0
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._raw = None  # File contents last loaded or saved
+        self.load()
+
+    def load(self, raw: bytes = None):
+        """Read the topology file (or parse `raw`, its contents), or fall back to the legacy layout."""
+        if raw is None and self.path.exists():
+            raw = self.path.read_bytes()
+        if raw is not None:
+            data = json.loads(raw)
+            self.shards = {entry["id"]: entry for entry in data["shards"]}
+            self.next_id = data.get("next_id", max(self.shards, default=-1) + 1)
+            self._raw = raw
+        else:
+            self.shards = {
+                idx: {"id": idx, "type": "int" if idx < self.default_int_shards else "float",
+                      "path": f"shard_{idx}.db", "weight": 1.0, "state": "active"}
+                for idx in range(self.default_shards)
+            }
+            self.next_id = self.default_shards
+
+    def reload_if_changed(self) -> bool:
+        """Pick up changes saved by another process. Returns True if reloaded."""
+        if not self.path.exists():
+            return False
+        raw = self.path.read_bytes()
+        if raw == self._raw:
+            return False
+        self.load(raw)
+        return True
+
+    @contextmanager
+    def locked(self):
+        """Hold the topology's cross-process lock."""
+        conn = sqlite3.connect(self.lock_path, timeout=self.LOCK_TIMEOUT, isolation_level=None)
+        try:
+            # Takes the database's write lock; other processes wait in their BEGIN IMMEDIATE
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            finally:
+                conn.execute("ROLLBACK")
+        finally:
+            conn.close()
+
+    def update(self, change):
+        """
+        Apply change(self) to the latest saved layout and save it, all under
+        the lock, so concurrent workers never hand out the same id or drop
+        each other's changes. Returns what `change` returns; if it raises,
+        nothing is saved.
+        """
+        with self.locked():
+            self.reload_if_changed()
+            result = change(self)
+            self.save()
+        return result
+
+    def save(self):
+        """Write the layout atomically. Use update() where other processes may change the file."""
+        data = {"next_id": self.next_id, "shards": [self.shards[idx] for idx in sorted(self.shards)]}
+        raw = json.dumps(data, indent=2).encode()
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_path, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._raw = raw
+
+    def shard_path(self, shard_idx: int) -> str:
+        return str(self.path.parent / self.shards[shard_idx]["path"])
+
+    def is_float(self, shard_idx: int) -> bool:
+        return self.shards[shard_idx]["type"] == "float"
+
+    def state(self, shard_idx: int) -> str:
+        return self.shards[shard_idx]["state"]
+
+    def weight(self, shard_idx: int) -> float:
+        return self.shards[shard_idx]["weight"]
+
+    def ids(self, type: str = None, states=None) -> list:
+        return sorted(
+            idx for idx, entry in self.shards.items()
+            if (type is None or entry["type"] == type) and (states is None or entry["state"] in states)
+        )
+
+    def groups(self) -> list:
+        """Shard ids per type, e.g. for splitting leases evenly across both types."""
+        return [self.ids(type=number_type) for number_type in self.TYPES]
+
+    def add_shard(self, number_type: str, weight: float = 1.0) -> dict:
+        """Register a new, empty shard in the "filling" state. Call save() to persist."""
+        if number_type not in self.TYPES:
+            raise ValueError(f"Unknown shard type: {number_type}")
+        if weight <= 0:
+            raise ValueError("Shard weight must be positive.")
+        idx = self.next_id
+        self.next_id += 1
+        entry = {"id": idx, "type": number_type, "path": f"shard_{idx}.db", "weight": weight, "state": "filling"}
+        self.shards[idx] = entry
+        return entry
+
+    def set_state(self, shard_idx: int, state: str):
+        if state not in self.STATES:
+            raise ValueError(f"Unknown shard state: {state}")
+        self.shards[shard_idx]["state"] = state
+
+    def remove_shard(self, shard_idx: int) -> dict:
+        """Drop a shard from the topology; its database file is left on disk."""
+        return self.shards.pop(shard_idx)
@@ -1,65 +1,228 @@
 """
-Stress test script for FastAPI server.
-Simulates high traffic by sending concurrent requests and logs outcomes.
+Load generator for the /random endpoint of any of the four servers.
+
+Open-loop mode (default) sends requests on a fixed schedule, at --rate
+requests per second or ramping linearly from --rate to --ramp-to, whether or
+not earlier requests have finished. Latency is measured from each request's
+scheduled send time, so a stalled server shows up in the percentiles instead
+of silently slowing the load down (coordinated omission). Closed-loop mode
+(--mode closed) keeps --concurrency requests in flight, like the old
+thread-pool version of this script.
+
+Every number received is checked against all earlier ones, and a JSON
+summary (throughput, p50/p90/p99/p999, error breakdown, duplicates) can be
+written with --output for comparing runs.
+
+    python stress_test.py --url http://127.0.0.1:8585/random --rate 1000 --duration 30 --output run.json
+    python stress_test.py --rate 200 --ramp-to 2000 --duration 60 --float-ratio 0.5
+    python stress_test.py --mode closed --num_requests 1600 --concurrency 4
 """
 
-import requests
-import concurrent.futures
-import time
 import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
 from datetime import datetime
 
+import httpx
+
 # FastAPI endpoint to test
 URL = "http://127.0.0.1:8585/random"
 
 # Default concurrency (adjust to CPU cores or system capability)
 DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_CONNECTIONS = 100  # Keep-alive connections shared by all requests
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram: each bucket is 1% wider than the previous
+    one, so percentiles are within 1% of the exact value at a fixed memory cost.
+    """
+    GROWTH = 1.01
+    MIN_SECONDS = 1e-6
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        index = int(math.log(max(seconds, self.MIN_SECONDS) / self.MIN_SECONDS, self.GROWTH))
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th percentile, in seconds."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.MIN_SECONDS * self.GROWTH ** (index + 1), self.max)
+        return self.max
+
+    def summary_ms(self) -> dict:
+        summary = {f"p{p:g}": round(self.percentile(p) * 1000, 3) for p in PERCENTILES}
+        summary["mean"] = round(self.total / self.count * 1000, 3) if self.count else 0.0
+        summary["max"] = round(self.max * 1000, 3)
+        return summary
+
+
+class LoadRun:
+    """Sends requests, and collects latencies, errors and the numbers received."""
 
-def fetch(request_id):
-    try:
-        response = requests.get(URL, timeout=100)
-        if response.status_code == 200:
-            data = response.json()
-            return (
-                f"[{request_id}] ✅ SUCCESS | "
-                f"Shard: {data.get('shard')} | "
-                f"Value: {data.get('number')} | "
-                f"Refill: {data.get('refill_status', 'N/A')}"
-            )
+    def __init__(self, client: httpx.AsyncClient, url: str, float_ratio: float, count: int = None):
+        self.client = client
+        self.url = url
+        self.float_ratio = float_ratio
+        self.count = count
+        self.response_time = LatencyHistogram()  # From the scheduled send time
+        self.service_time = LatencyHistogram()   # From the actual send time
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.numbers_received = 0
+        self.duplicates = 0
+        self.seen = set()
+
+    async def send(self, scheduled: float):
+        params = {"type": "float" if random.random() < self.float_ratio else "int"}
+        if self.count:
+            params["count"] = self.count
+        started = time.perf_counter()
+        try:
+            response = await self.client.get(self.url, params=params)
+        except httpx.HTTPError as e:
+            self.errors[type(e).__name__] += 1
+            return
+        finished = time.perf_counter()
+        self.response_time.record(finished - scheduled)
+        self.service_time.record(finished - started)
+        self.statuses[response.status_code] += 1
+        if response.status_code != 200:
+            detail = response.json().get("detail") if "json" in response.headers.get("content-type", "") else None
+            self.errors[f"HTTP {response.status_code}: {detail or response.reason_phrase}"] += 1
+            return
+        data = response.json()
+        for number in data["numbers"] if "numbers" in data else [data["number"]]:
+            self.numbers_received += 1
+            if number in self.seen:
+                self.duplicates += 1
+            else:
+                self.seen.add(number)
+
+    def summary(self, elapsed: float, config: dict) -> dict:
+        sent = sum(self.statuses.values()) + sum(
+            n for name, n in self.errors.items() if not name.startswith("HTTP "))
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": config,
+            "elapsed_seconds": round(elapsed, 3),
+            "requests": sent,
+            "throughput_rps": round(self.statuses[200] / elapsed, 1) if elapsed else 0.0,
+            "status_codes": {str(code): n for code, n in sorted(self.statuses.items())},
+            "errors": dict(self.errors.most_common()),
+            "response_time_ms": self.response_time.summary_ms(),
+            "service_time_ms": self.service_time.summary_ms(),
+            "numbers_received": self.numbers_received,
+            "duplicates": self.duplicates,
+        }
+
+
+def open_loop_schedule(rate: float, ramp_to: float, duration: float):
+    """Send offsets, in seconds, for a rate that ramps linearly from `rate` to `ramp_to`."""
+    offset = 0.0
+    while offset < duration:
+        yield offset
+        current = rate + (ramp_to - rate) * offset / duration
+        offset += 1.0 / current
+
+
+async def run_open_loop(run: LoadRun, rate: float, ramp_to: float, duration: float):
+    tasks = set()
+    start = time.perf_counter()
+    for offset in open_loop_schedule(rate, ramp_to, duration):
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(run.send(start + offset))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.wait(tasks)
+    return time.perf_counter() - start
+
+
+async def run_closed_loop(run: LoadRun, num_requests: int, concurrency: int):
+    remaining = iter(range(num_requests))
+
+    async def worker():
+        for _ in remaining:
+            await run.send(time.perf_counter())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        run = LoadRun(client, args.url, args.float_ratio, args.count)
+        if args.mode == "open":
+            ramp_to = args.ramp_to if args.ramp_to else args.rate
+            print(f"Open loop: {args.rate:g} -> {ramp_to:g} req/s for {args.duration:g}s against {args.url}")
+            elapsed = await run_open_loop(run, args.rate, ramp_to, args.duration)
         else:
-            detail = response.json().get("detail", response.text)
-            return f"[{request_id}] ❌ FAIL | Status: {response.status_code} | Detail: {detail}"
-    except requests.exceptions.Timeout:
-        return f"[{request_id}] ⚠️ TIMEOUT"
-    except Exception as e:
-        return f"[{request_id}] 🚨 EXCEPTION | {str(e)}"
-
-def main(num_requests, concurrency):
-    print(f"🚀 Starting load test with {num_requests} requests using {concurrency} threads...\n")
-    start_time = time.time()
-
-    results = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
-        futures = {executor.submit(fetch, i): i for i in range(num_requests)}
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            print(result)
-            results.append(result)
-
-    duration = time.time() - start_time
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_filename = f"stress_log_{timestamp}.txt"
-
-    with open(log_filename, "w") as log_file:
-        log_file.write("\n".join(results))
-
-    print(f"\n✅ Load test completed in {duration:.2f} seconds.")
-    print(f"📝 Results saved to {log_filename}")
+            print(f"Closed loop: {args.num_requests} requests, {args.concurrency} in flight, against {args.url}")
+            elapsed = await run_closed_loop(run, args.num_requests, args.concurrency)
+
+    result = run.summary(elapsed, vars(args))
+    print(f"\n{result['requests']} requests in {result['elapsed_seconds']}s, "
+          f"{result['throughput_rps']} successful req/s")
+    print(f"Status codes: {result['status_codes']}")
+    for name, n in result["errors"].items():
+        print(f"    {n:8d} x {name}")
+    for label in ("response_time_ms", "service_time_ms"):
+        print(f"{label}: " + ", ".join(f"{k} {v}" for k, v in result[label].items()))
+    print(f"Numbers received: {result['numbers_received']}, duplicates: {result['duplicates']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results saved to {args.output}")
+    return result
+
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description="Stress test the FastAPI server.")
-    parser.add_argument("--num_requests", type=int, default=1600, help="Total number of requests to send (default: 1600)")
-    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Number of concurrent threads (default: 4)")
+    parser = argparse.ArgumentParser(description="Load test the /random endpoint of any of the servers.")
+    parser.add_argument("--url", default=URL, help=f"Endpoint to test (default: {URL})")
+    parser.add_argument("--mode", choices=("open", "closed"), default="open",
+                        help="open: fixed send schedule; closed: fixed concurrency (default: open)")
+    parser.add_argument("--rate", type=float, default=500, help="Open loop: requests per second (default: 500)")
+    parser.add_argument("--ramp-to", type=float, default=None,
+                        help="Open loop: ramp linearly from --rate to this rate over the run")
+    parser.add_argument("--duration", type=float, default=10, help="Open loop: seconds to run (default: 10)")
+    parser.add_argument("--num_requests", type=int, default=1600,
+                        help="Closed loop: total number of requests to send (default: 1600)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Closed loop: requests in flight (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help=f"Keep-alive connection pool size (default: {DEFAULT_MAX_CONNECTIONS})")
+    parser.add_argument("--float-ratio", type=float, default=0.0,
+                        help="Share of requests sent with type=float (default: 0)")
+    parser.add_argument("--count", type=int, default=None, help="Send /random?count=N batch requests")
+    parser.add_argument("--timeout", type=float, default=100, help="Per-request timeout in seconds (default: 100)")
+    parser.add_argument("--output", help="Write the JSON summary to this file")
+    parser.add_argument("--label", default="", help="Free-form label stored in the JSON summary")
     args = parser.parse_args()
 
-    main(args.num_requests, args.concurrency)
+    asyncio.run(main(args))
@@ -1,5 +1,7 @@
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
+import asyncio
+import os
 import sys
 from pathlib import Path
 
@@ -8,36 +10,89 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from utils.random_number import RandomNumberGenerator
 from utils.response_utils import construct_response
-from utils.persistence_json_utils import load_used_numbers, save_used_numbers, define_persistence_file_path
+from utils.persistence_json_utils import UsedNumbersJournal, define_persistence_file_path
+from utils.async_http import serve
 
 # Constants and initialization
-PERSISTENCE_FILE = define_persistence_file_path("used_numbers.json")
-used_numbers = load_used_numbers(PERSISTENCE_FILE)
-generator = RandomNumberGenerator()
+PERSISTENCE_FILE = define_persistence_file_path("used_numbers.json")  # Legacy store, migrated once
+JOURNAL_BASE = define_persistence_file_path("used_numbers")  # used_numbers.log / used_numbers.snap
+
+# "journal" checks each number against used_numbers; "permutation" derives numbers
+# from a keyed permutation of a persisted counter and skips the store entirely;
+# "bitmap" checks against one memory-mapped bit per possible value
+# (used_numbers.int.bitmap / used_numbers.float.bitmap), importing the journal once.
+NUMBER_BACKEND = os.environ.get("NUMBER_BACKEND", "journal")
+BITMAP_SPARSE = False  # Keep only the touched chunks of the bitmaps in memory
+# Hold used_numbers in a flat int64 hash table (utils/compact_set.py) instead of a set.
+# This and the next two options need NumPy; the defaults run on the standard library alone.
+COMPACT_USED_NUMBERS = False
+BINARY_SNAPSHOT = False  # Snapshot as a memory-mapped sorted int64 array (see binary_snapshot.py)
+if NUMBER_BACKEND == "bitmap":
+    from utils.bitmap_store import UsedNumbersBitmap
+    journal = UsedNumbersBitmap(JOURNAL_BASE, sparse=BITMAP_SPARSE,
+                                migrate_from=UsedNumbersJournal(JOURNAL_BASE, migrate_from=PERSISTENCE_FILE,
+                                                                binary_snapshot=BINARY_SNAPSHOT))
+else:
+    journal = UsedNumbersJournal(JOURNAL_BASE, migrate_from=PERSISTENCE_FILE, compact=COMPACT_USED_NUMBERS,
+                                 binary_snapshot=BINARY_SNAPSHOT)
+used_numbers = journal.load()
+PERMUTATION_STATE_FILE = define_persistence_file_path("permutation_state.json")
+# Instances with distinct NODE_IDs (0 .. PARTITION_COUNT - 1) draw from disjoint
+# slices of the number space, so they never collide even with separate stores.
+NODE_ID = int(os.environ.get("NODE_ID", "0"))
+PARTITION_COUNT = int(os.environ.get("PARTITION_COUNT", "1"))
+if NUMBER_BACKEND == "permutation":
+    generator = RandomNumberGenerator(mode="permutation", state_file=PERMUTATION_STATE_FILE,
+                                      node_id=NODE_ID, partition_count=PARTITION_COUNT)
+else:
+    generator = RandomNumberGenerator(node_id=NODE_ID, partition_count=PARTITION_COUNT)
+
+# "asyncio" serves keep-alive and pipelined HTTP/1.1 connections from one event
+# loop (utils/async_http.py); "stdlib" is HTTPServer, one HTTP/1.0 connection
+# per request. Both handle one request at a time, so the check-then-add on
+# used_numbers is never interleaved.
+HTTP_ENGINE = os.environ.get("HTTP_ENGINE", "asyncio")
+
+# Returns (status, JSON response) for /random; shared by both engines
+def random_number_response(is_float: bool) -> tuple:
+    try:
+        if generator.mode == "permutation":
+            # Unique by construction: no lookup in used_numbers needed
+            number = generator.generate_random_number(is_float=is_float)
+        else:
+            max_attempts = 100
+            for _ in range(max_attempts):
+                number = generator.generate_random_number(is_float=is_float)
+                # Checks and records under the journal's lock: concurrent requests never both get it
+                if journal.add_if_absent(number):
+                    break
+            else:
+                raise Exception("Could not generate a unique number after multiple attempts.")
+        return 200, construct_response(data=number)
+    except Exception as e:
+        return 503, construct_response(error=str(e))
+
+# Request handler of the asyncio engine: only the path and the type parameter are parsed
+def handle_target(target: bytes) -> tuple:
+    path, _, query = target.partition(b"?")
+    if path != b"/random":
+        return 404, construct_response(error="Endpoint not found").encode()
+    is_float = False
+    for param in query.split(b"&"):
+        if param.startswith(b"type="):
+            is_float = param[5:].lower() == b"float"
+            break
+    status, response = random_number_response(is_float)
+    return status, response.encode()
 
 class RandomNumberHandler(BaseHTTPRequestHandler):
     def do_GET(self):
         parsed_path = urlparse(self.path)
         if parsed_path.path == "/random":
-            try:
-                query_params = parse_qs(parsed_path.query)
-                is_float = query_params.get("type", ["int"])[0].lower() == "float"
-
-                max_attempts = 100
-                for _ in range(max_attempts):
-                    number = generator.generate_random_number(is_float=is_float)
-                    if number not in used_numbers:
-                        used_numbers.add(number)
-                        save_used_numbers(PERSISTENCE_FILE, used_numbers)
-                        break
-                else:
-                    raise Exception("Could not generate a unique number after multiple attempts.")
-
-                response = construct_response(data=number)
-                self.send_response(200)
-            except Exception as e:
-                response = construct_response(error=str(e))
-                self.send_response(503)
+            query_params = parse_qs(parsed_path.query)
+            is_float = query_params.get("type", ["int"])[0].lower() == "float"
+            status, response = random_number_response(is_float)
+            self.send_response(status)
             self.send_header("Content-Type", "application/json")
             self.end_headers()
             self.wfile.write(response.encode())
@@ -48,11 +103,16 @@ class RandomNumberHandler(BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(response.encode())
 
-def run(server_class=HTTPServer, handler_class=RandomNumberHandler, port=5000):
-    server_address = ("", port)
-    httpd = server_class(server_address, handler_class)
-    print(f"Server running on http://localhost:{port}/random")
-    httpd.serve_forever()
+def run(server_class=HTTPServer, handler_class=RandomNumberHandler, port=5000, engine=HTTP_ENGINE):
+    print(f"Server running on http://localhost:{port}/random ({engine} engine)")
+    try:
+        if engine == "asyncio":
+            asyncio.run(serve(handle_target, port=port))
+        else:
+            httpd = server_class(("", port), handler_class)
+            httpd.serve_forever()
+    finally:
+        journal.close()  # fsync any records written since the last periodic fsync
 
 if __name__ == "__main__":
     run()
\ No newline at end of file
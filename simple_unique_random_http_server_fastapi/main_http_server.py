@@ -1,7 +1,10 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Union
+from typing import Optional, Union
 import uvicorn
+import os
 import sys
 from pathlib import Path
 
@@ -10,12 +13,46 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from utils.random_number import RandomNumberGenerator
 from utils.error_handler import handle_exception
-from utils.persistence_json_utils import load_used_numbers, save_used_numbers, define_persistence_file_path
+from utils.persistence_json_utils import UsedNumbersJournal, define_persistence_file_path
+from utils.bitmap_store import UsedNumbersBitmap
+from utils.stream_utils import StreamStats, stream_numbers
+from utils.fast_asgi import FastRandomApp, json_body
 
 # Constants and initialization
-PERSISTENCE_FILE = define_persistence_file_path("used_numbers.json")
-used_numbers = load_used_numbers(PERSISTENCE_FILE)
-generator = RandomNumberGenerator()
+PERSISTENCE_FILE = define_persistence_file_path("used_numbers.json")  # Legacy store, migrated once
+JOURNAL_BASE = define_persistence_file_path("used_numbers")  # used_numbers.log / used_numbers.snap
+
+# "journal" checks each number against used_numbers; "permutation" derives numbers
+# from a keyed permutation of a persisted counter and skips the store entirely;
+# "bitmap" checks against one memory-mapped bit per possible value
+# (used_numbers.int.bitmap / used_numbers.float.bitmap), importing the journal once.
+NUMBER_BACKEND = os.environ.get("NUMBER_BACKEND", "journal")
+BITMAP_SPARSE = False  # Keep only the touched chunks of the bitmaps in memory
+# Hold used_numbers in a flat int64 hash table (utils/compact_set.py) instead of a set
+COMPACT_USED_NUMBERS = True
+BINARY_SNAPSHOT = True  # Snapshot as a memory-mapped sorted int64 array (see binary_snapshot.py)
+if NUMBER_BACKEND == "bitmap":
+    journal = UsedNumbersBitmap(JOURNAL_BASE, sparse=BITMAP_SPARSE,
+                                migrate_from=UsedNumbersJournal(JOURNAL_BASE, migrate_from=PERSISTENCE_FILE,
+                                                                binary_snapshot=BINARY_SNAPSHOT))
+else:
+    journal = UsedNumbersJournal(JOURNAL_BASE, migrate_from=PERSISTENCE_FILE, compact=COMPACT_USED_NUMBERS,
+                                 binary_snapshot=BINARY_SNAPSHOT)
+used_numbers = journal.load()
+PERMUTATION_STATE_FILE = define_persistence_file_path("permutation_state.json")
+# Instances with distinct NODE_IDs (0 .. PARTITION_COUNT - 1) draw from disjoint
+# slices of the number space, so they never collide even with separate stores.
+NODE_ID = int(os.environ.get("NODE_ID", "0"))
+PARTITION_COUNT = int(os.environ.get("PARTITION_COUNT", "1"))
+if NUMBER_BACKEND == "permutation":
+    generator = RandomNumberGenerator(mode="permutation", state_file=PERMUTATION_STATE_FILE,
+                                      node_id=NODE_ID, partition_count=PARTITION_COUNT)
+else:
+    generator = RandomNumberGenerator(node_id=NODE_ID, partition_count=PARTITION_COUNT)
+
+STREAM_BATCH_SIZE = 100   # Numbers reserved per batch by /random/stream
+STREAM_MAX_RATE = 10000   # Server-side cap, in numbers per second, for each stream
+stream_stats = StreamStats()
 
 # Define response model
 class RandomNumberResponse(BaseModel):
@@ -24,31 +61,93 @@ class RandomNumberResponse(BaseModel):
 # Create FastAPI app
 app = FastAPI(title="Unique Random Number Server With FastAPI")
 
+# Draws one unique number and records it; None if none was found after 100 attempts
+def draw_unique_number(is_float: bool):
+    if generator.mode == "permutation":
+        return generator.generate_random_number(is_float=is_float)
+    for _ in range(100):
+        number = generator.generate_random_number(is_float=is_float)
+        # Checks and records under the journal's lock: concurrent requests never both get it
+        if journal.add_if_absent(number):
+            return number
+    return None
+
 # Endpoint for random number
 @app.get("/random", response_model=RandomNumberResponse)
 def get_random_number(type: str = "int"):
     try:
-        is_float = type.lower() == "float"
+        number = draw_unique_number(type.lower() == "float")
+        if number is None:
+            raise HTTPException(status_code=503, detail="Could not generate a unique number after multiple attempts.")
+        return {"number": number}
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+# Fast path for /random, /random?type=int and /random?type=float (see utils/fast_asgi.py):
+# sends the body directly. None lets get_random_number report errors. The draw runs in
+# the threadpool like the route's, so the journal's fsyncs and snapshots never block
+# the event loop; add_if_absent serializes it with the other callers.
+def fast_random(is_float: bool):
+    async def handler():
+        try:
+            number = await run_in_threadpool(draw_unique_number, is_float)
+        except Exception:
+            return None
+        return None if number is None else json_body({"number": number})
+    return handler
 
-        max_attempts = 100
-        for _ in range(max_attempts):
+# Reserves up to `count` unique numbers; stops early if the generator runs dry
+def reserve_numbers(count: int, is_float: bool) -> list:
+    if generator.mode == "permutation":
+        return [generator.generate_random_number(is_float=is_float) for _ in range(count)]
+    numbers = []
+    for _ in range(count):
+        for _ in range(100):
             number = generator.generate_random_number(is_float=is_float)
-            if number not in used_numbers:
-                used_numbers.add(number)
-                save_used_numbers(PERSISTENCE_FILE, used_numbers)
+            if journal.add_if_absent(number):
+                numbers.append(number)
                 break
         else:
-            raise HTTPException(status_code=503, detail="Could not generate a unique number after multiple attempts.")
+            break
+    return numbers
 
-        return {"number": number}
-    except Exception as e:
-        raise HTTPException(status_code=503, detail=str(e))
+# Streams unique numbers as newline-delimited JSON until `limit` or disconnect.
+# The journal is append-only, so numbers reserved but never sent are burned.
+@app.get("/random/stream")
+def stream_random_numbers(
+    type: str = "int",
+    limit: Optional[int] = Query(None, ge=1),
+    rate: Optional[float] = Query(None, gt=0),
+):
+    is_float = type.lower() == "float"
+
+    async def reserve(count):
+        try:
+            return await run_in_threadpool(reserve_numbers, count, is_float)
+        except RuntimeError:
+            return []  # Permutation domain exhausted: end the stream
+
+    max_rate = min(rate, STREAM_MAX_RATE) if rate else STREAM_MAX_RATE
+    return StreamingResponse(
+        stream_numbers(reserve, limit=limit, batch_size=STREAM_BATCH_SIZE,
+                       max_rate=max_rate, stats=stream_stats),
+        media_type="application/x-ndjson",
+    )
+
+# fsync and close the journal on shutdown
+@app.on_event("shutdown")
+def close_journal():
+    journal.close()
 
 # Handle 404 errors for other paths
 @app.get("/{path:path}")
 def not_found(path: str):
     raise HTTPException(status_code=404, detail="Not found")
 
+# Serves the common /random requests itself and passes everything else to `app`
+fast_app = FastRandomApp({b"": fast_random(False), b"type=int": fast_random(False),
+                          b"type=float": fast_random(True)}, fallback=app)
+
 # Run the server
 if __name__ == "__main__":
-    uvicorn.run("main_http_server:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main_http_server:fast_app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
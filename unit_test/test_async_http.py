@@ -0,0 +1,84 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from utils.async_http import HTTPProtocol
+
+
+async def start_server(handle):
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(lambda: HTTPProtocol(handle), "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode().split("\r\n")
+    headers = dict(line.lower().split(": ", 1) for line in lines[1:] if line)
+    body = await reader.readexactly(int(headers["content-length"]))
+    return int(lines[0].split()[1]), headers, body
+
+
+def counting_handler():
+    served = []
+
+    def handle(target):
+        if not target.startswith(b"/random"):
+            return 404, b'{"error": "Endpoint not found"}'
+        served.append(target)
+        return 200, f'{{"number": {len(served)}}}'.encode()
+    return handle, served
+
+
+@pytest.mark.asyncio
+async def test_keep_alive_and_pipelining_answer_in_order():
+    handle, served = counting_handler()
+    server, port = await start_server(handle)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    writer.write(b"GET /random HTTP/1.1\r\nHost: x\r\n\r\n")
+    assert await read_response(reader) == (200, {"content-type": "application/json", "content-length": "13"},
+                                           b'{"number": 1}')
+    # Three pipelined requests, the last one split across writes
+    writer.write(b"GET /random?type=float HTTP/1.1\r\n\r\nGET /nope HTTP/1.1\r\n\r\nGET /ran")
+    await writer.drain()
+    await asyncio.sleep(0.01)
+    writer.write(b"dom HTTP/1.1\r\nConnection: close\r\n\r\n")
+    responses = [await read_response(reader) for _ in range(3)]
+    assert [status for status, _, _ in responses] == [200, 404, 200]
+    assert responses[2][1]["connection"] == "close" and responses[2][2] == b'{"number": 3}'
+    assert await reader.read() == b"", "The server should close after Connection: close"
+    assert served == [b"/random", b"/random?type=float", b"/random"]
+    writer.close()
+    server.close()
+
+
+@pytest.mark.asyncio
+async def test_http_1_0_methods_and_bad_requests():
+    handle, served = counting_handler()
+    server, port = await start_server(handle)
+
+    async def exchange(request, responses=1):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(request)
+        statuses = [(await read_response(reader))[0] for _ in range(responses)]
+        closed = await reader.read() == b""
+        writer.close()
+        return statuses, closed
+
+    assert await exchange(b"GET /random HTTP/1.0\r\n\r\n") == ([200], True)
+    # The POST body is skipped, so the next pipelined request is still parsed
+    assert await exchange(b"POST /random HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc"
+                          b"GET /random HTTP/1.1\r\nConnection: close\r\n\r\n", responses=2) == ([501, 200], True)
+    assert await exchange(b"garbage\r\n\r\n") == ([400], True)
+    assert await exchange(b"GET /random HTTP/1.1\r\nX: " + b"y" * 10000) == ([431], True)
+    # Refused from the head alone, before any of the body is buffered
+    assert await exchange(b"POST /random HTTP/1.1\r\nContent-Length: 1000000000\r\n\r\nabc") == ([413], True)
+    assert len(served) == 2
+    server.close()
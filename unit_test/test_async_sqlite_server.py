@@ -0,0 +1,37 @@
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+# Add the project root to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+SERVER_DIR = PROJECT_ROOT / "async_unique_random_http_server_fastapi_sqlite"
+
+# Runs in its own process and working directory, so the server's random_numbers.db
+# is a fresh file and the module-level state is not shared with other tests.
+LOCKED_DB_SCRIPT = textwrap.dedent("""
+    import sys
+    sys.path.insert(0, {server_dir!r})
+    import aiosqlite
+    from fastapi.testclient import TestClient
+    import main_http_server as server
+
+    async def locked_insert_batch(numbers, retries=3, delay=0.05):
+        raise aiosqlite.OperationalError("database is locked")
+
+    with TestClient(server.app) as client:
+        server.db_handler.insert_batch = locked_insert_batch
+        response = client.get("/random", params={{"count": 10}})
+        assert response.status_code == 503, response.text
+        assert "locked" in response.json()["detail"]
+        stream = client.get("/random/stream", params={{"limit": 10}})
+        assert stream.status_code == 200 and stream.text == "", stream.text
+""")
+
+
+def test_database_errors_are_reported_as_unavailable(tmp_path):
+    script = LOCKED_DB_SCRIPT.format(server_dir=str(SERVER_DIR))
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, capture_output=True, timeout=120)
+    assert result.returncode == 0, result.stderr.decode()
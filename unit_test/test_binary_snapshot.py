@@ -0,0 +1,99 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add the project root to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from utils.binary_snapshot import HEADER, SnapshotError, SnapshotIndex, read_snapshot, write_snapshot
+from utils.compact_set import encode
+from utils.persistence_json_utils import UsedNumbersJournal
+
+
+def test_round_trip_and_lookups(tmp_path):
+    path = tmp_path / "used.bsnap"
+    numbers = [3, 17, 250, 0.5, 1.25, 1.999999]
+    keys = np.sort(np.array([encode(n) for n in numbers], dtype=np.int64))
+    write_snapshot(path, keys)
+
+    assert path.stat().st_size == HEADER.size + 8 * len(numbers)
+    assert np.array_equal(read_snapshot(path), keys)
+    index = SnapshotIndex(path)
+    assert len(index) == len(numbers)
+    assert all(n in index for n in numbers)
+    # Ints and floats never share a key
+    assert 0.000003 not in index and 3.0 not in index and 500000 not in index
+    assert 4 not in index and "x" not in index
+    assert sorted(index, key=str) == sorted(numbers, key=str)
+    index.close()
+
+    write_snapshot(path, np.empty(0, dtype=np.int64))
+    empty = SnapshotIndex(path)
+    assert len(empty) == 0 and 3 not in empty
+
+
+def test_corruption_is_detected(tmp_path):
+    path = tmp_path / "used.bsnap"
+    write_snapshot(path, np.arange(100, dtype=np.int64))
+    data = bytearray(path.read_bytes())
+
+    data[HEADER.size + 8] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError, match="checksum"):
+        read_snapshot(path)
+    with pytest.raises(SnapshotError, match="checksum"):
+        SnapshotIndex(path)
+    assert len(SnapshotIndex(path, verify=False)) == 100
+
+    path.write_bytes(bytes(data[:-4]))
+    with pytest.raises(SnapshotError, match="expected 100 keys"):
+        SnapshotIndex(path, verify=False)
+    path.write_bytes(b"not a snapshot at all")
+    with pytest.raises(SnapshotError):
+        read_snapshot(path)
+
+
+def test_journal_reloads_and_folds_into_the_binary_snapshot(tmp_path):
+    base = tmp_path / "used_numbers"
+    journal = UsedNumbersJournal(base, snapshot_every=50, binary_snapshot=True)
+    numbers = journal.load()
+    for i in range(120):
+        journal.add(i if i % 2 else i / 64)
+    assert Path(f"{base}.bsnap").exists() and not Path(f"{base}.snap").exists()
+    assert len(numbers) == 120 and 7 in numbers and 2 / 64 in numbers
+    journal.close()
+
+    reloaded = UsedNumbersJournal(base, binary_snapshot=True)
+    numbers = reloaded.load()
+    assert len(numbers) == 120 and set(numbers) == {i if i % 2 else i / 64 for i in range(120)}
+    # Numbers already in the snapshot are not counted twice
+    numbers.add(7)
+    numbers.update([9, 2.5, 2.5])
+    assert len(numbers) == 121
+    reloaded.close()
+
+
+def test_journal_converts_between_snapshot_formats(tmp_path):
+    base = tmp_path / "used_numbers"
+    journal = UsedNumbersJournal(base)
+    journal.load()
+    for number in (1, 2, 0.5):
+        journal.add(number)
+    journal.snapshot()
+    journal.add(3)
+    journal.close()
+
+    binary = UsedNumbersJournal(base, binary_snapshot=True)
+    assert set(binary.load()) == {1, 2, 0.5, 3}
+    assert not Path(f"{base}.snap").exists()
+    binary.add(4.25)
+    binary.snapshot()
+    binary.close()
+
+    records = UsedNumbersJournal(base)
+    assert records.load() == {1, 2, 0.5, 3, 4.25}
+    assert not Path(f"{base}.bsnap").exists()
+    records.close()
@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from utils.bitmap_store import BitmapStore, ChunkedBitmapStore, UsedNumbersBitmap
+from utils.persistence_json_utils import UsedNumbersJournal
+
+BITS = 1 << 20
+
+
+@pytest.mark.parametrize("store_class", [BitmapStore, ChunkedBitmapStore])
+def test_test_and_set_persists_across_reopen(tmp_path, store_class):
+    store = store_class(tmp_path / "used.bitmap", BITS, sync_every=2)
+    assert store.test_and_set(0) and store.test_and_set(12345) and store.test_and_set(BITS - 1)
+    assert not store.test_and_set(12345)
+    assert 12345 in store and 12346 not in store
+    assert len(store) == store.popcount() == 3
+    with pytest.raises(ValueError):
+        store.test_and_set(BITS)
+    store.close()
+    store.close()
+
+    reopened = store_class(tmp_path / "used.bitmap", BITS)
+    assert len(reopened) == 3 and all(i in reopened for i in (0, 12345, BITS - 1)) and 1 not in reopened
+    reopened.close()
+
+
+def test_chunked_store_materializes_only_touched_chunks(tmp_path):
+    store = ChunkedBitmapStore(tmp_path / "used.bitmap", BITS, chunk_size=4096)
+    for index in (1, 2, 40000, 40001):
+        store.test_and_set(index)
+    assert store.materialized_bytes == 2 * 4096
+    store.close()
+
+    # Same file layout as the full mapping
+    full = BitmapStore(tmp_path / "used.bitmap", BITS)
+    assert len(full) == 4 and 40001 in full
+    full.test_and_set(900000)
+    full.close()
+    chunked = ChunkedBitmapStore(tmp_path / "used.bitmap", BITS, chunk_size=4096)
+    assert len(chunked) == 5 and len(chunked.chunks) == 3
+    chunked.close()
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_used_numbers_bitmap_migrates_the_journal(tmp_path, sparse):
+    journal = UsedNumbersJournal(tmp_path / "used_numbers")
+    journal.load()
+    for number in (7, 4294967295, 1.25, 123456.0):  # The last one is outside the float domain
+        journal.add(number)
+    journal.close()
+
+    used = UsedNumbersBitmap(tmp_path / "used_numbers", sparse=sparse, migrate_from=journal).load()
+    assert 7 in used and 4294967295 in used and 1.25 in used
+    assert 8 not in used and 1.5 not in used and 123456.0 not in used
+    assert len(used) == 3
+    assert used.add(1.5) and not used.add(1.5) and not used.add(7)
+    used.close()
+
+    used = UsedNumbersBitmap(tmp_path / "used_numbers", sparse=sparse).load()
+    assert len(used) == 4 and 1.5 in used
+    used.close()
+
+
+def test_interrupted_migration_is_rerun(tmp_path):
+    journal = UsedNumbersJournal(tmp_path / "used_numbers")
+    journal.load()
+    for number in (3, 5, 0.5):
+        journal.add(number)
+    journal.close()
+
+    # A migration that died after opening the bitmaps and importing one number
+    partial = UsedNumbersBitmap(tmp_path / "used_numbers", sparse=True).load()
+    partial.add(3)
+    partial.close()
+    assert partial.int_path.exists() and not partial.migrated_path.exists()
+
+    used = UsedNumbersBitmap(tmp_path / "used_numbers", sparse=True, migrate_from=journal).load()
+    assert len(used) == 3 and 5 in used and 0.5 in used
+    assert used.migrated_path.exists()
+    used.add(9)
+    used.close()
+
+    # Once marked, the journal is not imported again
+    journal = UsedNumbersJournal(tmp_path / "used_numbers")
+    used = UsedNumbersBitmap(tmp_path / "used_numbers", sparse=True, migrate_from=journal).load()
+    assert len(used) == 4 and journal._fd is None
+    used.close()
@@ -0,0 +1,101 @@
+import random
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add the project root to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from utils.compact_set import CompactNumberSet
+from utils.persistence_json_utils import UsedNumbersJournal, load_used_numbers
+from utils.random_number import RandomNumberGenerator
+
+
+def test_matches_a_set_across_resizes():
+    rng = RandomNumberGenerator()
+    compact, reference = CompactNumberSet(), set()
+    for i in range(20000):
+        number = rng.generate_random_number(is_float=i % 3 == 0)
+        assert compact.add(number) == (number not in reference)
+        reference.add(number)
+    assert not compact.add(number)
+
+    bulk = [random.getrandbits(16) for _ in range(20000)] + [round(random.uniform(0, 2), 6) for _ in range(20000)]
+    compact.update(bulk)
+    reference.update(bulk)
+    assert len(compact) == len(reference)
+    assert set(compact) == reference
+    assert all(number in compact for number in bulk[::100])
+    assert compact.nbytes < 24 * len(compact)
+
+
+def test_int_and_float_keys_do_not_collide():
+    compact = CompactNumberSet([5, 1.5])
+    assert 5 in compact and 1.5 in compact
+    assert 0.000005 not in compact and 5.0 not in compact and 1500000 not in compact
+
+
+def test_values_without_a_key_are_rejected_or_skipped():
+    compact = CompactNumberSet()
+    for value in ("used_numbers", -1, 1 << 62, 0.1234567, True):
+        assert value not in compact
+        with pytest.raises(ValueError):
+            compact.add(value)
+    assert compact.update([1, "used_numbers", 2.5], skip_invalid=True) == 1
+    assert set(compact) == {1, 2.5}
+
+
+def test_compact_journal_and_json_loading(tmp_path):
+    legacy = tmp_path / "used_numbers.json"
+    legacy.write_text('[1, 2.5, "used_numbers"]')
+    used = load_used_numbers(legacy, compact=True)
+    assert isinstance(used, CompactNumberSet) and set(used) == {1, 2.5}
+
+    journal = UsedNumbersJournal(tmp_path / "used", migrate_from=legacy, compact=True, snapshot_every=2)
+    assert set(journal.load()) == {1, 2.5}
+    for number in (7, 0.25, 9):
+        journal.add(number)
+    journal.close()
+    reloaded = UsedNumbersJournal(tmp_path / "used", compact=True).load()
+    assert isinstance(reloaded, CompactNumberSet) and set(reloaded) == {1, 2.5, 7, 0.25, 9}
+
+
+def test_lookups_during_resizes_never_miss_a_held_number():
+    compact = CompactNumberSet(range(500))
+    done, misses = threading.Event(), []
+
+    def reader():
+        while not done.is_set():
+            misses.extend(n for n in range(0, 500, 7) if n not in compact)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for number in range(500, 200000):  # Several resizes
+        compact.add(number)
+    done.set()
+    thread.join()
+    assert misses == [] and len(compact) == 200000
+
+
+def test_concurrent_add_if_absent_records_each_number_once(tmp_path):
+    journal = UsedNumbersJournal(tmp_path / "used", compact=True, fsync_every=1000)
+    journal.load()
+    wins = []
+
+    def claim():
+        wins.extend(n for n in range(20000) if journal.add_if_absent(n))
+
+    threads = [threading.Thread(target=claim) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    journal.close()
+    assert sorted(wins) == list(range(20000))
+
+    reloaded = UsedNumbersJournal(tmp_path / "used", compact=True)
+    assert len(reloaded.load()) == 20000 and not reloaded.add_if_absent(5)
+    reloaded.close()
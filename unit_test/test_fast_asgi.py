@@ -0,0 +1,66 @@
+import sys
+from collections import deque
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+# Add the project root to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from utils.fast_asgi import FastRandomApp, json_body
+from utils.metrics import MetricsRegistry
+
+
+def make_apps(bodies: deque):
+    started = []
+    app = FastAPI()
+
+    @app.on_event("startup")
+    async def startup():
+        started.append(True)
+
+    @app.get("/random")
+    async def get_random(type: str = "int"):
+        raise HTTPException(status_code=503, detail=f"No {type} numbers left.")
+
+    @app.get("/other")
+    async def other():
+        return {"route": "other"}
+
+    async def pop_body():
+        return bodies.popleft() if bodies else None
+
+    registry = MetricsRegistry()
+    return FastRandomApp({b"": pop_body}, fallback=app, registry=registry), registry, started
+
+
+def test_serves_prebuilt_bodies_and_falls_back_otherwise():
+    fast_app, registry, started = make_apps(deque([json_body({"number": 7}), json_body({"number": 0.5})]))
+    with TestClient(fast_app) as client:
+        assert started, "Lifespan events should reach the fallback app"
+        first = client.get("/random")
+        assert first.status_code == 200 and first.json() == {"number": 7}
+        assert first.headers["content-type"] == "application/json"
+        assert client.get("/random").json() == {"number": 0.5}
+        # Query strings without a handler, other paths and methods go to FastAPI
+        assert client.get("/random", params={"type": "float"}).json() == {"detail": "No float numbers left."}
+        assert client.get("/other").json() == {"route": "other"}
+        assert client.post("/random").status_code == 405
+        # An empty handler lets the route report the error
+        empty = client.get("/random")
+        assert empty.status_code == 503 and empty.json() == {"detail": "No int numbers left."}
+    assert 'http_requests_total{path="/random",status="200"} 2' in registry.render()
+
+
+def test_standalone_without_fallback():
+    bodies = deque([b'{"number":1}'])
+
+    async def pop_body():
+        return bodies.popleft() if bodies else None
+
+    with TestClient(FastRandomApp({b"": pop_body})) as client:
+        assert client.get("/random").json() == {"number": 1}
+        assert client.get("/random").status_code == 503
+        assert client.get("/elsewhere").status_code == 404
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add the project root to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from utils.random_number import RandomNumberGenerator
+from utils.vectorized_numbers import unique_candidates
+
+SERVER_DIR = PROJECT_ROOT / "async_unique_random_http_server_fastapi_sqlite"
+
+# Runs one async SQLite server instance in its own process and working directory
+# (so with its own random_numbers.db), reserving numbers the way /random?count=N does.
+INSTANCE_SCRIPT = textwrap.dedent("""
+    import asyncio, sys
+    sys.path.insert(0, {server_dir!r})
+    import main_http_server as server
+
+    async def main():
+        await server.startup_event()
+        for is_float in (False, True):
+            reserved = 0
+            while reserved < {per_type}:
+                reserved += len(await server.reserve_numbers(min(1000, {per_type} - reserved), is_float))
+        await server.shutdown_event()
+
+    asyncio.run(main())
+""")
+
+
+def scaled(value, is_float):
+    return round(value * 10 ** RandomNumberGenerator.FLOAT_DECIMALS) if is_float else value
+
+
+@pytest.mark.parametrize("is_float", [False, True])
+def test_random_mode_stays_in_its_slice(is_float):
+    for node_id in range(3):
+        rng = RandomNumberGenerator(node_id=node_id, partition_count=3)
+        for _ in range(1000):
+            value = rng.generate_random_number(is_float=is_float)
+            assert scaled(value, is_float) % 3 == node_id
+            assert 0 <= value <= (RandomNumberGenerator.FLOAT_UPPER if is_float else (1 << 32) - 1)
+
+
+def test_permutation_mode_slices_are_disjoint(tmp_path):
+    issued = []
+    for node_id in range(4):
+        rng = RandomNumberGenerator(mode="permutation", state_file=tmp_path / f"state_{node_id}.json",
+                                    node_id=node_id, partition_count=4)
+        issued.append({rng.generate_random_number(is_float=True) for _ in range(2000)})
+        assert len(issued[-1]) == 2000
+    assert len(set().union(*issued)) == 4 * 2000
+
+
+def test_permutation_slice_is_exhausted_exactly():
+    # The float domain has 2,000,001 values: node 0 of 2 owns one more than node 1.
+    sizes = [RandomNumberGenerator(node_id=n, partition_count=2).slice_size(True) for n in range(2)]
+    assert sizes == [1_000_001, 1_000_000]
+
+
+def test_vectorized_candidates_stay_in_their_slice():
+    ints = unique_candidates(5000, False, [], node_id=2, partition_count=5)
+    assert np.all(ints % 5 == 2)
+    floats = unique_candidates(5000, True, [], node_id=1, partition_count=5)
+    assert np.all(np.round(floats * 10 ** RandomNumberGenerator.FLOAT_DECIMALS) % 5 == 1)
+
+
+def test_node_id_must_be_inside_partition_count():
+    with pytest.raises(ValueError):
+        RandomNumberGenerator(node_id=3, partition_count=3)
+
+
+def test_server_instances_with_separate_dbs_never_overlap(tmp_path):
+    partition_count, per_type = 4, 20_000
+    processes = []
+    for node_id in range(partition_count):
+        node_dir = tmp_path / f"node_{node_id}"
+        node_dir.mkdir()
+        env = dict(os.environ, NODE_ID=str(node_id), PARTITION_COUNT=str(partition_count))
+        script = INSTANCE_SCRIPT.format(server_dir=str(SERVER_DIR), per_type=per_type)
+        processes.append(subprocess.Popen([sys.executable, "-c", script], cwd=node_dir, env=env,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE))
+    for process in processes:
+        _, stderr = process.communicate(timeout=300)
+        assert process.returncode == 0, stderr.decode()
+
+    seen = set()
+    for node_id in range(partition_count):
+        with sqlite3.connect(tmp_path / f"node_{node_id}" / "random_numbers.db") as conn:
+            numbers = [row[0] for row in conn.execute("SELECT number FROM random_numbers")]
+        assert len(numbers) == 2 * per_type
+        assert seen.isdisjoint(numbers), f"Node {node_id} issued numbers another node issued"
+        seen.update(numbers)
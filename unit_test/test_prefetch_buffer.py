@@ -0,0 +1,128 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add the project root and the sharded server directory to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scalable_unique_random_http_server_fastapi_sharded"))
+
+from utils.pooled_db_utils import DatabaseUtils
+from prefetch_buffer import ShardPrefetchBuffer
+
+
+async def make_shard(tmp_path, values):
+    db = DatabaseUtils(str(tmp_path / "shard_0.db"))
+    await db.create_table()
+    await db.insert_values(values)
+    return db
+
+
+async def used_counts(db):
+    async with db._connect() as conn:
+        cursor = await conn.execute(f"SELECT used, COUNT(*) FROM {db.table_name} GROUP BY used")
+        return dict(await cursor.fetchall())
+
+
+@pytest.mark.asyncio
+async def test_pop_serves_every_number_once(tmp_path):
+    values = [float(v) for v in range(50)]
+    db = await make_shard(tmp_path, values)
+    buffer = ShardPrefetchBuffer(0, db, buffer_size=10, low_watermark=3)
+    await buffer.start()
+
+    served = [await buffer.pop() for _ in range(len(values))]
+    assert sorted(served) == values
+    assert await buffer.pop() is None, "An exhausted shard should return None"
+    await buffer.stop()
+    assert await used_counts(db) == {DatabaseUtils.USED: 50}
+
+
+@pytest.mark.asyncio
+async def test_burn_mode_claims_as_used_and_releases_on_clean_stop(tmp_path):
+    db = await make_shard(tmp_path, [float(v) for v in range(20)])
+    buffer = ShardPrefetchBuffer(0, db, buffer_size=10, low_watermark=0)
+    await buffer.start()
+    assert await used_counts(db) == {DatabaseUtils.UNUSED: 10, DatabaseUtils.USED: 10}
+
+    await buffer.pop()
+    await buffer.stop()
+    assert await used_counts(db) == {DatabaseUtils.UNUSED: 19, DatabaseUtils.USED: 1}
+
+
+@pytest.mark.asyncio
+async def test_release_mode_returns_crash_leftovers(tmp_path):
+    db = await make_shard(tmp_path, [float(v) for v in range(20)])
+    crashed = ShardPrefetchBuffer(0, db, buffer_size=10, low_watermark=0, claimed_on_startup="release")
+    await crashed.start()
+    assert await used_counts(db) == {DatabaseUtils.UNUSED: 10, DatabaseUtils.CLAIMED: 10}
+    # Simulate a crash: the buffer is never stopped.
+
+    restarted = ShardPrefetchBuffer(0, db, buffer_size=5, low_watermark=0, claimed_on_startup="release")
+    await restarted.start()
+    assert await used_counts(db) == {DatabaseUtils.UNUSED: 15, DatabaseUtils.CLAIMED: 5}
+    await restarted.stop()
+
+
+@pytest.mark.asyncio
+async def test_burn_mode_burns_crash_leftovers(tmp_path):
+    db = await make_shard(tmp_path, [float(v) for v in range(20)])
+    await db.claim_batch(10, mark=DatabaseUtils.CLAIMED)
+
+    buffer = ShardPrefetchBuffer(0, db, buffer_size=5, low_watermark=0)
+    await buffer.start()
+    assert await used_counts(db) == {DatabaseUtils.UNUSED: 5, DatabaseUtils.USED: 15}
+    await buffer.stop()
+
+
+@pytest.mark.asyncio
+async def test_pop_many_drains_buffer_then_claims_shortfall(tmp_path):
+    values = [float(v) for v in range(30)]
+    db = await make_shard(tmp_path, values)
+    buffer = ShardPrefetchBuffer(0, db, buffer_size=5, low_watermark=0)
+    await buffer.start()
+
+    batch = await buffer.pop_many(12)
+    assert len(batch) == 12 and len(set(batch)) == 12
+    rest = await buffer.pop_many(100)
+    assert sorted(batch + rest) == values, "A short shard should return what it has left"
+    await buffer.stop()
+    assert await used_counts(db) == {DatabaseUtils.USED: 30}
+
+
+@pytest.mark.asyncio
+async def test_prebuilt_bodies_follow_the_buffered_numbers(tmp_path):
+    db = await make_shard(tmp_path, [float(v) for v in range(30)])
+    buffer = ShardPrefetchBuffer(0, db, buffer_size=10, low_watermark=0,
+                                 serialize=lambda number: f"<{number}>".encode())
+    await buffer.start()
+
+    first = await buffer.pop()
+    body = await buffer.pop_body()
+    taken = await buffer.pop_many(3)
+    buffer.release(taken[1:])
+    assert len(buffer.bodies) == len(buffer.buffer)
+    assert list(buffer.bodies) == [f"<{n}>".encode() for n in buffer.buffer]
+    assert body != f"<{first}>".encode() and body.startswith(b"<")
+    await buffer.stop()
+    assert not buffer.bodies
+
+
+@pytest.mark.asyncio
+async def test_stock_follows_pops_releases_and_refills(tmp_path):
+    db = await make_shard(tmp_path, [float(v) for v in range(30)])
+    buffer = ShardPrefetchBuffer(0, db, buffer_size=10, low_watermark=0)
+    await buffer.start()
+    assert buffer.stock == 30
+
+    await buffer.pop()
+    taken = await buffer.pop_many(4)
+    buffer.release(taken[:2])
+    assert buffer.stock == 27
+    await db.insert_values([100.0, 101.0])
+    buffer.add_stock(2)
+    assert buffer.stock == 29 == await buffer.sync_stock()
+
+    assert len(await buffer.pop_many(40)) == 29
+    assert buffer.stock == 0 and await buffer.pop() is None
+    await buffer.stop()
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# Add the project root and the sharded server directory to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scalable_unique_random_http_server_fastapi_sharded"))
+
+from utils.pooled_db_utils import DatabaseUtils
+from refill_scheduler import RefillScheduler
+
+
+def make_scheduler(depths, **kwargs):
+    """Scheduler over fake shards whose depths live in a dict."""
+    refills = []
+
+    async def get_depth(shard_idx):
+        return depths[shard_idx]
+
+    async def refill(shard_idx, count):
+        refills.append((shard_idx, count))
+        depths[shard_idx] += count
+
+    scheduler = RefillScheduler(list(depths), get_depth, refill, **kwargs)
+    return scheduler, refills
+
+
+@pytest.mark.asyncio
+async def test_refills_low_shards_emptiest_first_up_to_high_watermark():
+    depths = {0: 500, 1: 50, 2: 2000, 3: 0}
+    scheduler, refills = make_scheduler(depths, low_watermark=1000, high_watermark=3000)
+
+    await scheduler.run_once()
+    assert refills == [(3, 3000), (1, 2950), (0, 2500)]
+    assert depths == {0: 3000, 1: 3000, 2: 2000, 3: 3000}
+    assert scheduler.depths == depths
+    assert scheduler.refill_count == 3
+
+
+@pytest.mark.asyncio
+async def test_no_refill_at_or_above_low_watermark():
+    depths = {0: 1000, 1: 4000}
+    scheduler, refills = make_scheduler(depths, low_watermark=1000, high_watermark=3000)
+
+    await scheduler.run_once()
+    assert refills == []
+
+
+@pytest.mark.asyncio
+async def test_failed_refill_does_not_stop_the_others():
+    depths = {0: 0, 1: 10}
+
+    async def get_depth(shard_idx):
+        return depths[shard_idx]
+
+    async def refill(shard_idx, count):
+        if shard_idx == 0:
+            raise RuntimeError("disk full")
+        depths[shard_idx] += count
+
+    scheduler = RefillScheduler([0, 1], get_depth, refill, low_watermark=100, high_watermark=200)
+    await scheduler.run_once()
+    assert depths == {0: 0, 1: 200}
+    assert scheduler.refill_count == 1
+
+
+@pytest.mark.asyncio
+async def test_notify_wakes_background_task_before_interval():
+    depths = {0: 5000}
+    scheduler, refills = make_scheduler(depths, low_watermark=1000, high_watermark=3000, interval=60)
+    scheduler.start()
+    await asyncio.sleep(0.05)  # First check finds nothing to do
+    assert refills == []
+
+    depths[0] = 10
+    scheduler.notify()
+    await asyncio.sleep(0.05)
+    await scheduler.stop()
+    assert refills == [(0, 2990)]
+
+
+def test_watermarks_must_be_ordered():
+    with pytest.raises(ValueError):
+        RefillScheduler([0], None, None, low_watermark=100, high_watermark=100)
+
+
+@pytest.mark.asyncio
+async def test_count_unused(tmp_path):
+    db = DatabaseUtils(str(tmp_path / "shard_0.db"))
+    await db.create_table()
+    await db.insert_values([float(v) for v in range(10)])
+    await db.claim_batch(3)
+    assert await db.count_unused() == 7
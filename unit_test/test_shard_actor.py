@@ -0,0 +1,65 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root and the sharded server directory to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scalable_unique_random_http_server_fastapi_sharded"))
+
+from utils.pooled_db_utils import DatabaseUtils
+from prefetch_buffer import ShardPrefetchBuffer
+from shard_actor import ShardActor
+
+
+@pytest.mark.asyncio
+async def test_concurrent_claims_share_transactions_and_never_overlap(tmp_path):
+    actor = ShardActor(0, str(tmp_path / "shard_0.db"), max_batch=16)
+    await actor.start()
+    await actor.insert_values([float(v) for v in range(500)])
+    assert await actor.count_unused() == 500
+
+    transactions = actor.transactions
+    claims = await asyncio.gather(*(actor.claim_batch(5) for _ in range(80)))
+    claimed = [n for claim in claims for n in claim]
+    assert len(claimed) == 400 and len(set(claimed)) == 400
+    assert actor.transactions - transactions <= 80 // 2, "Queued claims should be batched"
+    assert await actor.count_unused() == 100
+    await actor.stop()
+    assert not actor.is_running
+    with pytest.raises(RuntimeError):
+        await actor.count_unused()
+
+
+@pytest.mark.asyncio
+async def test_a_failing_operation_only_fails_its_caller(tmp_path):
+    actor = ShardActor(0, str(tmp_path / "shard_0.db"))
+    await actor.start()
+    await actor.insert_values([1.0, 2.0, 3.0])
+    results = await asyncio.gather(
+        actor.claim_batch(1),
+        actor.set_used_flag([object()], DatabaseUtils.USED),  # Cannot be bound as a parameter
+        actor.claim_batch(1),
+        return_exceptions=True,
+    )
+    assert len(results[0]) == 1 and len(results[2]) == 1
+    assert isinstance(results[1], Exception)
+    assert await actor.count_unused() == 1
+    await actor.stop()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_buffer_on_an_actor(tmp_path):
+    actor = ShardActor(0, str(tmp_path / "shard_0.db"))
+    await actor.start()
+    await actor.insert_values([float(v) for v in range(30)])
+    buffer = ShardPrefetchBuffer(0, actor, buffer_size=10, low_watermark=3, claimed_on_startup="release")
+    await buffer.start()
+
+    served = [await buffer.pop() for _ in range(12)] + await buffer.pop_many(5)
+    assert len(set(served)) == 17
+    await buffer.stop()
+    assert await actor.count_unused() == 13
+    await actor.stop()
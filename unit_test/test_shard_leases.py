@@ -0,0 +1,108 @@
+import aiosqlite
+import pytest
+import sys
+from pathlib import Path
+
+# Add the project root and the sharded server directory to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scalable_unique_random_http_server_fastapi_sharded"))
+
+from shard_leases import ShardLeaseManager
+
+SHARD_GROUPS = [[0, 1], [2, 3]]
+
+
+def make_worker(tmp_path, owner, serving):
+    """Lease manager whose acquire/release callbacks record shards in `serving[owner]`."""
+    serving[owner] = set()
+
+    async def on_acquire(shard_idx):
+        assert all(shard_idx not in shards for shards in serving.values()), \
+            f"Shard {shard_idx} would be served twice"
+        serving[owner].add(shard_idx)
+
+    async def on_release(shard_idx):
+        serving[owner].discard(shard_idx)
+
+    # A long heartbeat interval: the tests drive heartbeats by hand.
+    return ShardLeaseManager(str(tmp_path / "leases.db"), owner, SHARD_GROUPS, on_acquire, on_release,
+                             lease_ttl=120, heartbeat_interval=60)
+
+
+async def expire(tmp_path, owner):
+    """Simulate a worker that died: its registration and leases run out."""
+    async with aiosqlite.connect(str(tmp_path / "leases.db")) as conn:
+        await conn.execute("UPDATE lease_workers SET expires_at = 0 WHERE owner = ?", (owner,))
+        await conn.execute("UPDATE shard_leases SET expires_at = 0 WHERE owner = ?", (owner,))
+        await conn.commit()
+
+
+@pytest.mark.asyncio
+async def test_single_worker_leases_every_shard(tmp_path):
+    serving = {}
+    worker = make_worker(tmp_path, "a", serving)
+    await worker.start()
+    assert worker.owned == serving["a"] == {0, 1, 2, 3}
+    await worker.stop()
+    assert serving["a"] == set()
+
+
+@pytest.mark.asyncio
+async def test_workers_split_each_group_without_overlap(tmp_path):
+    serving = {}
+    a = make_worker(tmp_path, "a", serving)
+    b = make_worker(tmp_path, "b", serving)
+    await a.start()
+    await b.start()  # Everything is leased to a; b registers and waits
+    assert b.owned == set()
+
+    await a.heartbeat()  # a sees two live workers and hands back its excess
+    await b.heartbeat()
+    assert a.owned == {0, 2} and b.owned == {1, 3}
+    assert serving == {"a": {0, 2}, "b": {1, 3}}
+    await a.stop()
+    await b.stop()
+
+
+@pytest.mark.asyncio
+async def test_leases_of_dead_worker_are_reassigned(tmp_path):
+    serving = {}
+    a = make_worker(tmp_path, "a", serving)
+    b = make_worker(tmp_path, "b", serving)
+    await a.start()
+    await b.start()
+    await a.heartbeat()
+    await b.heartbeat()
+
+    a._task.cancel()  # a dies: no more heartbeats, shards never released
+    serving["a"] = set()
+    await expire(tmp_path, "a")
+    await b.heartbeat()
+    assert b.owned == {0, 1, 2, 3}
+    await b.stop()
+
+
+@pytest.mark.asyncio
+async def test_worker_stops_serving_a_shard_taken_over(tmp_path):
+    serving = {}
+    a = make_worker(tmp_path, "a", serving)
+    await a.start()
+    # a stalls long enough for its leases to expire and b to take them all.
+    await expire(tmp_path, "a")
+    serving["a"] = set()
+    b = make_worker(tmp_path, "b", serving)
+    await b.start()
+    assert b.owned == {0, 1, 2, 3}
+
+    serving["a"] = {0, 1, 2, 3}  # What a still believes it serves
+    await a.heartbeat()
+    assert a.owned == set() and serving["a"] == set()
+    await a.stop()
+    await b.stop()
+
+
+def test_heartbeat_must_be_shorter_than_ttl(tmp_path):
+    with pytest.raises(ValueError):
+        ShardLeaseManager(str(tmp_path / "leases.db"), "a", SHARD_GROUPS, None, None,
+                          lease_ttl=5, heartbeat_interval=5)
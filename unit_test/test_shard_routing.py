@@ -0,0 +1,162 @@
+import importlib.util
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root and the sharded server directory to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SERVER_DIR = PROJECT_ROOT / "scalable_unique_random_http_server_fastapi_sharded"
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(SERVER_DIR))
+
+from shard_leases import ShardLeaseManager
+from shard_topology import ShardTopology
+from utils.pooled_db_utils import DatabaseUtils
+
+
+def load_server(name: str):
+    # Loaded under its own name: the other servers' modules are also called main_http_server.
+    # Each name is a separate copy with its own state, like a separate worker process.
+    spec = importlib.util.spec_from_file_location(name, SERVER_DIR / "main_http_server.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+server = load_server("sharded_main_http_server")
+
+
+class FakeBuffer:
+    """Stands in for a ShardPrefetchBuffer whose `stock` may be out of date."""
+
+    def __init__(self, numbers, stock=None):
+        self.numbers = list(numbers)
+        self.stock = len(self.numbers) if stock is None else stock
+
+    async def pop(self):
+        if not self.numbers:
+            self.stock = 0
+            return None
+        self.stock -= 1
+        return self.numbers.pop()
+
+    async def pop_many(self, count):
+        numbers, self.numbers = self.numbers[:count], self.numbers[count:]
+        self.stock = len(self.numbers)
+        return numbers
+
+
+@pytest.fixture
+def shards(monkeypatch):
+    ids = server.TOPOLOGY.ids()[:3]
+    buffers = {ids[0]: FakeBuffer([], stock=5), ids[1]: FakeBuffer([1, 2, 3]), ids[2]: FakeBuffer([])}
+    for shard_idx, buffer in buffers.items():
+        monkeypatch.setitem(server.SHARD_BUFFERS, shard_idx, buffer)
+    return ids, buffers
+
+
+def test_only_shards_with_stock_are_picked(shards):
+    ids, buffers = shards
+    assert {server.pick_shard(ids) for _ in range(200)} == {ids[0], ids[1]}
+    buffers[ids[0]].stock = buffers[ids[1]].stock = 0
+    assert server.pick_shard(ids) is None
+
+
+@pytest.mark.asyncio
+async def test_an_empty_shard_fails_over_to_one_with_stock(shards):
+    ids, buffers = shards
+    served = [await server.pop_numbers(ids) for _ in range(3)]
+    assert sorted(numbers[0] for _, numbers in served) == [1, 2, 3]
+    assert {shard_idx for shard_idx, _ in served} == {ids[1]}
+    # Shard ids[0] claimed stock it did not have; it is found empty and skipped from then on
+    assert buffers[ids[0]].stock == 0
+    assert await server.pop_numbers(ids) == (None, [])
+    assert await server.pop_numbers(ids, count=5) == (None, [])
+
+
+@pytest.mark.asyncio
+async def test_requests_are_served_from_shards_of_their_type(monkeypatch):
+    async def no_direct_claims(number_type, count, one_shard=False):
+        return None, []
+    monkeypatch.setattr(server, "claim_direct", no_direct_claims)  # Keep off the real shard files
+    int_idx, float_idx = server.TOPOLOGY.ids("int")[0], server.TOPOLOGY.ids("float")[0]
+    monkeypatch.setitem(server.SHARD_BUFFERS, int_idx, FakeBuffer([7, 8]))
+    monkeypatch.setitem(server.SHARD_BUFFERS, float_idx, FakeBuffer([0.5, 0.25]))
+    monkeypatch.setitem(server.ACTIVE_SHARDS, "int", [int_idx])
+    monkeypatch.setitem(server.ACTIVE_SHARDS, "float", [float_idx])
+
+    assert await server.get_random(type="float", count=None) == {"shard": float_idx, "number": 0.25}
+    assert await server.get_random(type="FLOAT", count=None) == {"shard": float_idx, "number": 0.5}
+    assert await server.get_random(type="int", count=5) == {"shard": int_idx, "numbers": [7, 8]}
+    assert server.type_stock("int") == 0 and server.type_stock("float") == 0
+    with pytest.raises(server.HTTPException) as error:
+        await server.get_random(type="int", count=None)
+    assert error.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_a_short_shard_is_topped_up_from_the_others(monkeypatch):
+    ids = server.TOPOLOGY.ids("int")[:2]
+    # The first shard claims more stock than it has, so it is the likely pick and falls short
+    monkeypatch.setitem(server.SHARD_BUFFERS, ids[0], FakeBuffer([1, 2], stock=1000))
+    monkeypatch.setitem(server.SHARD_BUFFERS, ids[1], FakeBuffer([3, 4, 5, 6]))
+
+    shard_idx, numbers = await server.pop_count(ids, 5)
+    assert len(numbers) == 5 and len(set(numbers)) == 5 and set(numbers) <= {1, 2, 3, 4, 5, 6}
+    shard_idx, numbers = await server.pop_count(ids, 5)
+    assert len(numbers) == 1  # Every shard ran out
+    assert await server.pop_count(ids, 5) == (None, [])
+
+
+@pytest.mark.asyncio
+async def test_workers_without_leases_serve_until_every_shard_is_empty(tmp_path):
+    """Three workers, one shard per type: two of them hold no lease and still never answer 503 early."""
+    def layout():
+        return ShardTopology(tmp_path / "topology.json", default_shards=2, default_int_shards=1)
+
+    for shard_idx in layout().ids():
+        db = DatabaseUtils(layout().shard_path(shard_idx))
+        await db.create_table()
+        await db.insert_values([float(shard_idx * 1000 + v) for v in range(60)])
+
+    workers = []
+    try:
+        for i in range(3):
+            worker = load_server(f"sharded_worker_{i}")
+            worker.TOPOLOGY = layout()
+            worker.PREFETCH_BUFFER_SIZE = {"int": 10, "float": 10}
+            worker.PREFETCH_LOW_WATERMARK = {"int": 2, "float": 2}
+            worker.SHARD_LEASES = ShardLeaseManager(str(tmp_path / "leases.db"), f"w{i}", worker.TOPOLOGY.groups(),
+                                                    worker.acquire_shard, worker.release_shard,
+                                                    lease_ttl=120, heartbeat_interval=60)
+            await worker.SHARD_LEASES.start()
+            workers.append(worker)
+        for worker in workers:
+            await worker.SHARD_LEASES.heartbeat()
+        assert [len(worker.SHARD_LEASES.owned) for worker in workers] == [2, 0, 0]
+
+        served = {"int": [], "float": []}
+        for number_type in served:
+            # Requests to random workers, until one finds nothing left to claim
+            while True:
+                worker = random.choice(workers)
+                try:
+                    served[number_type].append((await worker.get_random(type=number_type, count=None))["number"])
+                except worker.HTTPException as error:
+                    assert error.status_code == 503
+                    # Only numbers buffered by the lease owner can be left; it serves them
+                    assert 60 - len(served[number_type]) <= workers[0].PREFETCH_BUFFER_SIZE[number_type]
+                    owner = workers[0]
+                    while True:
+                        try:
+                            served[number_type].append((await owner.get_random(type=number_type, count=None))["number"])
+                        except owner.HTTPException:
+                            break
+                    break
+        assert sorted(served["int"]) == [float(v) for v in range(60)]
+        assert sorted(served["float"]) == [float(1000 + v) for v in range(60)]
+    finally:
+        for worker in workers:
+            await worker.on_shutdown()
@@ -0,0 +1,173 @@
+import json
+import multiprocessing
+import os
+import pytest
+import sys
+from pathlib import Path
+
+# Add the project root and the sharded server directory to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "scalable_unique_random_http_server_fastapi_sharded"))
+
+import initialize_shards
+import shard_manager
+from refill_scheduler import RefillScheduler
+from shard_leases import ShardLeaseManager
+from shard_manager import ShardManager
+from shard_topology import ShardTopology
+from utils.pooled_db_utils import DatabaseUtils
+from utils.random_number import RandomNumberGenerator
+
+
+def test_default_layout_without_a_file(tmp_path):
+    topology = ShardTopology(tmp_path / "topology.json", default_shards=6)
+    assert topology.groups() == [[0, 1, 2], [3, 4, 5]]
+    assert topology.shard_path(4) == str(tmp_path / "shard_4.db")
+    assert not topology.is_float(2) and topology.is_float(3)
+    assert topology.ids(states=("active",)) == [0, 1, 2, 3, 4, 5]
+
+
+def test_default_layout_sized_per_type(tmp_path):
+    topology = ShardTopology(tmp_path / "topology.json", default_shards=5, default_int_shards=1)
+    assert topology.groups() == [[0], [1, 2, 3, 4]]
+
+
+def test_added_and_removed_shards_persist_and_ids_are_not_reused(tmp_path):
+    topology = ShardTopology(tmp_path / "topology.json")
+    entry = topology.add_shard("float", weight=2.0)
+    assert entry["id"] == 4 and entry["state"] == "filling"
+    topology.remove_shard(0)
+    topology.save()
+
+    other = ShardTopology(tmp_path / "topology.json")
+    assert other.ids() == [1, 2, 3, 4]
+    assert other.ids("float", ShardTopology.ROUTED_STATES) == [2, 3]
+    assert other.weight(4) == 2.0
+    assert other.add_shard("int")["id"] == 5
+
+    assert not topology.reload_if_changed()
+    other.set_state(4, "active")
+    other.save()
+    assert topology.reload_if_changed() and topology.state(4) == "active"
+    assert [s["id"] for s in json.loads((tmp_path / "topology.json").read_text())["shards"]] == [1, 2, 3, 4, 5]
+
+    # A save that lands within the same mtime is still picked up
+    mtime = os.stat(tmp_path / "topology.json").st_mtime_ns
+    other.set_state(4, "draining")
+    other.save()
+    os.utime(tmp_path / "topology.json", ns=(mtime, mtime))
+    assert topology.reload_if_changed() and topology.state(4) == "draining"
+
+
+def add_int_shards(path, count: int):
+    topology = ShardTopology(path)
+    for _ in range(count):
+        topology.update(lambda topology: topology.add_shard("int"))
+
+
+def test_concurrent_updates_from_several_processes_are_all_kept(tmp_path):
+    path = tmp_path / "topology.json"
+    ShardTopology(path).save()
+    workers = [multiprocessing.Process(target=add_int_shards, args=(path, 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    topology = ShardTopology(path)
+    assert topology.ids() == list(range(104)) and topology.next_id == 104
+
+
+def test_invalid_shard_settings_are_rejected(tmp_path):
+    topology = ShardTopology(tmp_path / "topology.json")
+    with pytest.raises(ValueError):
+        topology.add_shard("decimal")
+    with pytest.raises(ValueError):
+        topology.add_shard("int", weight=0)
+    with pytest.raises(ValueError):
+        topology.set_state(0, "paused")
+
+
+@pytest.mark.asyncio
+async def test_populate_shard_uses_the_topology(tmp_path, monkeypatch):
+    monkeypatch.setattr(initialize_shards, "SHARD_DIR", str(tmp_path))
+    topology = initialize_shards.load_topology()
+    idx = topology.add_shard("float")["id"]
+    topology.save()
+
+    await initialize_shards.populate_shard(idx, 50, str(tmp_path / "meta.db"), RandomNumberGenerator())
+    values = await DatabaseUtils(str(tmp_path / f"shard_{idx}.db")).fetch_all_values()
+    assert len(values) == 50 and all(isinstance(v, float) for v in values)
+
+    # Shard 0 holds ints in the default layout
+    await DatabaseUtils(str(tmp_path / "shard_0.db")).create_table()
+    await ShardManager([0], str(tmp_path / "meta.db"), str(tmp_path)).refill_shard(0, 20)
+    values = await DatabaseUtils(str(tmp_path / "shard_0.db")).fetch_all_values()
+    assert len(values) == 20 and all(v == int(v) for v in values)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("vectorized", [True, False])
+async def test_populate_shard_skips_used_numbers(tmp_path, vectorized):
+    # Floats 0.0, 0.1, ..., 2.0 only: a tiny domain where most draws collide
+    rng = RandomNumberGenerator(node_id=0, partition_count=100_000)
+    meta_db = DatabaseUtils(str(tmp_path / "meta.db"), "used_numbers")
+    await meta_db.create_table(is_metadata=True)
+    used = [round(k * 0.1, 6) for k in range(15)]
+    await meta_db.insert_new_values(used)
+
+    added = await initialize_shards.populate_shard(0, 4, str(tmp_path / "meta.db"), rng, vectorized=vectorized,
+                                                   is_float=True, shard_path=str(tmp_path / "shard_0.db"))
+    values = await DatabaseUtils(str(tmp_path / "shard_0.db")).fetch_all_values()
+    assert 0 < added <= 4 and len(values) == added
+    assert not set(values) & set(used)
+    assert len(await meta_db.fetch_all_values()) == 15 + added
+
+
+@pytest.mark.asyncio
+async def test_shard_manager_refills_from_its_partition(tmp_path, monkeypatch):
+    monkeypatch.setattr(shard_manager, "NODE_ID", 1)
+    monkeypatch.setattr(shard_manager, "PARTITION_COUNT", 3)
+    await DatabaseUtils(str(tmp_path / "meta.db"), "used_numbers").create_table(is_metadata=True)
+    await DatabaseUtils(str(tmp_path / "shard_0.db")).create_table()
+    await ShardManager([0], str(tmp_path / "meta.db"), str(tmp_path)).refill_shard(0, 50)
+    values = await DatabaseUtils(str(tmp_path / "shard_0.db")).fetch_all_values()
+    assert len(values) == 50 and all(int(v) % 3 == 1 for v in values)
+
+
+@pytest.mark.asyncio
+async def test_shards_dropped_from_the_groups_are_released(tmp_path):
+    serving = set()
+
+    async def on_acquire(shard_idx):
+        serving.add(shard_idx)
+
+    async def on_release(shard_idx):
+        serving.discard(shard_idx)
+
+    leases = ShardLeaseManager(str(tmp_path / "leases.db"), "a", [[0, 1], [2, 3]], on_acquire, on_release,
+                               lease_ttl=120, heartbeat_interval=60)
+    await leases.start()
+    leases.set_groups([[1, 4], [2, 3]])
+    await leases.heartbeat()
+    assert leases.owned == serving == {1, 2, 3, 4}
+    await leases.stop()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_reads_the_shard_list_on_every_check():
+    shards = [0]
+    refilled = []
+
+    async def get_depth(shard_idx):
+        return 0
+
+    async def refill(shard_idx, count):
+        refilled.append(shard_idx)
+
+    scheduler = RefillScheduler(lambda: list(shards), get_depth, refill, low_watermark=10, high_watermark=20)
+    await scheduler.run_once()
+    shards.append(1)
+    await scheduler.run_once()
+    assert refilled == [0, 0, 1]
@@ -0,0 +1,46 @@
+import httpx
+import pytest
+import sys
+from pathlib import Path
+
+# Add the sharded server directory (home of stress_test.py) to the sys.path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT / "scalable_unique_random_http_server_fastapi_sharded"))
+
+from stress_test import LatencyHistogram, LoadRun, open_loop_schedule
+
+
+def test_histogram_percentiles_within_one_percent():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    assert histogram.percentile(50) == pytest.approx(0.5, rel=0.01)
+    assert histogram.percentile(99) == pytest.approx(0.99, rel=0.01)
+    assert histogram.percentile(100) == 1.0
+
+
+def test_ramp_schedule_sends_the_average_rate():
+    offsets = list(open_loop_schedule(100, 300, 10))
+    assert len(offsets) == pytest.approx(2000, rel=0.01)
+    assert offsets == sorted(offsets) and offsets[-1] < 10
+
+
+@pytest.mark.asyncio
+async def test_load_run_counts_duplicates_and_errors():
+    responses = iter([
+        httpx.Response(200, json={"number": 1}),
+        httpx.Response(200, json={"numbers": [2, 3, 1]}),
+        httpx.Response(503, json={"detail": "Shard 0 is empty."}),
+    ])
+    transport = httpx.MockTransport(lambda request: next(responses))
+    async with httpx.AsyncClient(transport=transport) as client:
+        run = LoadRun(client, "http://test/random", float_ratio=0.0)
+        for _ in range(3):
+            await run.send(scheduled=0.0)
+
+    summary = run.summary(elapsed=1.0, config={})
+    assert summary["numbers_received"] == 4
+    assert summary["duplicates"] == 1
+    assert summary["status_codes"] == {"200": 2, "503": 1}
+    assert summary["errors"] == {"HTTP 503: Shard 0 is empty.": 1}
+    assert summary["requests"] == 3
@@ -4,6 +4,7 @@ import asyncio
 import random
 import aiosqlite
 import pytest
+import subprocess
 import sys
 from pathlib import Path
 # Add the parent directory to the sys.path
@@ -12,7 +13,12 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 # Importing our utility classes.
 from utils.db_utils import DatabaseHandler            # From your first utils file
 from utils.pooled_db_utils import DatabaseUtils     # From pooled_db_utils.py
-from utils.random_number import RandomNumberGenerator  # From random_numbers.py
+from utils.random_number import RandomNumberGenerator, FeistelPermutation  # From random_numbers.py
+from utils.connection_pool import ConnectionPool      # From connection_pool.py
+from utils.persistence_json_utils import UsedNumbersJournal  # From persistence_json_utils.py
+from utils.stream_utils import StreamStats, stream_numbers   # From stream_utils.py
+from utils.vectorized_numbers import unique_candidates      # From vectorized_numbers.py
+from utils.metrics import MetricsMiddleware, MetricsRegistry  # From metrics.py
 
 
 # Fixture to provide a temporary database file path.
@@ -52,6 +58,31 @@ class TestDatabaseHandler:
         result_duplicate = await db_handler.insert_number(test_number)
         assert result_duplicate is False, "Duplicate insertion should return False"
 
+    @pytest.mark.asyncio
+    async def test_insert_batch_reports_duplicates(self, db_file):
+        db_handler = DatabaseHandler(db_file)
+        await db_handler.init_db()
+        await db_handler.insert_number(1)
+
+        results = await db_handler.insert_batch([1, 2, 3, 2])
+        assert results == [False, True, True, False]
+
+    @pytest.mark.asyncio
+    async def test_group_commit_resolves_each_caller(self, db_file):
+        db_handler = DatabaseHandler(db_file)
+        await db_handler.init_db()
+        db_handler.start_group_commit(max_batch_size=8, max_latency=0.05)
+
+        numbers = list(range(20)) + [5, 6]
+        results = await asyncio.gather(*(db_handler.insert_number(n) for n in numbers))
+        await db_handler.stop_group_commit()
+
+        assert results.count(True) == 20, "Each distinct number should be inserted once"
+        assert results.count(False) == 2, "Repeated numbers should be reported as duplicates"
+        async with aiosqlite.connect(db_file) as conn:
+            cursor = await conn.execute("SELECT COUNT(*) FROM random_numbers")
+            assert (await cursor.fetchone())[0] == 20
+
 
 ###############################
 # Tests for DatabaseUtils
@@ -104,6 +135,292 @@ class TestDatabaseUtils:
         # Verify that all inserted numbers were popped.
         assert popped_values == set(numbers), "All inserted numbers should have been popped"
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("selection", DatabaseUtils.SELECTION_STRATEGIES)
+    async def test_selection_strategies_pop_each_number_once(self, db_file, selection):
+        db_utils = DatabaseUtils(db_file, selection=selection)
+        await db_utils.create_table()
+        numbers = [float(n) for n in range(100)]
+        await db_utils.insert_values(numbers)
+
+        popped = [await db_utils.pop_random_number() for _ in range(60)]
+        popped += await db_utils.claim_batch(100)
+        assert sorted(popped) == numbers
+        assert await db_utils.pop_random_number() is None
+
+    @pytest.mark.asyncio
+    async def test_pop_uses_the_used_id_index(self, db_file):
+        db_utils = DatabaseUtils(db_file)
+        await db_utils.create_table()
+        async with aiosqlite.connect(db_file) as conn:
+            cursor = await conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id, value FROM number_pool "
+                "WHERE used = 0 AND id >= 1 ORDER BY id LIMIT 1"
+            )
+            plan = " ".join(str(row[-1]) for row in await cursor.fetchall())
+        assert "idx_number_pool_used_id" in plan
+
+    @pytest.mark.asyncio
+    async def test_concurrent_record_new_values_never_overlap(self, db_file):
+        meta_db = DatabaseUtils(db_file, "used_numbers")
+        await meta_db.create_table(is_metadata=True)
+
+        def pick(existing_sorted):
+            # Smallest free values: two callers reading the same state would collide.
+            used = set(existing_sorted)
+            return [v for v in range(100) if v not in used][:10]
+
+        batches = await asyncio.gather(*(meta_db.record_new_values(pick) for _ in range(5)))
+        values = [v for batch in batches for v in batch]
+        assert sorted(values) == list(range(50))
+
+    @pytest.mark.asyncio
+    async def test_insert_new_values_returns_only_new_values(self, db_file):
+        meta_db = DatabaseUtils(db_file, "used_numbers")
+        await meta_db.create_table(is_metadata=True)
+        assert await meta_db.insert_new_values([3.0, 1.0, 2.0]) == [1.0, 2.0, 3.0]
+
+        batches = await asyncio.gather(*(meta_db.insert_new_values([2.0, 4.0, 4.0, 5.0]) for _ in range(3)))
+        assert sorted(v for batch in batches for v in batch) == [4.0, 5.0]
+        assert await meta_db.fetch_sorted_values() == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+###############################
+# Tests for ConnectionPool
+###############################
+class TestConnectionPool:
+    @pytest.mark.asyncio
+    async def test_acquire_requires_open_pool(self, db_file):
+        pool = ConnectionPool(db_file, size=1)
+        with pytest.raises(RuntimeError):
+            async with pool.acquire():
+                pass
+
+    @pytest.mark.asyncio
+    async def test_connections_are_reused_and_pragmas_applied(self, db_file):
+        pool = ConnectionPool(db_file, size=1)
+        await pool.open()
+        async with pool.acquire() as first:
+            cursor = await first.execute("PRAGMA journal_mode;")
+            assert (await cursor.fetchone())[0] == "wal"
+        async with pool.acquire() as second:
+            assert second is first, "A size-1 pool should hand out the same connection"
+        await pool.close()
+        assert not pool.is_open
+
+    @pytest.mark.asyncio
+    async def test_handlers_share_the_pool(self, db_file):
+        pool = ConnectionPool(db_file, size=2)
+        db_handler = DatabaseHandler(db_file, pool=pool)
+        await db_handler.init_db()
+        await pool.open()
+        assert await db_handler.insert_number(7) is True
+        assert await db_handler.insert_number(7) is False
+
+        db_utils = DatabaseUtils(db_file, pool=pool)
+        await db_utils.create_table()
+        await db_utils.insert_values([1.5, 2.5])
+        assert await db_utils.count_rows() == 2
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_unhealthy_connection_is_replaced(self, db_file):
+        pool = ConnectionPool(db_file, size=1, health_check_interval=0)
+        await pool.open()
+        async with pool.acquire() as conn:
+            broken = conn
+        await broken.close()
+        async with pool.acquire() as conn:
+            assert conn is not broken
+            cursor = await conn.execute("SELECT 1;")
+            assert (await cursor.fetchone())[0] == 1
+        await pool.close()
+
+
+###############################
+# Tests for UsedNumbersJournal
+###############################
+class TestUsedNumbersJournal:
+    def test_add_and_reload(self, tmp_path):
+        journal = UsedNumbersJournal(tmp_path / "used")
+        assert journal.load() == set()
+        journal.add(42)
+        journal.add(1.234567)
+        journal.close()
+
+        reloaded = UsedNumbersJournal(tmp_path / "used").load()
+        assert reloaded == {42, 1.234567}
+        assert {type(n) for n in reloaded} == {int, float}, "Type tags should round-trip"
+
+    def test_migrates_legacy_json_once(self, tmp_path):
+        legacy = tmp_path / "used_numbers.json"
+        legacy.write_text('[1, 2.5, "used_numbers"]')
+        journal = UsedNumbersJournal(tmp_path / "used", migrate_from=legacy)
+        assert journal.load() == {1, 2.5}, "Non-numeric JSON entries should be dropped"
+        journal.close()
+
+        legacy.write_text("[99]")  # Ignored: the journal already exists
+        assert UsedNumbersJournal(tmp_path / "used", migrate_from=legacy).load() == {1, 2.5}
+
+    def test_torn_record_is_ignored(self, tmp_path):
+        journal = UsedNumbersJournal(tmp_path / "used")
+        journal.load()
+        journal.add(7)
+        journal.close()
+        with open(tmp_path / "used.log", "ab") as f:
+            f.write(b"i\x01\x02")  # Partial record, as left by a crash mid-write
+
+        journal = UsedNumbersJournal(tmp_path / "used")
+        assert journal.load() == {7}
+        journal.add(8)
+        journal.close()
+        assert UsedNumbersJournal(tmp_path / "used").load() == {7, 8}
+
+    def test_snapshot_truncates_log(self, tmp_path):
+        journal = UsedNumbersJournal(tmp_path / "used", snapshot_every=3)
+        journal.load()
+        for n in range(3):
+            journal.add(n)
+        assert (tmp_path / "used.log").stat().st_size == 0
+        assert (tmp_path / "used.snap").stat().st_size == 3 * UsedNumbersJournal.RECORD_SIZE
+        journal.add(3)
+        journal.close()
+        assert UsedNumbersJournal(tmp_path / "used").load() == {0, 1, 2, 3}
+
+    def test_plain_journal_runs_without_numpy(self, tmp_path):
+        # The stdlib server's defaults must start where NumPy is not installed
+        script = (
+            "import sys; sys.modules['numpy'] = None\n"
+            f"sys.path.insert(0, {str(Path(__file__).resolve().parent.parent)!r})\n"
+            "from utils.persistence_json_utils import UsedNumbersJournal\n"
+            f"journal = UsedNumbersJournal({str(tmp_path / 'used')!r}, snapshot_every=2)\n"
+            "journal.load(); journal.add(1); journal.add(2.5); journal.add(3); journal.close()\n"
+            f"assert UsedNumbersJournal({str(tmp_path / 'used')!r}).load() == {{1, 2.5, 3}}\n"
+        )
+        subprocess.run([sys.executable, "-c", script], check=True, timeout=60)
+
+
+###############################
+# Tests for stream_numbers
+###############################
+class TestStreamNumbers:
+    @staticmethod
+    def counting_reserve(reserved):
+        async def reserve(count):
+            start = len(reserved)
+            batch = list(range(start, start + count))
+            reserved.extend(batch)
+            return batch
+        return reserve
+
+    @pytest.mark.asyncio
+    async def test_streams_ndjson_up_to_limit(self):
+        reserved, stats = [], StreamStats()
+        chunks = [c async for c in stream_numbers(self.counting_reserve(reserved), limit=25,
+                                                   batch_size=10, chunk_size=4, stats=stats)]
+        lines = "".join(chunks).splitlines()
+        assert [int(line) for line in lines] == list(range(25))
+        assert len(reserved) == 25, "Should never reserve past the limit"
+        assert stats.as_dict() == {"streams": 1, "sent": 25, "released": 0, "burned": 0}
+
+    @pytest.mark.asyncio
+    async def test_disconnect_releases_unsent_and_burns_in_flight(self):
+        reserved, released, stats = [], [], StreamStats()
+
+        async def release(numbers):
+            released.extend(numbers)
+
+        stream = stream_numbers(self.counting_reserve(reserved), batch_size=10, chunk_size=4,
+                                release=release, stats=stats)
+        await stream.__anext__()  # Chunk 0-3 confirmed once the next one is requested
+        await stream.__anext__()  # Chunk 4-7 is in flight when the client goes away
+        await stream.aclose()
+        await asyncio.sleep(0)  # Let the release task run
+
+        assert released == [8, 9]
+        assert stats.as_dict() == {"streams": 1, "sent": 4, "released": 2, "burned": 4}
+
+    @pytest.mark.asyncio
+    async def test_empty_storage_ends_stream(self):
+        async def reserve(count):
+            return []
+        assert [c async for c in stream_numbers(reserve)] == []
+
+
+###############################
+# Tests for metrics
+###############################
+class TestMetrics:
+    def test_counter_and_histogram_render_prometheus_text(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests.", ("status",))
+        counter.labels("200").inc()
+        counter.labels("200").inc(2)
+        histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+
+        lines = registry.render().splitlines()
+        assert 'requests_total{status="200"} 3' in lines
+        assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{le="1.0"} 2' in lines
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+        assert "latency_seconds_count 3" in lines
+        assert registry.counter("requests_total", "Requests.", ("status",)) is counter
+
+    def test_wrong_label_count_raises(self):
+        counter = MetricsRegistry().counter("c", "C.", ("a", "b"))
+        with pytest.raises(ValueError):
+            counter.labels("only-one")
+
+    @pytest.mark.asyncio
+    async def test_middleware_labels_by_route_and_status(self):
+        from fastapi import FastAPI
+        import httpx
+
+        registry = MetricsRegistry()
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware, registry=registry)
+
+        @app.get("/items/{item_id}")
+        async def item(item_id: int):
+            return {"id": item_id}
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/items/1")
+            await client.get("/items/2")
+            await client.get("/missing")
+
+        lines = registry.render().splitlines()
+        assert 'http_requests_total{path="/items/{item_id}",status="200"} 2' in lines
+        assert 'http_requests_total{path="other",status="404"} 1' in lines
+        assert 'http_request_duration_seconds_count{path="/items/{item_id}"} 2' in lines
+
+
+###############################
+# Tests for unique_candidates
+###############################
+class TestUniqueCandidates:
+    def test_integers_are_new_and_distinct(self):
+        existing = sorted(range(0, 2 ** 32, 2 ** 16))
+        numbers = unique_candidates(50_000, False, existing).tolist()
+        assert len(numbers) == 50_000 and len(set(numbers)) == 50_000
+        assert set(numbers).isdisjoint(existing)
+        assert all(isinstance(n, int) and 0 <= n < 2 ** 32 for n in numbers)
+
+    def test_floats_match_generator_rounding(self):
+        existing = [round(i / 1000, 6) for i in range(1000)]
+        numbers = unique_candidates(20_000, True, existing).tolist()
+        assert len(set(numbers)) == 20_000
+        assert set(numbers).isdisjoint(existing)
+        assert all(round(n, 6) == n and 0 <= n <= RandomNumberGenerator.FLOAT_UPPER for n in numbers)
+
+    def test_full_domain_raises(self):
+        everything = [i / 10 ** 6 for i in range(RandomNumberGenerator.FLOAT_UPPER * 10 ** 6 + 1)]
+        with pytest.raises(ValueError):
+            unique_candidates(1, True, everything)
+
 
 ###############################
 # Tests for RandomNumberGenerator
@@ -119,4 +436,31 @@ class TestRandomNumberGenerator:
         number = rng.generate_random_number(is_float=True)
         assert isinstance(number, float), "When is_float=True, the generated number should be a float"
         # Verify rounding: the function rounds to 6 decimal places.
-        assert round(number, 6) == number, "Float should be rounded to 6 decimal places"
\ No newline at end of file
+        assert round(number, 6) == number, "Float should be rounded to 6 decimal places"
+
+    def test_feistel_permutation_is_a_bijection(self):
+        for domain_size in (1, 2, 7, 1000, 4096):
+            permutation = FeistelPermutation(domain_size, key=b"test-key")
+            outputs = [permutation.permute(i) for i in range(domain_size)]
+            assert sorted(outputs) == list(range(domain_size))
+
+    def test_permutation_mode_is_unique_and_typed(self, tmp_path):
+        rng = RandomNumberGenerator(mode="permutation", state_file=tmp_path / "state.json")
+        ints = [rng.generate_random_number(is_float=False) for _ in range(5000)]
+        floats = [rng.generate_random_number(is_float=True) for _ in range(5000)]
+        assert len(set(ints)) == len(ints) and all(isinstance(n, int) for n in ints)
+        assert len(set(floats)) == len(floats) and all(isinstance(n, float) for n in floats)
+        assert all(0 <= n < 2 ** 32 for n in ints)
+        assert all(round(n, 6) == n for n in floats)
+
+    def test_permutation_mode_resumes_after_checkpoint(self, tmp_path):
+        state_file = tmp_path / "state.json"
+        first = RandomNumberGenerator(mode="permutation", state_file=state_file, block_size=10)
+        served = {first.generate_random_number() for _ in range(15)}
+
+        # A restart resumes after the last checkpointed block, skipping the rest of it.
+        second = RandomNumberGenerator(mode="permutation", state_file=state_file, block_size=10)
+        more = {second.generate_random_number() for _ in range(15)}
+        assert served.isdisjoint(more)
+        reference = FeistelPermutation(2 ** 32, first.state.key + b"int")
+        assert more == {reference.permute(i) for i in range(20, 35)}
@@ -0,0 +1,153 @@
+# utils/async_http.py
+
+import asyncio
+from http import HTTPStatus
+
+MAX_HEADER_BYTES = 8192       # Larger request heads get 431 and the connection is closed
+MAX_BODY_BYTES = 8192         # Larger declared request bodies get 413 and the connection is closed
+KEEP_ALIVE_TIMEOUT = 15.0     # Seconds an idle keep-alive connection stays open
+
+
+def build_response(status: int, body: bytes, keep_alive: bool = True) -> bytes:
+    """Complete HTTP/1.1 response with a JSON body."""
+    head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n")
+    if not keep_alive:
+        head += "Connection: close\r\n"
+    return head.encode("latin-1") + b"\r\n" + body
+
+
+class HTTPProtocol(asyncio.Protocol):
+    """
+    Minimal HTTP/1.1 server protocol for small GET APIs, on the stdlib only.
+
+    Connections are kept alive (HTTP/1.1 by default, HTTP/1.0 with
+    "Connection: keep-alive") and pipelined requests are answered in order:
+    every complete request in a read is handled and the responses are written
+    with one write() call. Only the request line and the Connection,
+    Content-Length and Transfer-Encoding headers are looked at; request
+    bodies of up to MAX_BODY_BYTES are skipped, larger and chunked ones are
+    refused, so a connection never buffers more than a head and a small body.
+
+    handle(target) -> (status, body): the application, called on the event
+    loop for each GET request (other methods get 501), with the raw request
+    target (e.g. b"/random?type=float"). As all requests run on one thread,
+    one at a time, the application needs no locking for state it does not
+    share with other threads.
+    """
+
+    def __init__(self, handle, keep_alive_timeout: float = KEEP_ALIVE_TIMEOUT):
+        self.handle = handle
+        self.keep_alive_timeout = keep_alive_timeout
+        self.transport = None
+        self.buffer = bytearray()
+        self.closing = False
+        self._loop = asyncio.get_running_loop()
+        self._last_activity = self._loop.time()
+        self._idle_timer = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._idle_timer = self._loop.call_later(self.keep_alive_timeout, self._check_idle)
+
+    def connection_lost(self, exc):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        self.transport = None
+
+    # Stop reading new requests while the client is not reading responses
+    def pause_writing(self):
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+    def data_received(self, data: bytes):
+        if self.closing:
+            return
+        self.buffer += data
+        responses = []
+        while True:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end < 0:
+                if len(self.buffer) > MAX_HEADER_BYTES:
+                    responses.append(self._error(431, "Request header too large"))
+                break
+            response = self._handle_head(bytes(self.buffer[:end]), end + 4)
+            if response is None:
+                break  # Waiting for the rest of a request body
+            responses.append(response)
+            if self.closing:
+                break
+        if responses:
+            self.transport.write(b"".join(responses))
+        if self.closing:
+            self.transport.close()
+        self._last_activity = self._loop.time()
+
+    def _handle_head(self, head: bytes, head_size: int):
+        """Handle the request whose head is buffered; None if its body is not complete yet."""
+        lines = head.split(b"\r\n")
+        parts = lines[0].split(b" ")
+        if len(parts) != 3 or not parts[2].startswith(b"HTTP/1."):
+            return self._error(400, "Malformed request line")
+        method, target, version = parts
+        connection = b""
+        body_size = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"connection":
+                connection = value.strip().lower()
+            elif name == b"content-length":
+                try:
+                    body_size = int(value)
+                except ValueError:
+                    body_size = -1
+                if body_size < 0:
+                    return self._error(400, "Invalid Content-Length")
+                if body_size > MAX_BODY_BYTES:
+                    return self._error(413, "Request body too large")
+            elif name == b"transfer-encoding":
+                return self._error(501, "Chunked request bodies are not supported")
+        if len(self.buffer) < head_size + body_size:
+            return None
+        del self.buffer[:head_size + body_size]
+
+        if version == b"HTTP/1.0":
+            keep_alive = connection == b"keep-alive"
+        else:
+            keep_alive = connection != b"close"
+        if method != b"GET":
+            status, body = 501, b'{"error": "Unsupported method"}'
+        else:
+            status, body = self.handle(target)
+        if not keep_alive:
+            self.closing = True
+        return build_response(status, body, keep_alive)
+
+    def _error(self, status: int, message: str) -> bytes:
+        # The rest of the stream cannot be parsed reliably: close after replying
+        self.closing = True
+        self.buffer.clear()
+        return build_response(status, f'{{"error": "{message}"}}'.encode(), keep_alive=False)
+
+    def _check_idle(self):
+        # One timer per connection, re-armed from the last activity instead of on every read
+        if self.transport is None:
+            return
+        idle = self._loop.time() - self._last_activity
+        if idle >= self.keep_alive_timeout:
+            self.transport.close()
+        else:
+            self._idle_timer = self._loop.call_later(self.keep_alive_timeout - idle, self._check_idle)
+
+
+async def serve(handle, host: str = "", port: int = 5000, keep_alive_timeout: float = KEEP_ALIVE_TIMEOUT):
+    """Serve `handle` (see HTTPProtocol) on host:port until cancelled."""
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(lambda: HTTPProtocol(handle, keep_alive_timeout),
+                                      host or None, port, backlog=1024)
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,151 @@
+# utils/binary_snapshot.py
+
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from utils.compact_set import CompactNumberSet, decode, encode, encode_many
+
+# Header: magic, format version, entry count, CRC-32 of the key bytes.
+HEADER = struct.Struct("<8sIQI")
+MAGIC = b"URNSNAP\x00"
+VERSION = 1
+
+
+class SnapshotError(ValueError):
+    """The file is not a valid binary snapshot (bad magic, version, size or checksum)."""
+
+
+def write_snapshot(path: Path, keys: np.ndarray):
+    """
+    Atomically write sorted, distinct int64 keys: the header, then the keys
+    as a little-endian int64 array.
+    """
+    keys = np.ascontiguousarray(keys, dtype="<i8")
+    path = Path(path)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(keys), zlib.crc32(keys)))
+        keys.tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _check_header(data: bytes, file_size: int, path) -> tuple:
+    if len(data) < HEADER.size:
+        raise SnapshotError(f"{path}: truncated header")
+    magic, version, count, checksum = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise SnapshotError(f"{path}: not a version {VERSION} snapshot")
+    if file_size != HEADER.size + count * 8:
+        raise SnapshotError(f"{path}: expected {count} keys, file size is {file_size} bytes")
+    return count, checksum
+
+
+def read_snapshot(path: Path, verify: bool = True) -> np.ndarray:
+    """Load all keys into memory with np.fromfile; no per-entry parsing."""
+    with open(path, "rb") as f:
+        count, checksum = _check_header(f.read(HEADER.size), os.fstat(f.fileno()).st_size, path)
+        keys = np.fromfile(f, dtype="<i8", count=count)
+    if verify and zlib.crc32(keys) != checksum:
+        raise SnapshotError(f"{path}: checksum mismatch")
+    return keys
+
+
+class SnapshotIndex:
+    """
+    Read-only view of a binary snapshot through mmap: `in` binary-searches
+    the mapped keys, so opening costs the same at any size and only the pages
+    a lookup touches are read. With `verify`, the checksum is checked on open
+    (one sequential pass over the file).
+    """
+
+    def __init__(self, path: Path, verify: bool = True):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            count, self.checksum = _check_header(f.read(HEADER.size), size, self.path)
+            # An empty snapshot has nothing to map
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if count else None
+        self.keys = (np.frombuffer(self._map, dtype="<i8", count=count, offset=HEADER.size)
+                     if count else np.empty(0, dtype=np.int64))
+        if verify:
+            self.verify()
+
+    def verify(self):
+        if zlib.crc32(self.keys) != self.checksum:
+            raise SnapshotError(f"{self.path}: checksum mismatch")
+
+    def contains_key(self, key: int) -> bool:
+        i = int(np.searchsorted(self.keys, key))
+        return i < len(self.keys) and int(self.keys[i]) == key
+
+    def __contains__(self, number) -> bool:
+        try:
+            return self.contains_key(encode(number))
+        except ValueError:
+            return False
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __iter__(self):
+        for key in self.keys.tolist():
+            yield decode(key)
+
+    def close(self):
+        self.keys = np.empty(0, dtype=np.int64)
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass  # A lookup still holds a view; the mapping goes away with it
+            self._map = None
+
+
+class SnapshotBackedSet:
+    """
+    Used numbers as a memory-mapped SnapshotIndex plus a CompactNumberSet of
+    the numbers added since the snapshot: startup maps the snapshot instead
+    of building a set from it. Supports `in`, add(), len() and iteration.
+    """
+
+    def __init__(self, snapshot: SnapshotIndex, recent: CompactNumberSet = None):
+        self.snapshot = snapshot
+        self.recent = recent if recent is not None else CompactNumberSet()
+
+    def __contains__(self, number) -> bool:
+        return number in self.recent or number in self.snapshot
+
+    def __len__(self) -> int:
+        return len(self.snapshot) + len(self.recent)
+
+    def __iter__(self):
+        yield from self.snapshot
+        yield from self.recent
+
+    def add(self, number) -> bool:
+        if number in self.snapshot:
+            return False
+        return self.recent.add(number)
+
+    def update(self, numbers, skip_invalid: bool = False) -> int:
+        keys, skipped = encode_many(numbers, skip_invalid)
+        self.add_keys(keys)
+        return skipped
+
+    def add_keys(self, keys: np.ndarray):
+        if len(self.snapshot) and len(keys):
+            # Keys already in the snapshot are not added again
+            position = np.minimum(np.searchsorted(self.snapshot.keys, keys), len(self.snapshot) - 1)
+            keys = keys[self.snapshot.keys[position] != keys]
+        self.recent.add_keys(keys)
+
+    def merged_keys(self) -> np.ndarray:
+        """Sorted keys of the snapshot and the recent numbers, for writing the next snapshot."""
+        return np.union1d(self.snapshot.keys, self.recent.keys())
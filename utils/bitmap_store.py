@@ -0,0 +1,281 @@
+# utils/bitmap_store.py
+
+import mmap
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils.random_number import RandomNumberGenerator
+
+POPCOUNT_CHUNK = 1 << 24  # Bytes counted per step by popcount(), bounds its temporary memory
+
+
+def bit_index(number) -> int:
+    """
+    Position of a number in its type's bitmap: the integer itself, or for
+    floats the value scaled by 10**FLOAT_DECIMALS (as RandomNumberGenerator
+    draws them).
+    """
+    if isinstance(number, bool) or not isinstance(number, (int, float)):
+        raise TypeError(f"Not a number: {number!r}")
+    if isinstance(number, float):
+        return round(number * 10 ** RandomNumberGenerator.FLOAT_DECIMALS)
+    return number
+
+
+def popcount(data) -> int:
+    """Number of set bits in a bytes-like object."""
+    view = np.frombuffer(data, dtype=np.uint8)
+    return sum(int(np.bitwise_count(view[start:start + POPCOUNT_CHUNK]).sum())
+               for start in range(0, len(view), POPCOUNT_CHUNK))
+
+
+class BitmapStore:
+    """
+    One bit per possible value, in a file mapped into memory: O(1) membership
+    and insert, and a fixed footprint however many values were recorded
+    (2**32 bits = 512 MiB for the 32-bit int domain).
+
+    The file is created sparse, so untouched regions take no disk space until
+    written. Writes go to the shared mapping and reach the file when the OS
+    writes the pages back; flush() (msync) forces that, and runs every
+    `sync_every` inserts and on close. A process crash loses nothing; a power
+    loss can lose the inserts since the last flush.
+    """
+
+    def __init__(self, path: Path, bits: int, sync_every: int = 65536):
+        self.path = Path(path)
+        self.bits = bits
+        self.size = (bits + 7) // 8
+        self.sync_every = max(1, sync_every)
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size < self.size:
+            os.ftruncate(self._fd, self.size)  # Extends with a hole, not with written zeros
+        self._map = mmap.mmap(self._fd, self.size)
+        self.count = popcount(self._map)
+
+    def _locate(self, index: int):
+        if not 0 <= index < self.bits:
+            raise ValueError(f"Value {index} is outside the bitmap's domain [0, {self.bits}).")
+        return index >> 3, 1 << (index & 7)
+
+    def __contains__(self, index: int) -> bool:
+        offset, mask = self._locate(index)
+        return bool(self._map[offset] & mask)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def test_and_set(self, index: int) -> bool:
+        """Set the bit for `index`. Returns False if it was already set."""
+        offset, mask = self._locate(index)
+        with self._lock:
+            byte = self._map[offset]
+            if byte & mask:
+                return False
+            self._map[offset] = byte | mask
+            self.count += 1
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self._flush()
+            return True
+
+    def popcount(self) -> int:
+        """Recount the set bits from the bitmap itself."""
+        return popcount(self._map)
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Flush and unmap. Safe to call more than once."""
+        with self._lock:
+            if not self._map.closed:
+                self._flush()
+                self._map.close()
+                os.close(self._fd)
+
+    def _flush(self):
+        self._map.flush()
+        self._unsynced = 0
+
+
+class ChunkedBitmapStore(BitmapStore):
+    """
+    BitmapStore that only materializes the chunks it has touched: a dict of
+    `chunk_size`-byte bytearrays instead of one full-size mapping. Memory
+    grows with the number of distinct chunks written (up to the full bitmap
+    once values are spread over the whole domain), which suits a store that
+    has recorded few values.
+
+    The file has the same layout as BitmapStore's, so either class can open
+    it. flush() writes the dirty chunks back with pwrite and fsyncs; on open,
+    holes are skipped (SEEK_DATA where the OS supports it) and all-zero chunks
+    are not kept.
+    """
+
+    def __init__(self, path: Path, bits: int, sync_every: int = 65536, chunk_size: int = 1 << 16):
+        self.path = Path(path)
+        self.bits = bits
+        self.size = (bits + 7) // 8
+        self.sync_every = max(1, sync_every)
+        self.chunk_size = chunk_size
+        self.chunks = {}  # Chunk number -> bytearray
+        self._dirty = set()
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size < self.size:
+            os.ftruncate(self._fd, self.size)
+        self._load()
+        self.count = self.popcount()
+
+    def _load(self):
+        offset = 0
+        while offset < self.size:
+            if hasattr(os, "SEEK_DATA"):
+                try:
+                    offset = os.lseek(self._fd, offset, os.SEEK_DATA)
+                except OSError:
+                    break  # Only holes from here to the end of the file
+                offset -= offset % self.chunk_size
+            data = os.pread(self._fd, self.chunk_size, offset)
+            if data.count(0) < len(data):
+                self.chunks[offset // self.chunk_size] = bytearray(data)
+            offset += self.chunk_size
+
+    @property
+    def materialized_bytes(self) -> int:
+        """Memory held by the materialized chunks."""
+        return len(self.chunks) * self.chunk_size
+
+    def __contains__(self, index: int) -> bool:
+        offset, mask = self._locate(index)
+        chunk = self.chunks.get(offset // self.chunk_size)
+        return chunk is not None and bool(chunk[offset % self.chunk_size] & mask)
+
+    def test_and_set(self, index: int) -> bool:
+        offset, mask = self._locate(index)
+        number = offset // self.chunk_size
+        with self._lock:
+            chunk = self.chunks.get(number)
+            if chunk is None:
+                chunk = self.chunks[number] = bytearray(min(self.chunk_size, self.size - number * self.chunk_size))
+            byte = chunk[offset % self.chunk_size]
+            if byte & mask:
+                return False
+            chunk[offset % self.chunk_size] = byte | mask
+            self._dirty.add(number)
+            self.count += 1
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self._flush()
+            return True
+
+    def popcount(self) -> int:
+        return sum(popcount(chunk) for chunk in self.chunks.values())
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                self._flush()
+                os.close(self._fd)
+                self._fd = None
+
+    def _flush(self):
+        for number in sorted(self._dirty):
+            os.pwrite(self._fd, self.chunks[number], number * self.chunk_size)
+        os.fsync(self._fd)
+        self._dirty.clear()
+        self._unsynced = 0
+
+
+class UsedNumbersBitmap:
+    """
+    Used-number store backed by one bitmap per type (`<base>.int.bitmap`,
+    `<base>.float.bitmap`), a drop-in for UsedNumbersJournal: load() returns
+    an object supporting `in`, and add() records a number.
+
+    With `sparse`, ChunkedBitmapStore is used instead of a full mapping.
+    `migrate_from`: a store (e.g. UsedNumbersJournal) whose numbers are
+    imported once. Completion is recorded in `<base>.bitmap.migrated` after
+    the bitmaps are flushed; until then the import is rerun on every load.
+    Importing only sets bits, so rerunning it after an interrupted
+    migration (or over bitmaps already in use) never loses a number.
+    """
+
+    def __init__(self, base_path: Path, sparse: bool = False, sync_every: int = 65536, migrate_from=None):
+        self.int_path = Path(f"{base_path}.int.bitmap")
+        self.float_path = Path(f"{base_path}.float.bitmap")
+        self.migrated_path = Path(f"{base_path}.bitmap.migrated")
+        self.sparse = sparse
+        self.sync_every = sync_every
+        self.migrate_from = migrate_from
+        self.stores = None
+
+    def load(self):
+        """Open (or create) both bitmaps. Returns self, for `number in used_numbers` checks."""
+        # Not the bitmaps' existence: opening them creates them before the import starts
+        migrate = self.migrate_from is not None and not self.migrated_path.exists()
+        store_class = ChunkedBitmapStore if self.sparse else BitmapStore
+        self.stores = {
+            False: store_class(self.int_path, RandomNumberGenerator.domain_size(False), self.sync_every),
+            True: store_class(self.float_path, RandomNumberGenerator.domain_size(True), self.sync_every),
+        }
+        if migrate:
+            skipped = 0
+            for number in self.migrate_from.load():
+                try:
+                    self.add(number)
+                except (TypeError, ValueError):
+                    # Non-numeric, or outside the current domains: can never be drawn again
+                    skipped += 1
+            self.migrate_from.close()
+            self.flush()
+            self._mark_migrated()
+            print(f"Migrated {len(self)} used numbers to {self.int_path} and {self.float_path} "
+                  f"({skipped} outside the number domains skipped)")
+        return self
+
+    def _mark_migrated(self):
+        temp_path = self.migrated_path.with_name(self.migrated_path.name + ".tmp")
+        with open(temp_path, "w") as f:
+            f.write(f"{len(self)}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.migrated_path)
+
+    def _store(self, number) -> BitmapStore:
+        if self.stores is None:
+            raise RuntimeError("Bitmaps are not open; call load() first.")
+        return self.stores[isinstance(number, float)]
+
+    def __contains__(self, number) -> bool:
+        try:
+            return bit_index(number) in self._store(number)
+        except (TypeError, ValueError):
+            return False  # Outside the number domains: never recorded
+
+    def __len__(self) -> int:
+        return sum(len(store) for store in self.stores.values()) if self.stores else 0
+
+    def add(self, number) -> bool:
+        """Record `number`. Returns False if it was already used."""
+        return self._store(number).test_and_set(bit_index(number))
+
+    # Already an atomic check-and-insert (BitmapStore.test_and_set); same name as UsedNumbersJournal's
+    add_if_absent = add
+
+    def flush(self):
+        for store in self.stores.values():
+            store.flush()
+
+    def close(self):
+        if self.stores is not None:
+            for store in self.stores.values():
+                store.close()
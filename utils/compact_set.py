@@ -0,0 +1,218 @@
+# utils/compact_set.py
+
+from array import array
+
+import numpy as np
+
+from utils.random_number import RandomNumberGenerator
+
+EMPTY = -1                 # Marks a free slot; never a valid key
+FLOAT_TAG = 1 << 62        # Added to the scaled value of floats, so they never equal an int key
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15  # 2**64 / golden ratio (Fibonacci hashing)
+MASK64 = (1 << 64) - 1
+FLOAT_SCALE = 10 ** RandomNumberGenerator.FLOAT_DECIMALS
+
+
+def encode(number) -> int:
+    """
+    int64 key of a number: ints as themselves, floats as their value scaled
+    by 10**FLOAT_DECIMALS plus FLOAT_TAG. Raises ValueError for values with no
+    exact key (negative, too large, or floats with more decimals).
+    """
+    number_type = type(number)
+    if number_type is int and 0 <= number < FLOAT_TAG:
+        return number  # Fast path for the common case
+    if isinstance(number, bool) or not isinstance(number, (int, float)):
+        raise ValueError(f"Not a number: {number!r}")
+    if isinstance(number, float):
+        scaled = round(number * FLOAT_SCALE)
+        if not 0 <= scaled < FLOAT_TAG or scaled / FLOAT_SCALE != number:
+            raise ValueError(f"Float {number!r} has no exact {RandomNumberGenerator.FLOAT_DECIMALS}-decimal key")
+        return scaled + FLOAT_TAG
+    if not 0 <= number < FLOAT_TAG:
+        raise ValueError(f"Integer {number} is outside [0, 2**62)")
+    return number
+
+
+def encode_many(numbers, skip_invalid: bool = False):
+    """
+    (int64 array of keys, number of values skipped). With `skip_invalid`,
+    values that have no key (e.g. stray strings in a legacy file) are skipped
+    instead of raising.
+    """
+    keys, skipped = [], 0
+    for number in numbers:
+        try:
+            keys.append(encode(number))
+        except ValueError:
+            if not skip_invalid:
+                raise
+            skipped += 1
+    return np.array(keys, dtype=np.int64), skipped
+
+
+def encode_arrays(ints: np.ndarray, floats: np.ndarray) -> np.ndarray:
+    """Vectorized encode of int64 and float64 arrays; values with no key are dropped."""
+    ints = ints[(ints >= 0) & (ints < FLOAT_TAG)]
+    floats = floats[np.isfinite(floats) & (floats >= 0) & (floats < FLOAT_TAG / FLOAT_SCALE)]
+    scaled = np.rint(floats * FLOAT_SCALE).astype(np.int64)
+    scaled = scaled[scaled / FLOAT_SCALE == floats]  # Same exactness check as encode()
+    return np.concatenate([ints.astype(np.int64), scaled + FLOAT_TAG])
+
+
+def decode(key: int):
+    if key >= FLOAT_TAG:
+        return (key - FLOAT_TAG) / FLOAT_SCALE
+    return key
+
+
+class CompactNumberSet:
+    """
+    Insert-only set of numbers in one flat int64 open-addressing table
+    (array('q'), linear probing, Fibonacci hashing), for the simple servers'
+    used_numbers. Entries cost 8 bytes per slot, about 11-23 bytes each
+    depending on where the table is in its resize cycle, against ~60-80 bytes
+    for a Python set of boxed ints or floats.
+
+    Numbers are stored as int64 keys (see encode), so it holds non-negative
+    ints and floats with up to FLOAT_DECIMALS decimals, i.e. everything
+    RandomNumberGenerator produces; iteration decodes them back. Nothing is
+    ever removed, so no tombstones are needed. The table doubles when it is
+    more than MAX_LOAD full. update() inserts in bulk with vectorized NumPy
+    probing rounds over the same table.
+
+    Writers must be serialized (UsedNumbersJournal.add_if_absent holds its
+    lock). Lookups may run concurrently with them: a resize fills the new
+    table first and publishes it with one assignment, so a lookup sees
+    either the old or the new table, never a half-built one.
+    """
+    MAX_LOAD = 0.7
+    MIN_CAPACITY = 1024
+
+    def __init__(self, numbers=()):
+        self._count = 0
+        self._publish(self._allocate(self.MIN_CAPACITY))
+        self.update(numbers)
+
+    @staticmethod
+    def _allocate(capacity: int) -> tuple:
+        """An empty table of `capacity` slots, as (table, mask, shift)."""
+        return array("q", [EMPTY]) * capacity, capacity - 1, 64 - (capacity.bit_length() - 1)
+
+    def _publish(self, layout: tuple):
+        self._layout = layout  # The one assignment readers depend on
+        self._table, self._mask, self._shift = layout
+        self._capacity = len(self._table)
+        self._limit = int(self._capacity * self.MAX_LOAD)
+
+    @staticmethod
+    def _find(layout: tuple, key: int) -> int:
+        """Slot of `layout` holding `key`, or the empty slot where it would go."""
+        table, mask, shift = layout
+        slot = ((key * HASH_MULTIPLIER) & MASK64) >> shift
+        while True:
+            current = table[slot]
+            if current == key or current == EMPTY:
+                return slot
+            slot = (slot + 1) & mask
+
+    def __contains__(self, number) -> bool:
+        try:
+            key = encode(number)
+        except ValueError:
+            return False
+        layout = self._layout  # Read once: a concurrent resize may publish a new one
+        return layout[0][self._find(layout, key)] == key
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        for key in self._layout[0]:
+            if key != EMPTY:
+                yield decode(key)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the table, in bytes."""
+        return self._capacity * self._table.itemsize
+
+    def add(self, number) -> bool:
+        """Add `number`. Returns False if it was already present."""
+        key = encode(number)
+        slot = self._find(self._layout, key)
+        if self._table[slot] == key:
+            return False
+        self._table[slot] = key
+        self._count += 1
+        if self._count > self._limit:
+            self._resize(self._capacity * 2)
+        return True
+
+    def update(self, numbers, skip_invalid: bool = False) -> int:
+        """Add many numbers at once. Returns the number of values skipped (see encode_many)."""
+        keys, skipped = encode_many(numbers, skip_invalid)
+        self.add_keys(keys)
+        return skipped
+
+    def add_keys(self, keys: np.ndarray):
+        """Add int64 keys (see encode) in bulk."""
+        if len(keys):
+            self._insert_keys(np.unique(keys))
+
+    def keys(self) -> np.ndarray:
+        """The int64 keys held, in table order (a copy)."""
+        table = np.frombuffer(self._layout[0], dtype=np.int64)
+        return table[table != EMPTY]
+
+    def _resize(self, capacity: int):
+        layout = self._allocate(capacity)
+        self._place(layout, self.keys())
+        self._publish(layout)
+
+    @staticmethod
+    def _slots(layout: tuple, keys: np.ndarray) -> np.ndarray:
+        hashed = keys.astype(np.uint64) * np.uint64(HASH_MULTIPLIER)  # Wraps modulo 2**64
+        return (hashed >> np.uint64(layout[2])).astype(np.int64)
+
+    def _insert_keys(self, keys: np.ndarray):
+        """Insert distinct keys, skipping those already held."""
+        keys = keys[~self._lookup(keys)]
+        needed = self._count + len(keys)
+        if needed > self._limit:
+            capacity = self._capacity
+            while needed > int(capacity * self.MAX_LOAD):
+                capacity *= 2
+            self._resize(capacity)
+        self._place(self._layout, keys)
+        self._count += len(keys)
+
+    def _place(self, layout: tuple, keys: np.ndarray):
+        """Write distinct keys absent from `layout` into it. Each probing round places at most one key per empty slot."""
+        table = np.frombuffer(layout[0], dtype=np.int64)
+        mask = layout[1]
+        slots = self._slots(layout, keys)
+        while len(keys):
+            free = np.flatnonzero(table[slots] == EMPTY)
+            placed_slots, first = np.unique(slots[free], return_index=True)
+            winners = free[first]
+            table[placed_slots] = keys[winners]
+            waiting = np.ones(len(keys), dtype=bool)
+            waiting[winners] = False
+            # Every slot the others probed is taken now: move on to the next one
+            keys, slots = keys[waiting], (slots[waiting] + 1) & mask
+
+    def _lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Vectorized membership of distinct keys."""
+        layout = self._layout
+        table = np.frombuffer(layout[0], dtype=np.int64)
+        found = np.zeros(len(keys), dtype=bool)
+        pending = np.arange(len(keys))
+        slots = self._slots(layout, keys)
+        while len(pending):
+            current = table[slots]
+            hit = current == keys[pending]
+            found[pending[hit]] = True
+            active = ~hit & (current != EMPTY)
+            pending, slots = pending[active], (slots[active] + 1) & layout[1]
+        return found
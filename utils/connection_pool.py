@@ -0,0 +1,131 @@
+# utils/connection_pool.py
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import List
+
+import aiosqlite
+
+
+class ConnectionPool:
+    """
+    A bounded pool of long-lived aiosqlite connections to a single database file.
+
+    Opening an aiosqlite connection starts a dedicated worker thread, so doing it
+    per query dominates request latency. The pool opens its connections once
+    (normally in the FastAPI startup hook), applies the PRAGMAs a single time per
+    connection, and hands connections out exclusively to one coroutine at a time.
+    """
+
+    def __init__(
+        self,
+        db_file: str,
+        size: int = 4,
+        timeout: float = 5.0,
+        health_check_interval: float = 30.0,
+        pragmas: List[str] = None,
+    ):
+        # size: maximum number of open connections (callers wait when all are busy).
+        # timeout: SQLite busy timeout, in seconds, used for every connection.
+        # health_check_interval: connections idle for longer than this are pinged
+        #   with `SELECT 1` before being handed out, and replaced if the ping fails.
+        if size < 1:
+            raise ValueError("Pool size must be at least 1.")
+        self.db_file = db_file
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.pragmas = pragmas if pragmas is not None else ["PRAGMA journal_mode=WAL;"]
+        self._idle: asyncio.Queue = None
+        self._connections: List[aiosqlite.Connection] = []
+        self._last_used = {}
+
+    @property
+    def is_open(self) -> bool:
+        return self._idle is not None
+
+    async def open(self):
+        """
+        Opens `size` connections and applies the configured PRAGMAs to each of them.
+        """
+        if self.is_open:
+            return
+        self._idle = asyncio.Queue(maxsize=self.size)
+        for _ in range(self.size):
+            conn = await self._connect()
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        """
+        Closes every connection owned by the pool. Safe to call more than once.
+        """
+        if not self.is_open:
+            return
+        connections, self._connections = self._connections, []
+        self._idle = None
+        self._last_used.clear()
+        for conn in connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                print(f"Error closing pooled connection to {self.db_file}: {e}")
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Borrow a connection for the duration of an `async with` block.
+        Any transaction left open by the caller is rolled back on release.
+        """
+        if not self.is_open:
+            raise RuntimeError(f"Connection pool for {self.db_file} is not open.")
+        idle = self._idle
+        conn = await idle.get()
+        try:
+            conn = await self._ensure_healthy(conn)
+        except BaseException:
+            # Keep the pool at full size; the stale connection is re-checked next time.
+            idle.put_nowait(conn)
+            raise
+        try:
+            yield conn
+        finally:
+            if self._idle is idle:
+                if conn.in_transaction:
+                    try:
+                        await conn.rollback()
+                    except aiosqlite.Error:
+                        conn = await self._replace(conn)
+                self._last_used[id(conn)] = time.monotonic()
+                idle.put_nowait(conn)
+            # Otherwise the pool was closed while the connection was borrowed,
+            # and close() has already closed it.
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_file, timeout=self.timeout)
+        for pragma in self.pragmas:
+            await conn.execute(pragma)
+        self._connections.append(conn)
+        self._last_used[id(conn)] = time.monotonic()
+        return conn
+
+    async def _replace(self, conn: aiosqlite.Connection) -> aiosqlite.Connection:
+        if conn in self._connections:
+            self._connections.remove(conn)
+        self._last_used.pop(id(conn), None)
+        try:
+            await conn.close()
+        except Exception:
+            pass
+        return await self._connect()
+
+    async def _ensure_healthy(self, conn: aiosqlite.Connection) -> aiosqlite.Connection:
+        idle_for = time.monotonic() - self._last_used.get(id(conn), 0.0)
+        if idle_for < self.health_check_interval:
+            return conn
+        try:
+            await conn.execute("SELECT 1;")
+            return conn
+        except Exception:
+            print(f"Replacing unhealthy pooled connection to {self.db_file}.")
+            return await self._replace(conn)
@@ -1,5 +1,10 @@
 import aiosqlite  # Asynchronous SQLite client for non-blocking DB operations
 import asyncio     # Required for async sleep when retrying DB operations
+from contextlib import asynccontextmanager
+from typing import List
+
+from utils.group_commit import GroupCommitWriter
+from utils.metrics import NUMBER_COLLISIONS, SQLITE_BUSY_RETRIES
 
 class DatabaseHandler:
     """
@@ -7,10 +12,28 @@ class DatabaseHandler:
     It uses SQLite with async I/O for concurrent-friendly operations.
     """
 
-    def __init__(self, db_file: str):
+    def __init__(self, db_file: str, pool=None):
         # Initialize the handler with the path to the SQLite database file.
-        
+        # pool: optional utils.connection_pool.ConnectionPool for the same file.
+        # When it is open, connections are borrowed from it instead of being
+        # opened (and PRAGMA'd) on every call.
         self.db_file = db_file
+        self.pool = pool
+        self.writer = None  # GroupCommitWriter, set by start_group_commit()
+
+    @asynccontextmanager
+    async def _connect(self, timeout: float = 5.0):
+        """
+        Yields a connection: a pooled one when the pool is open, otherwise a
+        fresh connection with WAL enabled that is closed on exit.
+        """
+        if self.pool is not None and self.pool.is_open:
+            async with self.pool.acquire() as db:
+                yield db
+        else:
+            async with aiosqlite.connect(self.db_file, timeout=timeout) as db:
+                await db.execute("PRAGMA journal_mode=WAL;")
+                yield db
 
     async def init_db(self):
         """
@@ -42,30 +65,89 @@ class DatabaseHandler:
         True if insertion was successful.
         False if it failed due to a duplicate (IntegrityError) or DB lock (OperationalError).
         """
+        if self.writer is not None and self.writer.is_running:
+            # Queue the number for the next group commit instead of committing alone
+            return await self.writer.submit(number)
+
         for attempt in range(retries):
             try:
                 # Connect to the DB with a timeout to wait for locks to clear
-                async with aiosqlite.connect(self.db_file, timeout=5.0) as db:
-                    await db.execute("PRAGMA journal_mode=WAL;")
+                async with self._connect(timeout=5.0) as db:
                     await db.execute("INSERT INTO random_numbers (number) VALUES (?);", (number,))
                     await db.commit()
                 return True  # Successfully inserted
             except aiosqlite.IntegrityError:
                 # Duplicate number — violates UNIQUE constraint
+                NUMBER_COLLISIONS.labels("insert_number").inc()
                 return False
             except aiosqlite.OperationalError as e:
                 # DB might be locked due to concurrency
                 if "locked" in str(e).lower() and attempt < retries - 1:
+                    SQLITE_BUSY_RETRIES.labels("insert_number").inc()
                     await asyncio.sleep(delay)  # Wait before retrying
                     continue
                 return False  # Failed after retries
 
+    async def insert_batch(self, numbers: List, retries=3, delay=0.05) -> List[bool]:
+        """
+        Inserts several numbers in a single transaction (one COMMIT).
+
+        Returns a list parallel to `numbers`: True where the number was inserted,
+        False where it was a duplicate (of an existing row or of an earlier
+        entry in the same batch). Raises if the transaction cannot be committed.
+        """
+        for attempt in range(retries):
+            try:
+                async with self._connect(timeout=5.0) as db:
+                    results = []
+                    for number in numbers:
+                        cursor = await db.execute(
+                            "INSERT OR IGNORE INTO random_numbers (number) VALUES (?);", (number,)
+                        )
+                        results.append(cursor.rowcount == 1)
+                    await db.commit()
+                NUMBER_COLLISIONS.labels("insert_batch").inc(results.count(False))
+                return results
+            except aiosqlite.OperationalError as e:
+                if "locked" in str(e).lower() and attempt < retries - 1:
+                    SQLITE_BUSY_RETRIES.labels("insert_batch").inc()
+                    await asyncio.sleep(delay)
+                    continue
+                raise
+
+    async def delete_numbers(self, numbers: List):
+        """
+        Deletes numbers that were reserved but provably never served (e.g. the
+        unsent rest of a stream), making them available again.
+        """
+        if not numbers:
+            return
+        async with self._connect(timeout=5.0) as db:
+            await db.executemany("DELETE FROM random_numbers WHERE number = ?;", [(n,) for n in numbers])
+            await db.commit()
+
+    def start_group_commit(self, max_batch_size: int = 256, max_latency: float = 0.005):
+        """
+        Routes subsequent insert_number() calls through a GroupCommitWriter,
+        which batches up to `max_batch_size` numbers or `max_latency` seconds
+        worth of concurrent inserts into one transaction.
+        Must be called from a running event loop (e.g. a FastAPI startup hook).
+        """
+        self.writer = GroupCommitWriter(self, max_batch_size=max_batch_size, max_latency=max_latency)
+        self.writer.start()
+
+    async def stop_group_commit(self):
+        """Flushes pending inserts and goes back to one transaction per insert."""
+        if self.writer is not None:
+            await self.writer.stop()
+            self.writer = None
+
     async def show_numbers(self):
         """
         Prints all rows from the `random_numbers` table.
         Useful for debugging or inspection during testing.
         """
-        async with aiosqlite.connect(self.db_file) as db:
+        async with self._connect() as db:
             cursor = await db.execute("SELECT * FROM random_numbers")
             rows = await cursor.fetchall()
             for row in rows:
@@ -0,0 +1,81 @@
+# utils/fast_asgi.py
+
+import json
+
+from utils.metrics import MetricsRegistry
+
+
+def json_body(payload) -> bytes:
+    """Serialize `payload` exactly as FastAPI's JSONResponse does."""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+async def send_json(send, status: int, body: bytes):
+    """Send a complete JSON response."""
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class FastRandomApp:
+    """
+    Minimal ASGI application serving GET /random without routing, validation
+    or serialization: a request is a dict lookup of its query string, one
+    await of the matching handler, and two `send` calls.
+
+    `handlers` maps exact raw query strings (e.g. b"" or b"type=float") to
+    coroutine functions returning a ready-made JSON body (bytes), typically
+    built ahead of time by the storage or refill layer. A handler returns
+    None when it cannot serve the request (e.g. storage is empty); the request
+    then goes to `fallback`, so errors keep their usual status and detail.
+
+    Every other request (other paths, methods or query strings, websockets,
+    lifespan) is passed to `fallback`, usually the FastAPI app this sits in
+    front of. Without a fallback those get a 404 (503 for /random) and
+    lifespan events are acknowledged.
+
+    With `registry`, requests served here are counted in http_requests_total
+    like MetricsMiddleware counts them (the latency histogram does not see
+    them).
+    """
+
+    def __init__(self, handlers: dict, fallback=None, path: str = "/random",
+                 registry: MetricsRegistry = None):
+        self.handlers = handlers
+        self.fallback = fallback
+        self.path = path
+        self.served = None
+        if registry is not None:
+            requests = registry.counter(
+                "http_requests_total", "HTTP requests by route and status code.", ("path", "status")
+            )
+            self.served = requests.labels(path, "200")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == self.path and scope["method"] == "GET":
+            handler = self.handlers.get(scope["query_string"])
+            if handler is not None:
+                body = await handler()
+                if body is not None:
+                    await send_json(send, 200, body)
+                    if self.served is not None:
+                        self.served.inc()
+                    return
+        if self.fallback is not None:
+            await self.fallback(scope, receive, send)
+        elif scope["type"] == "http":
+            if scope["path"] == self.path:
+                await send_json(send, 503, json_body({"detail": "No numbers available."}))
+            else:
+                await send_json(send, 404, json_body({"detail": "Not found"}))
+        elif scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
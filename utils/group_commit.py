@@ -0,0 +1,101 @@
+# utils/group_commit.py
+
+import asyncio
+import time
+from typing import List, Tuple
+
+
+class GroupCommitWriter:
+    """
+    Coalesces concurrent inserts into shared transactions.
+
+    Callers submit a number and await a future. A single writer task collects
+    submissions until either `max_batch_size` items are queued or
+    `max_latency` seconds have passed since the first one arrived, inserts
+    them all in one transaction (one COMMIT, one fsync) and resolves each
+    caller's future with True (inserted) or False (duplicate).
+    Because only the writer task writes, requests no longer contend for the
+    WAL write lock.
+    """
+
+    def __init__(self, db_handler, max_batch_size: int = 256, max_latency: float = 0.005):
+        # db_handler: the utils.db_utils.DatabaseHandler whose connection (pooled or not) is used.
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.db_handler = db_handler
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue: asyncio.Queue = None
+        self._task: asyncio.Task = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Starts the writer task on the running event loop."""
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flushes everything already submitted, then stops the writer task."""
+        if not self.is_running:
+            return
+        await self._queue.put(None)  # Sentinel: drain and exit
+        await self._task
+        self._task = None
+
+    async def submit(self, number) -> bool:
+        """Queues `number` for the next group commit and waits for its outcome."""
+        if not self.is_running:
+            raise RuntimeError("Group commit writer is not running.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((number, future))
+        return await future
+
+    async def _collect_batch(self) -> Tuple[List, bool]:
+        """
+        Waits for the first item, then keeps collecting until the batch is full
+        or the latency budget is spent. Returns the batch and whether a stop
+        was requested.
+        """
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect_batch()
+            if batch:
+                await self._commit(batch)
+
+    async def _commit(self, batch: List):
+        try:
+            results = await self.db_handler.insert_batch([number for number, _ in batch])
+        except Exception as e:
+            # The whole transaction was rolled back; report each caller as failed.
+            print(f"Group commit of {len(batch)} numbers failed: {e}")
+            results = [False] * len(batch)
+        for (_, future), inserted in zip(batch, results):
+            if not future.done():
+                future.set_result(inserted)
@@ -0,0 +1,203 @@
+# utils/metrics.py
+
+import bisect
+import time
+
+# Upper bounds, in seconds, of the latency histogram buckets (+Inf is implicit)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    """
+    A metric family with optional labels. labels(*values) returns the child
+    for those label values (created on first use); the unlabelled methods use
+    the child with no label values.
+
+    Updates are plain attribute increments without locks: the servers update
+    metrics from their single event loop thread only.
+    """
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+
+    def _new_child(self):
+        return _Value()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}.")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def clear(self):
+        """Drop every child, e.g. before re-reporting gauges of a changing set."""
+        self._children.clear()
+
+    def _label_text(self, values, extra=()) -> str:
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in sorted(self._children.items()):
+            lines.append(f"{self.name}{self._label_text(values)} {child.value}")
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    """Pre-bucketed histogram: an observation is one bisect and three additions."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(values, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(values)} {child.sum}")
+            lines.append(f"{self.name}_count{self._label_text(values)} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, cls, name, *args, **kwargs):
+        # Modules may be imported more than once (tests, reloads): reuse the family.
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, *args, **kwargs)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by the servers and the utils they use
+REGISTRY = MetricsRegistry()
+
+# Instrumentation shared by several modules
+NUMBER_COLLISIONS = REGISTRY.counter(
+    "number_collisions_total", "Generated numbers rejected because they were already used.", ("source",)
+)
+SQLITE_BUSY_RETRIES = REGISTRY.counter(
+    "sqlite_busy_retries_total", "Writes retried because the database was locked.", ("operation",)
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests by route and status code, and timing
+    each request until its response headers are sent. Unmatched paths (404s)
+    share the "other" route label, so clients cannot inflate the label set.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = REGISTRY):
+        self.app = app
+        self.requests = registry.counter(
+            "http_requests_total", "HTTP requests by route and status code.", ("path", "status")
+        )
+        self.latency = registry.histogram(
+            "http_request_duration_seconds", "Time until the response headers are sent, by route.", ("path",)
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                self.latency.labels(_route_label(scope)).observe(time.perf_counter() - started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            self.requests.labels(_route_label(scope), str(status)).inc()
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")  # Set by the router once a route matched
+    return route.path if route is not None else "other"
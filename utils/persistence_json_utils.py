@@ -1,19 +1,35 @@
 import json
+import os
+import struct
+import threading
 from pathlib import Path
 
+# NumPy and the modules built on it (compact_set, binary_snapshot) are imported
+# only by the options that use them, so the plain set and `.snap` journal run
+# without NumPy installed.
+
 def define_persistence_file_path(file_name: str) -> Path:
     """Define and return the persistence file path."""
     return Path(__file__).resolve().parent.parent / file_name
 
-def load_used_numbers(file_path: Path) -> set:
-    """Load used numbers from the persistence file."""
+def load_used_numbers(file_path: Path, compact: bool = False):
+    """
+    Load used numbers from the persistence file. With `compact`, returns a
+    CompactNumberSet (non-numeric entries dropped) instead of a set.
+    """
+    numbers = []
     if file_path.exists():
         try:
             with open(file_path, "r") as f:
-                return set(json.load(f))
+                numbers = json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
-            return set()
-    return set()
+            numbers = []
+    if compact:
+        from utils.compact_set import CompactNumberSet
+        used_numbers = CompactNumberSet()
+        used_numbers.update(numbers, skip_invalid=True)
+        return used_numbers
+    return set(numbers)
 
 def save_used_numbers(file_path: Path, used_numbers: set):
     """Save used numbers to the persistence file."""
@@ -21,4 +37,257 @@ def save_used_numbers(file_path: Path, used_numbers: set):
         with open(file_path, "w") as f:
             json.dump(list(used_numbers), f)
     except Exception as e:
-        print(f"Error saving used numbers: {e}")
\ No newline at end of file
+        print(f"Error saving used numbers: {e}")
+
+class UsedNumbersJournal:
+    """
+    Append-only binary persistence for used numbers.
+
+    Every served number is appended to `<base>.log` as one fixed-width record
+    (a 1-byte type tag followed by a little-endian int64 or float64), so the
+    per-request cost is constant instead of rewriting the whole JSON file.
+    The log is periodically folded into `<base>.snap` (same record format,
+    written atomically) and truncated.
+
+    fsync policy: the log is fsync'ed every `fsync_every` records and on close.
+    A process crash loses nothing (records go straight to the OS with
+    os.write); a power loss can lose at most the last `fsync_every - 1`
+    records, so use fsync_every=1 where that matters more than throughput.
+
+    Snapshot policy: a snapshot is taken once the log holds at least
+    `snapshot_every` records and at least as many records as the last
+    snapshot, which keeps the amortised snapshot cost per number constant.
+
+    With `compact`, the live set is a CompactNumberSet (about 11-23 bytes per
+    number instead of ~60-80); values it cannot hold are dropped on load,
+    as the generator never produces them.
+
+    With `binary_snapshot`, snapshots go to `<base>.bsnap` instead, as a
+    sorted int64 array (see binary_snapshot.py). load() maps it and only
+    builds a set from the log, and lookups binary-search the mapping, so
+    startup no longer grows with history. Switching the option either way
+    converts the existing snapshot once.
+    """
+
+    INT_RECORD = struct.Struct("<cq")
+    FLOAT_RECORD = struct.Struct("<cd")
+    RECORD_SIZE = INT_RECORD.size  # 9 bytes for both record types
+    RECORD_FIELDS = [("tag", "S1"), ("value", "<i8")]  # Same layout, as a NumPy dtype
+    INT_TAG = b"i"
+    FLOAT_TAG = b"f"
+
+    def __init__(self, base_path: Path, migrate_from: Path = None,
+                 fsync_every: int = 64, snapshot_every: int = 10000, compact: bool = False,
+                 binary_snapshot: bool = False):
+        # base_path: path without extension; `.log` and `.snap` are appended.
+        # migrate_from: legacy used_numbers.json imported once, when no journal exists yet.
+        self.log_path = Path(f"{base_path}.log")
+        self.snapshot_path = Path(f"{base_path}.snap")
+        self.binary_snapshot_path = Path(f"{base_path}.bsnap")
+        self.binary_snapshot = binary_snapshot
+        self.migrate_from = migrate_from
+        self.fsync_every = max(1, fsync_every)
+        self.snapshot_every = max(1, snapshot_every)
+        self.compact = compact
+        self.used_numbers = self._empty_set()
+        self._fd = None
+        self._log_records = 0
+        self._snapshot_records = 0
+        self._unsynced = 0
+        self._lock = threading.Lock()
+
+    def _empty_set(self):
+        if self.compact:
+            from utils.compact_set import CompactNumberSet
+            return CompactNumberSet()
+        return set()
+
+    @classmethod
+    def encode(cls, number) -> bytes:
+        """Encode one number as a fixed-width record."""
+        if isinstance(number, bool) or not isinstance(number, (int, float)):
+            raise ValueError(f"Cannot journal non-numeric value {number!r}")
+        if isinstance(number, float):
+            return cls.FLOAT_RECORD.pack(cls.FLOAT_TAG, number)
+        try:
+            return cls.INT_RECORD.pack(cls.INT_TAG, number)
+        except struct.error:
+            raise ValueError(f"Integer {number} does not fit in a 64-bit record")
+
+    @classmethod
+    def decode(cls, data: bytes) -> list:
+        """Decode consecutive records; a trailing partial record is ignored."""
+        numbers = []
+        size = cls.RECORD_SIZE
+        for offset in range(0, len(data) - size + 1, size):
+            tag = data[offset:offset + 1]
+            if tag == cls.INT_TAG:
+                numbers.append(cls.INT_RECORD.unpack_from(data, offset)[1])
+            elif tag == cls.FLOAT_TAG:
+                numbers.append(cls.FLOAT_RECORD.unpack_from(data, offset)[1])
+            else:
+                raise ValueError(f"Corrupt journal record at byte {offset}")
+        return numbers
+
+    @classmethod
+    def decode_keys(cls, data: bytes) -> "np.ndarray":
+        """
+        Vectorized decode of consecutive records into int64 keys (see
+        compact_set.encode); a trailing partial record and values with no key
+        are dropped.
+        """
+        import numpy as np
+        from utils.compact_set import encode_arrays
+        records = np.frombuffer(data, dtype=np.dtype(cls.RECORD_FIELDS), count=len(data) // cls.RECORD_SIZE)
+        is_int = records["tag"] == cls.INT_TAG
+        is_float = records["tag"] == cls.FLOAT_TAG
+        if not (is_int | is_float).all():
+            offset = int(np.flatnonzero(~(is_int | is_float))[0]) * cls.RECORD_SIZE
+            raise ValueError(f"Corrupt journal record at byte {offset}")
+        return encode_arrays(records["value"][is_int], records["value"][is_float].view("<f8"))
+
+    def load(self) -> set:
+        """
+        Load the snapshot and replay the log (migrating the legacy JSON file the
+        first time), then open the log for appending. Returns the live set that
+        add() keeps up to date.
+        """
+        if (not self.snapshot_path.exists() and not self.binary_snapshot_path.exists()
+                and not self.log_path.exists() and self.migrate_from):
+            self._migrate_json()
+
+        # After switching formats, the snapshot is rewritten in the new one, once
+        other_format = self.snapshot_path if self.binary_snapshot else self.binary_snapshot_path
+        if other_format.exists():
+            self._convert_snapshot()
+
+        if self.binary_snapshot:
+            import numpy as np
+            from utils.binary_snapshot import SnapshotBackedSet, SnapshotIndex, write_snapshot
+            if not self.binary_snapshot_path.exists():
+                write_snapshot(self.binary_snapshot_path, np.empty(0, dtype=np.int64))
+            numbers = SnapshotBackedSet(SnapshotIndex(self.binary_snapshot_path))
+            self._snapshot_records = len(numbers.snapshot)
+        else:
+            numbers = self._empty_set()
+            if self.snapshot_path.exists():
+                self._snapshot_records = self._replay(numbers, self.snapshot_path.read_bytes())
+
+        log_size = 0
+        if self.log_path.exists():
+            self._log_records = self._replay(numbers, self.log_path.read_bytes())
+            log_size = self._log_records * self.RECORD_SIZE
+
+        self._fd = os.open(self.log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        # Drop a torn trailing record left by a crash mid-write.
+        os.ftruncate(self._fd, log_size)
+        self.used_numbers = numbers
+        return numbers
+
+    def _replay(self, numbers, data: bytes) -> int:
+        """Add the numbers recorded in `data`; returns the number of whole records."""
+        if isinstance(numbers, set):
+            numbers.update(self.decode(data))
+        else:
+            numbers.add_keys(self.decode_keys(data))
+        return len(data) // self.RECORD_SIZE
+
+    def add(self, number):
+        """Add `number` to the live set and append it to the log."""
+        record = self.encode(number)
+        with self._lock:
+            self._append(number, record)
+
+    def add_if_absent(self, number) -> bool:
+        """
+        Add and log `number` unless it is already used. Returns False for a
+        duplicate. The check and the insert are one step under the journal's
+        lock, so concurrent callers (threadpool routes, streams, the event
+        loop) can never both record the same number.
+        """
+        record = self.encode(number)
+        with self._lock:
+            if number in self.used_numbers:
+                return False
+            self._append(number, record)
+            return True
+
+    def _append(self, number, record: bytes):
+        if self._fd is None:
+            raise RuntimeError("Journal is not open; call load() first.")
+        self.used_numbers.add(number)
+        os.write(self._fd, record)
+        self._log_records += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            os.fsync(self._fd)
+            self._unsynced = 0
+        if self._log_records >= max(self.snapshot_every, self._snapshot_records):
+            self._snapshot()
+
+    def snapshot(self):
+        """Fold the log into a fresh snapshot and truncate the log."""
+        with self._lock:
+            self._snapshot()
+
+    def close(self):
+        """fsync and close the log. Safe to call more than once."""
+        with self._lock:
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+
+    def _snapshot(self):
+        if self.binary_snapshot:
+            from utils.binary_snapshot import SnapshotIndex, write_snapshot
+            from utils.compact_set import CompactNumberSet
+            write_snapshot(self.binary_snapshot_path, self.used_numbers.merged_keys())
+            previous = self.used_numbers.snapshot
+            # Swap in the new snapshot before dropping the recent numbers it now holds
+            self.used_numbers.snapshot = SnapshotIndex(self.binary_snapshot_path, verify=False)
+            self.used_numbers.recent = CompactNumberSet()
+            previous.close()
+        else:
+            temp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+            self._write_records(temp_path, self.used_numbers)
+            os.replace(temp_path, self.snapshot_path)
+        # A crash before this truncate only leaves records that are also in the snapshot.
+        if self._fd is not None:
+            os.ftruncate(self._fd, 0)
+            os.fsync(self._fd)
+        self._snapshot_records = len(self.used_numbers)
+        self._log_records = 0
+        self._unsynced = 0
+
+    def _convert_snapshot(self):
+        """Merge the snapshots of both formats into the configured one and remove the other."""
+        import numpy as np
+        from utils.binary_snapshot import read_snapshot, write_snapshot
+        from utils.compact_set import decode
+        data = self.snapshot_path.read_bytes() if self.snapshot_path.exists() else b""
+        keys = (read_snapshot(self.binary_snapshot_path) if self.binary_snapshot_path.exists()
+                else np.empty(0, dtype=np.int64))
+        if self.binary_snapshot:
+            write_snapshot(self.binary_snapshot_path, np.union1d(keys, self.decode_keys(data)))
+            os.remove(self.snapshot_path)
+        else:
+            numbers = set(self.decode(data))
+            numbers.update(decode(key) for key in keys.tolist())
+            temp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+            self._write_records(temp_path, numbers)
+            os.replace(temp_path, self.snapshot_path)
+            os.remove(self.binary_snapshot_path)
+
+    def _write_records(self, path: Path, numbers):
+        with open(path, "wb") as f:
+            f.write(b"".join(self.encode(n) for n in numbers))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _migrate_json(self):
+        legacy = load_used_numbers(self.migrate_from)
+        # The legacy file may contain stray non-numeric entries; they were never served.
+        numbers = [n for n in legacy if isinstance(n, (int, float)) and not isinstance(n, bool)]
+        self._write_records(self.snapshot_path, numbers)
+        print(f"Migrated {len(numbers)} used numbers from {self.migrate_from} to {self.snapshot_path}")
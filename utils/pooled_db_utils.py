@@ -1,21 +1,55 @@
 import aiosqlite
 import os
+import random
+from contextlib import asynccontextmanager
 from typing import List, Optional
 
 
 class DatabaseUtils:
-    def __init__(self, db_file: str, table_name: str = "number_pool"):
+    # Values of the `used` column in shard tables
+    UNUSED = 0   # Available to be served
+    USED = 1     # Served (or burned); never handed out again
+    CLAIMED = 2  # Claimed into an in-memory prefetch buffer, not yet known to be served
+
+    # How pop_random_number/claim_batch pick unused rows:
+    # "probe":  jump to a random id and take the next unused row(s) via the
+    #           (used, id) index -- O(log n), random even for unshuffled shards.
+    # "cursor": take the lowest unused id(s) via the same index -- O(log n);
+    #           random because insert_values() inserts in shuffled order.
+    # "random": legacy `ORDER BY RANDOM()`, a full scan and sort per call.
+    SELECTION_STRATEGIES = ("probe", "cursor", "random")
+
+    def __init__(self, db_file: str, table_name: str = "number_pool", pool=None,
+                 selection: str = "probe"):
+        if selection not in self.SELECTION_STRATEGIES:
+            raise ValueError(f"Unknown selection strategy: {selection}")
         self.db_file = db_file
         self.table_name = table_name
+        # Optional utils.connection_pool.ConnectionPool for db_file; used when open.
+        self.pool = pool
+        self.selection = selection
+
+    @asynccontextmanager
+    async def _connect(self):
+        """
+        Yields a pooled connection when the pool is open, otherwise opens a
+        one-off connection that is closed on exit.
+        """
+        if self.pool is not None and self.pool.is_open:
+            async with self.pool.acquire() as conn:
+                yield conn
+        else:
+            async with aiosqlite.connect(self.db_file) as conn:
+                yield conn
 
     async def table_exists(self) -> bool:
-        async with aiosqlite.connect(self.db_file) as conn:
+        async with self._connect() as conn:
             query = "SELECT name FROM sqlite_master WHERE type='table' AND name=?"
             cursor = await conn.execute(query, (self.table_name,))
             return await cursor.fetchone() is not None
 
     async def create_table(self, is_metadata: bool = False):
-        async with aiosqlite.connect(self.db_file) as conn:
+        async with self._connect() as conn:
             await conn.execute("PRAGMA journal_mode=WAL;")
             if is_metadata:
                 await conn.execute(f"""
@@ -31,10 +65,20 @@ class DatabaseUtils:
                         used INTEGER DEFAULT 0
                     );
                 """)
+                # Lets unused rows be found without scanning served history.
+                await conn.execute(f"""
+                    CREATE INDEX IF NOT EXISTS idx_{self.table_name}_used_id
+                    ON {self.table_name} (used, id);
+                """)
             await conn.commit()
 
-    async def insert_values(self, values: List[float]):
-        async with aiosqlite.connect(self.db_file) as conn:
+    async def insert_values(self, values: List[float], shuffle: bool = True):
+        # Insert in shuffled order so that id order is random order ("cursor" selection).
+        # Tables where order is irrelevant (metadata) load faster from sorted input.
+        values = list(values)
+        if shuffle:
+            random.shuffle(values)
+        async with self._connect() as conn:
             await conn.executemany(
                 f"INSERT OR IGNORE INTO {self.table_name} (value) VALUES (?)",
                 [(v,) for v in values]
@@ -42,16 +86,76 @@ class DatabaseUtils:
             await conn.commit()
 
     async def fetch_all_values(self) -> set:
-        async with aiosqlite.connect(self.db_file) as conn:
+        async with self._connect() as conn:
             cursor = await conn.execute(f"SELECT value FROM {self.table_name}")
             rows = await cursor.fetchall()
             return {row[0] for row in rows}
 
+    async def fetch_sorted_values(self) -> list:
+        """All values in ascending order (served from the UNIQUE index, no sort step)."""
+        async with self._connect() as conn:
+            cursor = await conn.execute(f"SELECT value FROM {self.table_name} ORDER BY value")
+            rows = await cursor.fetchall()
+            return [row[0] for row in rows]
+
+    async def record_new_values(self, pick) -> list:
+        """
+        Metadata tables: call pick(existing_sorted) for a list of new values and
+        record them, inside one write transaction. Processes that refill shards
+        from the same metadata DB are serialized by it and never pick the same
+        value.
+        """
+        async with self._connect() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            cursor = await conn.execute(f"SELECT value FROM {self.table_name} ORDER BY value")
+            existing_sorted = [row[0] for row in await cursor.fetchall()]
+            values = list(pick(existing_sorted))
+            # Sorted input keeps the UNIQUE index inserts sequential
+            await conn.executemany(
+                f"INSERT INTO {self.table_name} (value) VALUES (?)",
+                [(v,) for v in sorted(values)]
+            )
+            await conn.commit()
+            return values
+
+    async def insert_new_values(self, values: List[float]) -> list:
+        """
+        Metadata tables: record the values that are not present yet, in one
+        write transaction, and return them sorted (repeats within `values`
+        count once). The candidates are staged in a temp table and checked
+        against the UNIQUE index in one query, not one round trip per value.
+        """
+        async with self._connect() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            await conn.execute("CREATE TEMP TABLE IF NOT EXISTS candidates (value REAL)")
+            await conn.execute("DELETE FROM temp.candidates")
+            await conn.executemany("INSERT INTO temp.candidates (value) VALUES (?)", [(v,) for v in values])
+            cursor = await conn.execute(f"""
+                SELECT DISTINCT value FROM temp.candidates AS c
+                WHERE NOT EXISTS (SELECT 1 FROM {self.table_name} AS t WHERE t.value = c.value)
+                ORDER BY value
+            """)
+            new_values = [row[0] for row in await cursor.fetchall()]
+            await conn.executemany(
+                f"INSERT INTO {self.table_name} (value) VALUES (?)", [(v,) for v in new_values]
+            )
+            await conn.execute("DELETE FROM temp.candidates")
+            await conn.commit()
+            return new_values
+
     async def count_rows(self) -> int:
-        async with aiosqlite.connect(self.db_file) as conn:
+        async with self._connect() as conn:
             cursor = await conn.execute(f"SELECT COUNT(*) FROM {self.table_name}")
             return (await cursor.fetchone())[0]
 
+    async def count_unused(self) -> int:
+        """Rows still available to serve; counted on the (used, id) index."""
+        async with self._connect() as conn:
+            cursor = await conn.execute(
+                f"SELECT COUNT(*) FROM {self.table_name} WHERE used = ?", (self.UNUSED,)
+            )
+            return (await cursor.fetchone())[0]
+
     '''async def pop_random_number(self) -> Optional[float]:
         async with aiosqlite.connect(self.db_file) as conn:
             cursor = await conn.execute(
@@ -65,25 +169,137 @@ class DatabaseUtils:
                 return value
             return None'''
 
+    async def _select_unused(self, conn, count: int) -> list:
+        """Pick up to `count` unused (id, value) rows using the selection strategy."""
+        if self.selection == "random":
+            cursor = await conn.execute(
+                f"SELECT id, value FROM {self.table_name} WHERE used = 0 ORDER BY RANDOM() LIMIT ?",
+                (count,)
+            )
+            return await cursor.fetchall()
+
+        start_id = 0
+        if self.selection == "probe":
+            cursor = await conn.execute(f"SELECT MAX(id) FROM {self.table_name}")
+            max_id = (await cursor.fetchone())[0]
+            if max_id is None:
+                return []
+            start_id = random.randint(1, max_id)
+
+        cursor = await conn.execute(
+            f"SELECT id, value FROM {self.table_name} WHERE used = 0 AND id >= ? ORDER BY id LIMIT ?",
+            (start_id, count)
+        )
+        rows = await cursor.fetchall()
+        if len(rows) < count and start_id > 0:
+            # Wrap around to the unused rows below the probe point.
+            cursor = await conn.execute(
+                f"SELECT id, value FROM {self.table_name} WHERE used = 0 AND id < ? ORDER BY id LIMIT ?",
+                (start_id, count - len(rows))
+            )
+            rows += await cursor.fetchall()
+        return rows
+
     async def pop_random_number(self):
         """
         Fetch a random number from the shard, ensuring that it is removed
         from the available pool once selected.
+        The select and the update share one write transaction, so two
+        concurrent callers can never pop the same row.
         """
-        async with aiosqlite.connect(self.db_file) as conn:
-            cursor = await conn.execute(
-                f"SELECT value FROM {self.table_name} WHERE used = 0 ORDER BY RANDOM() LIMIT 1"
+        async with self._connect() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            rows = await self._select_unused(conn, 1)
+            if not rows:
+                await conn.rollback()
+                return None
+            row_id, number = rows[0]
+            # Mark the number as used
+            await conn.execute(
+                f"UPDATE {self.table_name} SET used = 1 WHERE id = ?", (row_id,)
             )
-            row = await cursor.fetchone()
+            await conn.commit()
+            return number
 
-            if row:
-                number = row[0]
-                # Mark the number as used
-                await conn.execute(
-                    f"UPDATE {self.table_name} SET used = 1 WHERE value = ?", (number,)
-                )
-                await conn.commit()
-                return number
-            else:
-                return None
+    async def claim_batch(self, count: int, mark: int = USED) -> List[float]:
+        """
+        Claim up to `count` random unused numbers in a single transaction,
+        setting their `used` flag to `mark` (USED or CLAIMED).
+        """
+        return (await self.execute_batch([("claim", (count, mark))]))[0]
+
+    async def set_used_flag(self, values: List[float], mark: int):
+        """Set the `used` flag of the given values (e.g. to release or confirm claims)."""
+        if not values:
+            return
+        await self.execute_batch([("set_used", (values, mark))])
+
+    async def resolve_claimed(self, mark: int) -> int:
+        """
+        Move every row still marked CLAIMED (left over by a crash) to `mark`:
+        UNUSED to re-release them, USED to burn them. Returns the number of rows.
+        """
+        return (await self.execute_batch([("resolve_claimed", (mark,))]))[0]
+
+    async def execute_batch(self, operations: list) -> list:
+        """
+        Run shard operations in one write transaction and return their results
+        in order. Each operation is (name, args) with a name from
+        BATCH_OPERATIONS: "claim" (count, mark), "set_used" (values, mark),
+        "resolve_claimed" (mark,), "insert" (values,) and "count_unused" ().
+        If any operation fails, none of them is applied.
+        """
+        async with self._connect() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                results = [await self.BATCH_OPERATIONS[name](self, conn, *args) for name, args in operations]
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
+            return results
+
+    async def _claim(self, conn, count: int, mark: int) -> List[float]:
+        rows = await self._select_unused(conn, count)
+        await conn.executemany(
+            f"UPDATE {self.table_name} SET used = ? WHERE id = ?",
+            [(mark, row[0]) for row in rows]
+        )
+        values = [row[1] for row in rows]
+        # Probe batches are runs of consecutive ids; shuffle within the batch.
+        random.shuffle(values)
+        return values
+
+    async def _set_used(self, conn, values: List[float], mark: int):
+        await conn.executemany(
+            f"UPDATE {self.table_name} SET used = ? WHERE value = ?",
+            [(mark, v) for v in values]
+        )
+
+    async def _resolve_claimed(self, conn, mark: int) -> int:
+        cursor = await conn.execute(
+            f"UPDATE {self.table_name} SET used = ? WHERE used = ?", (mark, self.CLAIMED)
+        )
+        return cursor.rowcount
+
+    async def _insert(self, conn, values: List[float]):
+        values = list(values)
+        random.shuffle(values)  # See insert_values
+        await conn.executemany(
+            f"INSERT OR IGNORE INTO {self.table_name} (value) VALUES (?)",
+            [(v,) for v in values]
+        )
+
+    async def _count_unused(self, conn) -> int:
+        cursor = await conn.execute(
+            f"SELECT COUNT(*) FROM {self.table_name} WHERE used = ?", (self.UNUSED,)
+        )
+        return (await cursor.fetchone())[0]
 
+    BATCH_OPERATIONS = {
+        "claim": _claim,
+        "set_used": _set_used,
+        "resolve_claimed": _resolve_claimed,
+        "insert": _insert,
+        "count_unused": _count_unused,
+    }
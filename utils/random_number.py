@@ -1,16 +1,181 @@
 # utils/random_number.py
 
+import hashlib
+import json
+import os
 import random
+import secrets
+import threading
+from pathlib import Path
+
+MASK64 = (1 << 64) - 1
+
+
+class FeistelPermutation:
+    """
+    A keyed bijection over range(domain_size).
+
+    A balanced Feistel network permutes the smallest even-bit-width power of
+    two that covers the domain; indices that land outside the domain are fed
+    through again (cycle walking) until they land inside it. Distinct inputs
+    therefore always give distinct outputs.
+    """
+
+    def __init__(self, domain_size: int, key: bytes, rounds: int = 4):
+        if domain_size < 1:
+            raise ValueError("domain_size must be at least 1.")
+        self.domain_size = domain_size
+        bits = max(2, (domain_size - 1).bit_length())
+        self.half_bits = (bits + 1) // 2
+        self.half_mask = (1 << self.half_bits) - 1
+        self.round_keys = [
+            int.from_bytes(hashlib.blake2b(key + bytes([i]), digest_size=8).digest(), "little")
+            for i in range(rounds)
+        ]
+
+    def _round(self, half: int, round_key: int) -> int:
+        # splitmix64 finaliser of (half + round_key), truncated to half width
+        x = (half + round_key) & MASK64
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+        return (x ^ (x >> 31)) & self.half_mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half_bits, value & self.half_mask
+        for round_key in self.round_keys:
+            left, right = right, left ^ self._round(right, round_key)
+        return (left << self.half_bits) | right
+
+    def permute(self, index: int) -> int:
+        if not 0 <= index < self.domain_size:
+            raise ValueError(f"Index {index} is outside the domain of size {self.domain_size}.")
+        value = self._encrypt(index)
+        while value >= self.domain_size:
+            value = self._encrypt(value)
+        return value
+
+
+class PermutationState:
+    """
+    Durable state for permutation mode: the key plus one counter per number type.
+
+    Counters are checkpointed in blocks: before handing out the first index of a
+    block, the end of that block is written to `state_file`. After a restart the
+    counters resume from the checkpoint, so at most `block_size - 1` indices per
+    type are skipped and none is ever reused.
+    """
+
+    def __init__(self, state_file: Path, block_size: int = 1024):
+        self.state_file = Path(state_file)
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        if self.state_file.exists():
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+            self.key = bytes.fromhex(state["key"])
+            self.counters = dict(state["counters"])
+        else:
+            self.key = secrets.token_bytes(16)
+            self.counters = {}
+        # Everything up to the checkpoint may already have been served.
+        self.reserved = dict(self.counters)
+        self._save()
+
+    def next_index(self, kind: str) -> int:
+        with self._lock:
+            index = self.counters.get(kind, 0)
+            if index >= self.reserved.get(kind, 0):
+                self.reserved[kind] = index + self.block_size
+                self._save()
+            self.counters[kind] = index + 1
+            return index
+
+    def _save(self):
+        state = {"key": self.key.hex(), "counters": self.reserved}
+        temp_path = self.state_file.with_name(self.state_file.name + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.state_file)
+
 
 class RandomNumberGenerator:
+    # Upper bound of the float range. Note that `^` is XOR, so this is 2; it is
+    # kept as-is so existing deployments keep drawing from the same domain.
+    FLOAT_UPPER = 10^8
+    FLOAT_DECIMALS = 6
+    INT_BITS = 32
+
+    def __init__(self, mode: str = "random", state_file: Path = None, block_size: int = 1024,
+                 node_id: int = 0, partition_count: int = 1):
+        """
+        mode="random" draws numbers independently; uniqueness must be enforced by a store.
+        mode="permutation" returns a keyed pseudo-random permutation of a persistent
+        counter, so numbers are unique by construction and `state_file` (key and
+        checkpointed counters) is the only durable state.
+
+        node_id / partition_count split both domains into `partition_count`
+        disjoint slices: this generator only returns numbers whose integer value
+        (for floats, the value scaled by 10**FLOAT_DECIMALS) is congruent to
+        `node_id` modulo `partition_count`. Instances configured with distinct
+        node ids therefore never return the same number, without sharing any
+        state.
+        """
+        if mode not in ("random", "permutation"):
+            raise ValueError(f"Unknown generator mode: {mode}")
+        if partition_count < 1 or not 0 <= node_id < partition_count:
+            raise ValueError(f"node_id must be in [0, {partition_count}), got {node_id}.")
+        self.mode = mode
+        self.node_id = node_id
+        self.partition_count = partition_count
+        if mode == "permutation":
+            if state_file is None:
+                raise ValueError("Permutation mode needs a state_file.")
+            self.state = PermutationState(state_file, block_size=block_size)
+            self.permutations = {
+                "int": FeistelPermutation(self.slice_size(False), self.state.key + b"int"),
+                "float": FeistelPermutation(self.slice_size(True), self.state.key + b"float"),
+            }
+
+    @classmethod
+    def domain_size(cls, is_float: bool) -> int:
+        """Number of distinct values of a type (floats counted as scaled integers)."""
+        if is_float:
+            return cls.FLOAT_UPPER * 10 ** cls.FLOAT_DECIMALS + 1
+        return 1 << cls.INT_BITS
+
+    def slice_size(self, is_float: bool) -> int:
+        """Number of distinct values of a type in this generator's partition."""
+        return (self.domain_size(is_float) - self.node_id + self.partition_count - 1) // self.partition_count
+
+    def _from_slice(self, index: int, is_float: bool):
+        """Map index in [0, slice_size) to the matching number of this partition."""
+        value = index * self.partition_count + self.node_id
+        if is_float:
+            return round(value / 10 ** self.FLOAT_DECIMALS, self.FLOAT_DECIMALS)
+        return value
+
     def generate_random_number(self, is_float: bool = False) -> float:
         """
         Generate a random number.
-        
+
         If is_float is False, return an 8-bit integer.
         If is_float is True, return a float rounded to 4 decimal places.
         """
+        if self.mode == "permutation":
+            return self._next_permuted_number(is_float)
+        if self.partition_count > 1:
+            return self._from_slice(random.randrange(self.slice_size(is_float)), is_float)
         if is_float:
-            return round(random.uniform(0, 10^8), 6)
+            return round(random.uniform(0, self.FLOAT_UPPER), self.FLOAT_DECIMALS)
         else:
-            return random.getrandbits(32)
\ No newline at end of file
+            return random.getrandbits(self.INT_BITS)
+
+    def _next_permuted_number(self, is_float: bool) -> float:
+        kind = "float" if is_float else "int"
+        permutation = self.permutations[kind]
+        index = self.state.next_index(kind)
+        if index >= permutation.domain_size:
+            raise RuntimeError(f"All unique {kind} numbers have been issued.")
+        return self._from_slice(permutation.permute(index), is_float)
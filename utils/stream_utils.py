@@ -0,0 +1,86 @@
+# utils/stream_utils.py
+
+import asyncio
+import json
+import time
+
+
+# Keeps release tasks referenced until they finish.
+_release_tasks = set()
+
+
+class StreamStats:
+    """
+    Running totals for /random/stream, so that numbers reserved for a stream
+    but never delivered are accounted for instead of silently lost.
+    """
+
+    def __init__(self):
+        self.streams = 0
+        self.sent = 0      # Delivered to clients
+        self.released = 0  # Reserved, never sent, returned to storage
+        self.burned = 0    # Reserved, maybe partly sent when the client left; never reissued
+
+    def as_dict(self) -> dict:
+        return {"streams": self.streams, "sent": self.sent,
+                "released": self.released, "burned": self.burned}
+
+
+async def stream_numbers(reserve, limit: int = None, batch_size: int = 100, chunk_size: int = 16,
+                         max_rate: float = None, release=None, stats: StreamStats = None):
+    """
+    Async generator of newline-delimited JSON numbers for a StreamingResponse.
+
+    reserve(n): coroutine returning up to n freshly reserved numbers ([] when exhausted).
+    release(numbers): optional coroutine returning never-sent numbers to storage;
+        without it they are counted as burned.
+    limit: stop after this many numbers (None streams until storage runs out).
+    max_rate: cap in numbers per second.
+
+    Numbers are reserved `batch_size` at a time and written `chunk_size` lines
+    per chunk. A chunk is yielded only after the previous one was handed to the
+    socket, and the next batch is reserved only once the current one is fully
+    written, so a slow client slows reservation down instead of letting
+    numbers pile up. When the client disconnects, the server closes the
+    generator. The unwritten rest of the batch is then released. The chunk
+    being written at that moment may have been partly delivered, so it is
+    burned.
+    """
+    if max_rate:
+        # Never reserve more than about one second's worth ahead of the rate.
+        batch_size = max(1, min(batch_size, int(max_rate)))
+    stats = stats if stats is not None else StreamStats()
+    stats.streams += 1
+    sent = 0
+    pending = []    # Reserved, not yet yielded
+    in_flight = []  # Yielded, delivery not yet confirmed
+    started = time.monotonic()
+    try:
+        while limit is None or sent < limit:
+            wanted = batch_size if limit is None else min(batch_size, limit - sent)
+            pending = list(await reserve(wanted))
+            if not pending:
+                break
+            while pending:
+                if max_rate:
+                    delay = started + sent / max_rate - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                in_flight, pending = pending[:chunk_size], pending[chunk_size:]
+                yield "".join(json.dumps(number) + "\n" for number in in_flight)
+                sent += len(in_flight)
+                stats.sent += len(in_flight)
+                in_flight = []
+    finally:
+        if in_flight:
+            stats.burned += len(in_flight)
+        if pending:
+            if release is not None:
+                # Run the release as its own task: on disconnect this generator is
+                # usually being cancelled, and any await here would be cancelled too.
+                task = asyncio.get_running_loop().create_task(release(pending))
+                _release_tasks.add(task)
+                task.add_done_callback(_release_tasks.discard)
+                stats.released += len(pending)
+            else:
+                stats.burned += len(pending)
@@ -0,0 +1,83 @@
+# utils/vectorized_numbers.py
+
+import numpy as np
+
+from utils.metrics import NUMBER_COLLISIONS
+from utils.random_number import RandomNumberGenerator
+
+MAX_ROUNDS = 100  # Give up if the domain is too full to find enough new numbers
+
+
+def draw_candidates(count: int, is_float: bool, generator: np.random.Generator,
+                    node_id: int = 0, partition_count: int = 1) -> np.ndarray:
+    """
+    Draw `count` candidates from the same domains as RandomNumberGenerator:
+    32-bit integers, or floats in [0, FLOAT_UPPER] with FLOAT_DECIMALS decimals,
+    restricted to the (node_id, partition_count) slice like the generator.
+    Floats are drawn as scaled integers and divided once, which yields exactly
+    the doubles that round(x, FLOAT_DECIMALS) would produce.
+    """
+    domain = RandomNumberGenerator.domain_size(is_float)
+    slice_size = (domain - node_id + partition_count - 1) // partition_count
+    values = generator.integers(0, slice_size, size=count, dtype=np.int64) * partition_count + node_id
+    if is_float:
+        return values / 10 ** RandomNumberGenerator.FLOAT_DECIMALS
+    return values
+
+
+def sorted_unique(values: np.ndarray) -> np.ndarray:
+    """
+    Same result as np.unique(values): sorted, without repeats. Done with a sort
+    and an adjacent-difference mask, which stays fast on NumPy versions whose
+    np.unique goes through a hash table first.
+    """
+    values = np.sort(values)
+    if len(values) == 0:
+        return values
+    keep = np.empty(len(values), dtype=bool)
+    keep[0] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+def contains_sorted(sorted_values: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """Boolean mask of the candidates present in `sorted_values` (binary search)."""
+    if len(sorted_values) == 0:
+        return np.zeros(len(candidates), dtype=bool)
+    positions = np.searchsorted(sorted_values, candidates)
+    positions[positions == len(sorted_values)] = len(sorted_values) - 1
+    return sorted_values[positions] == candidates
+
+
+def unique_candidates(count: int, is_float: bool, existing_sorted: np.ndarray,
+                      generator: np.random.Generator = None, node_id: int = 0,
+                      partition_count: int = 1) -> np.ndarray:
+    """
+    Return `count` distinct new numbers, in random order, none of which are in
+    `existing_sorted` (an ascending array of already-used values), drawn from
+    the (node_id, partition_count) slice of the domain.
+
+    Candidates are generated in bulk, deduplicated (sorted_unique) and filtered
+    against the used values by binary search. Only the shortfall left by
+    duplicates is generated again.
+    """
+    generator = generator if generator is not None else np.random.default_rng()
+    existing_sorted = np.asarray(existing_sorted, dtype=np.float64)
+    fresh = np.empty(0, dtype=np.float64 if is_float else np.int64)
+    for _ in range(MAX_ROUNDS):
+        shortfall = count - len(fresh)
+        if shortfall <= 0:
+            break
+        # Overdraw slightly so that one round usually covers the duplicates.
+        drawn = draw_candidates(shortfall + shortfall // 10 + 16, is_float, generator,
+                                node_id, partition_count)
+        candidates = sorted_unique(drawn)
+        candidates = candidates[~contains_sorted(existing_sorted, candidates.astype(np.float64))]
+        candidates = candidates[~np.isin(candidates, fresh)]
+        NUMBER_COLLISIONS.labels("unique_candidates").inc(len(drawn) - len(candidates))
+        fresh = np.concatenate([fresh, candidates])
+    else:
+        if len(fresh) < count:
+            raise ValueError(f"Could only find {len(fresh)} of {count} new numbers; the domain is nearly full.")
+    # sorted_unique sorts, so shuffle before truncating to keep the selection uniform.
+    return generator.permutation(fresh)[:count]